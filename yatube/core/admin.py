@@ -0,0 +1,122 @@
+from django.contrib import admin
+from django.db.models import Count, Sum
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html
+
+from . import profiling
+from .models import Job, ProfileRecord, SlowQuery
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'name', 'status', 'attempts', 'max_attempts',
+                    'run_after', 'created', 'finished', 'worker')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'dedupe_key')
+    readonly_fields = ('name', 'payload', 'dedupe_key', 'attempts',
+                       'started', 'finished', 'worker', 'last_error')
+    actions = ('retry',)
+    change_list_template = 'admin/core/job/change_list.html'
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = extra_context or {}
+        extra_context['status_counts'] = (
+            Job.objects.values('status').annotate(count=Count('pk'))
+            .order_by('status'))
+        return super().changelist_view(request, extra_context)
+
+    def retry(self, request, queryset):
+        count = queryset.exclude(status=Job.RUNNING).update(
+            status=Job.QUEUED, attempts=0, run_after=timezone.now())
+        self.message_user(request, f'Повторно в очереди: {count}')
+    retry.short_description = 'Повторить выбранные задачи'
+
+    def has_add_permission(self, request):
+        return False
+
+
+class ProfileRecordAdmin(admin.ModelAdmin):
+    list_display = ('created', 'method', 'path', 'view_name', 'mode',
+                    'status_code', 'duration', 'samples', 'user',
+                    'downloads')
+    list_filter = ('mode', 'view_name')
+    search_fields = ('path', 'view_name')
+    # файлы профиля не редактируются
+    readonly_fields = [field.name for field in ProfileRecord._meta.fields]
+    # что можно скачать: pstats и свернутые стеки
+    downloads_kinds = {'pstats': 'stats_file', 'stacks': 'stacks_file'}
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/download/<kind>/',
+                 self.admin_site.admin_view(self.download),
+                 name='core_profilerecord_download'),
+        ] + super().get_urls()
+
+    def downloads(self, record):
+        return format_html(
+            '<a href="{}">pstats</a> / <a href="{}">стеки</a>',
+            reverse('admin:core_profilerecord_download',
+                    args=(record.pk, 'pstats')),
+            reverse('admin:core_profilerecord_download',
+                    args=(record.pk, 'stacks')),
+        )
+    downloads.short_description = 'Скачать'
+
+    def download(self, request, pk, kind):
+        if not self.has_view_permission(request):
+            raise Http404
+        field = self.downloads_kinds.get(kind)
+        if field is None:
+            raise Http404
+        record = get_object_or_404(ProfileRecord, pk=pk)
+        name = getattr(record, field)
+        files = profiling.storage()
+        if not files.exists(name):
+            raise Http404
+        return FileResponse(files.open(name), as_attachment=True,
+                            filename=name)
+
+    def has_add_permission(self, request):
+        return False
+
+
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ('short_sql', 'view_name', 'count', 'total_time',
+                    'avg_time', 'max_time', 'last_seen')
+    list_filter = ('view_name',)
+    search_fields = ('sql', 'view_name')
+    fields = ('sql', 'view_name', 'count', 'total_time', 'max_time',
+              'first_seen', 'last_seen', 'example_sql', 'params_shape',
+              'query_plan')
+    readonly_fields = fields
+    change_list_template = 'admin/core/slowquery/change_list.html'
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = extra_context or {}
+        extra_context['totals'] = SlowQuery.objects.aggregate(
+            queries=Sum('count'), time=Sum('total_time'),
+            fingerprints=Count('pk'))
+        return super().changelist_view(request, extra_context)
+
+    def short_sql(self, query):
+        return query.sql[:120]
+    short_sql.short_description = 'Запрос'
+
+    def avg_time(self, query):
+        return round(query.avg_time, 1)
+    avg_time.short_description = 'Среднее время, мс'
+
+    def query_plan(self, query):
+        return format_html('<pre>{}</pre>', query.plan)
+    query_plan.short_description = 'План запроса'
+
+    def has_add_permission(self, request):
+        return False
+
+
+admin.site.register(Job, JobAdmin)
+admin.site.register(ProfileRecord, ProfileRecordAdmin)
+admin.site.register(SlowQuery, SlowQueryAdmin)
@@ -1,5 +1,13 @@
 from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        # регистрируем фоновые задачи из tasks.py всех приложений
+        autodiscover_modules('tasks')
+        from . import profiling  # noqa: F401
+        from .cache import check_session_cache
+        check_session_cache()
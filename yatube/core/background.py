@@ -0,0 +1,64 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from django.utils.module_loading import import_string
+
+from . import metrics
+
+_executor = None
+_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.BACKGROUND_WORKERS,
+                thread_name_prefix='yatube-bg',
+            )
+    return _executor
+
+
+def queue_size():
+    # ThreadPoolExecutor не дает длину очереди публично
+    return _executor._work_queue.qsize() if _executor else 0
+
+
+metrics.queue_depth('background', queue_size)
+
+
+def _call(func, args, kwargs):
+    try:
+        return func(*args, **kwargs)
+    finally:
+        # у каждого потока пула свое соединение, не держим его открытым
+        connections.close_all()
+
+
+def submit(func, *args, **kwargs):
+    """Выполнить func в локальном пуле потоков вне запроса.
+
+    При BACKGROUND_EAGER задача выполняется сразу (нужно для тестов).
+    """
+    if settings.BACKGROUND_EAGER:
+        future = Future()
+        try:
+            future.set_result(func(*args, **kwargs))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+    return get_executor().submit(_call, func, args, kwargs)
+
+
+def process_main(func_path, *args):
+    """Точка входа дочернего процесса: настроить Django и вызвать функцию.
+
+    Модуль не импортирует модели, поэтому годится для multiprocessing
+    в режиме spawn.
+    """
+    import django
+    django.setup()
+    import_string(func_path)(*args)
@@ -0,0 +1,62 @@
+import os
+import time
+from contextlib import contextmanager
+from itertools import accumulate
+
+from django.db import connection
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+
+
+@contextmanager
+def test_database(name=None, debug=None, keep=False):
+    """Временная тестовая база для команд-бенчмарков.
+
+    name - файл базы вместо базы в памяти, если к ней будут
+    обращаться другие потоки или процессы. С keep файл не удаляется,
+    а уже существующий открывается как есть, чтобы повторять замеры на
+    большом наборе данных.
+    """
+    test_settings = connection.settings_dict['TEST']
+    old_test_name = test_settings.get('NAME')
+    if name is not None:
+        test_settings['NAME'] = name
+    setup_test_environment(debug=debug)
+    if keep and name is not None and os.path.exists(name):
+        connection.close()
+        old_name = connection.settings_dict['NAME']
+        connection.settings_dict['NAME'] = name
+    else:
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        if keep:
+            connection.close()
+            connection.settings_dict['NAME'] = old_name
+        else:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+        test_settings['NAME'] = old_test_name
+
+
+def throughput(func, number):
+    """Сколько вызовов func в секунду при number последовательных вызовах."""
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    return number / (time.perf_counter() - start)
+
+
+def percentile(values, q):
+    """q-й процентиль (0..100) уже отсортированного списка."""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def zipf_cum_weights(size, skew):
+    """Накопленные веса степенного закона: первые элементы самые частые."""
+    return list(accumulate(1 / (rank + 1) ** skew for rank in range(size)))
@@ -0,0 +1,120 @@
+"""Бэкенды кэша, считающие попадания и промахи для core.metrics.
+
+Метка cache берется из ключа METRICS_ALIAS настройки CACHES (по
+умолчанию 'default'), потому что бэкенд не знает своего алиаса.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends import dummy, locmem, memcached
+from django.core.exceptions import ImproperlyConfigured
+from django.views.decorators.cache import cache_page
+
+from . import metrics
+
+metrics.counter('yatube_cache_requests_total',
+                'Чтения из кэша: result="hit" или "miss" по алиасу')
+
+_missing = object()
+
+CACHED_SESSION_ENGINES = {
+    'django.contrib.sessions.backends.cache',
+    'django.contrib.sessions.backends.cached_db',
+}
+
+
+class MetricsCacheMixin:
+    # BaseCache.get_many вызывает get для каждого ключа, и тогда
+    # попадания уже посчитаны там
+    native_get_many = False
+
+    def __init__(self, location, params):
+        super().__init__(location, params)
+        self.metrics_alias = params.get('METRICS_ALIAS', 'default')
+
+    def _count(self, result, value=1):
+        metrics.inc('yatube_cache_requests_total', value,
+                    cache=self.metrics_alias, result=result)
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _missing, version)
+        if value is _missing:
+            self._count('miss')
+            return default
+        self._count('hit')
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        result = super().get_many(keys, version)
+        if self.native_get_many:
+            self._count('hit', len(result))
+            self._count('miss', len(keys) - len(result))
+        return result
+
+
+class LocMemCache(MetricsCacheMixin, locmem.LocMemCache):
+    pass
+
+
+class MemcachedCache(MetricsCacheMixin, memcached.MemcachedCache):
+    native_get_many = True
+
+
+class PyLibMCCache(MetricsCacheMixin, memcached.PyLibMCCache):
+    native_get_many = True
+
+
+def is_shared(alias=DEFAULT_CACHE_ALIAS):
+    """Видят ли все процессы сервера одни и те же ключи этого кэша.
+
+    LocMem у каждого процесса свой: запись или удаление ключа в одном
+    воркере остальные не заметят.
+    """
+    return not isinstance(
+        caches[alias], (locmem.LocMemCache, dummy.DummyCache))
+
+
+def shared_timeout(timeout, alias=DEFAULT_CACHE_ALIAS):
+    """Время жизни ключа, который другие процессы могут сделать устаревшим.
+
+    Общий кэш держит ключ timeout секунд. Кэш процесса - не дольше
+    LOCAL_CACHE_TIMEOUT: удаление или обновление ключа в другом воркере
+    до него не дойдет.
+    """
+    if is_shared(alias):
+        return timeout
+    return min(timeout, settings.LOCAL_CACHE_TIMEOUT)
+
+
+def check_session_cache():
+    """Сессии в кэше допустимы, только если кэш общий для всех процессов.
+
+    Иначе выход из аккаунта удалит сессию лишь в кэше одного воркера, а
+    остальные будут пускать пользователя до конца SESSION_COOKIE_AGE.
+    """
+    if (settings.SESSION_ENGINE in CACHED_SESSION_ENGINES
+            and not is_shared(settings.SESSION_CACHE_ALIAS)):
+        raise ImproperlyConfigured(
+            f'{settings.SESSION_ENGINE} требует общего кэша (memcached) '
+            f'в алиасе {settings.SESSION_CACHE_ALIAS!r}, задайте '
+            f'SESSION_CACHE_LOCATION или SESSION_BACKEND=db')
+
+
+def cache_page_per_user(timeout, key_prefix=''):
+    """cache_page с отдельной копией страницы для каждого пользователя.
+
+    Анонимы делят одну копию. Страница авторизованного пользователя с
+    его именем, подписками и уведомлениями другим не отдается.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            prefix = key_prefix
+            if request.user.is_authenticated:
+                prefix = f'{key_prefix}.user.{request.user.pk}'
+            cached = cache_page(timeout, key_prefix=prefix)(view_func)
+            return cached(request, *args, **kwargs)
+        return wrapper
+    return decorator
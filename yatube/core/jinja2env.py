@@ -0,0 +1,42 @@
+import logging
+
+from django.template import defaultfilters
+from django.templatetags.static import static
+from django.urls import reverse
+from jinja2 import Environment
+from sorl.thumbnail import get_thumbnail
+
+from core.templatetags.user_filters import addclass
+
+logger = logging.getLogger(__name__)
+
+
+def url(viewname, *args, **kwargs):
+    return reverse(viewname, args=args or None, kwargs=kwargs or None)
+
+
+def thumbnail(file_, geometry, **options):
+    """Аналог тега {% thumbnail %} из sorl: None, если картинки нет."""
+    if not file_:
+        return None
+    try:
+        return get_thumbnail(file_, geometry, **options)
+    except Exception:
+        logger.exception('Thumbnail generation failed')
+        return None
+
+
+def environment(**options):
+    env = Environment(**options)
+    env.globals.update({
+        'static': static,
+        'url': url,
+        'thumbnail': thumbnail,
+    })
+    env.filters.update({
+        'addclass': addclass,
+        'date': defaultfilters.date,
+        'linebreaksbr': defaultfilters.linebreaksbr,
+        'truncatechars': defaultfilters.truncatechars,
+    })
+    return env
@@ -0,0 +1,187 @@
+"""Персистентная очередь фоновых задач без внешнего брокера.
+
+Задачи хранятся в таблице core.Job и выполняются командой run_jobs.
+Функция-задача регистрируется декоратором @job в модуле tasks.py
+любого приложения.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from . import metrics
+from .background import process_main
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def _job_counts():
+    counts = Job.objects.filter(status__in=Job.PENDING).values(
+        'status').annotate(count=Count('pk')).order_by()
+    result = {(('status', status),): 0 for status in Job.PENDING}
+    for row in counts:
+        result[(('status', row['status']),)] = row['count']
+    return result
+
+
+metrics.collector('yatube_jobs', 'Задачи core.Job в очереди и в работе',
+                  _job_counts)
+
+
+def job(func=None, *, name=None, max_attempts=None):
+    """Зарегистрировать функцию как фоновую задачу."""
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__qualname__}'
+        _registry[task_name] = func
+        func.job_name = task_name
+        func.job_max_attempts = max_attempts or settings.JOBS_MAX_ATTEMPTS
+        return func
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def get_task(name):
+    return _registry[name]
+
+
+def enqueue(func, *args, dedupe_key=None, delay=0, **kwargs):
+    """Поставить задачу в очередь.
+
+    Пока задача с тем же dedupe_key ждет или выполняется,
+    повторная постановка возвращает существующую задачу.
+    """
+    new_job = Job(
+        name=func.job_name,
+        payload=json.dumps({'args': args, 'kwargs': kwargs}),
+        dedupe_key=dedupe_key,
+        max_attempts=func.job_max_attempts,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+    try:
+        with transaction.atomic():
+            new_job.save()
+    except IntegrityError:
+        existing = Job.objects.filter(
+            dedupe_key=dedupe_key, status__in=Job.PENDING).first()
+        if existing is None:
+            raise
+        return existing
+    return new_job
+
+
+def backoff(attempts):
+    """Задержка перед повтором: экспонента с ограничением сверху."""
+    return min(settings.JOBS_RETRY_BACKOFF * 2 ** (attempts - 1),
+               settings.JOBS_RETRY_BACKOFF_MAX)
+
+
+def claim(worker_id):
+    """Атомарно забрать из очереди первую готовую задачу."""
+    while True:
+        now = timezone.now()
+        job_id = Job.objects.filter(
+            status=Job.QUEUED, run_after__lte=now
+        ).order_by('run_after', 'pk').values_list('pk', flat=True).first()
+        if job_id is None:
+            return None
+        claimed = Job.objects.filter(pk=job_id, status=Job.QUEUED).update(
+            status=Job.RUNNING,
+            attempts=F('attempts') + 1,
+            started=now,
+            worker=worker_id,
+        )
+        if claimed:
+            return Job.objects.get(pk=job_id)
+
+
+def execute(job_obj):
+    try:
+        payload = json.loads(job_obj.payload)
+        get_task(job_obj.name)(*payload['args'], **payload['kwargs'])
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning('Job %s failed: %s', job_obj, error)
+        if job_obj.attempts >= job_obj.max_attempts:
+            Job.objects.filter(pk=job_obj.pk).update(
+                status=Job.FAILED, last_error=error,
+                finished=timezone.now())
+        else:
+            Job.objects.filter(pk=job_obj.pk).update(
+                status=Job.QUEUED, last_error=error,
+                run_after=timezone.now() + timedelta(
+                    seconds=backoff(job_obj.attempts)))
+        return False
+    Job.objects.filter(pk=job_obj.pk).update(
+        status=Job.DONE, finished=timezone.now())
+    return True
+
+
+def requeue_stale():
+    """Вернуть в очередь задачи, чей обработчик умер во время работы."""
+    deadline = timezone.now() - timedelta(seconds=settings.JOBS_TIMEOUT)
+    return Job.objects.filter(
+        status=Job.RUNNING, started__lt=deadline
+    ).update(status=Job.QUEUED)
+
+
+def work(worker_id, burst=False, stop_event=None):
+    """Цикл обработчика: выполнять задачи, пока не попросят остановиться.
+
+    В режиме burst цикл завершается, когда готовых задач не осталось.
+    """
+    processed = 0
+    while stop_event is None or not stop_event.is_set():
+        job_obj = claim(worker_id)
+        if job_obj is None:
+            if burst:
+                break
+            time.sleep(settings.JOBS_POLL_INTERVAL)
+            continue
+        execute(job_obj)
+        processed += 1
+    return processed
+
+
+def _thread_main(worker_id, burst):
+    try:
+        work(worker_id, burst)
+    finally:
+        connections.close_all()
+
+
+def run_workers(workers, use_processes=False, burst=False):
+    requeue_stale()
+    base_id = f'{socket.gethostname()}:{os.getpid()}'
+    if use_processes:
+        # дочерние процессы открывают свои соединения с базой
+        connections.close_all()
+        context = multiprocessing.get_context('spawn')
+        pool = [
+            context.Process(target=process_main,
+                            args=('core.jobs.work', f'{base_id}:p{i}', burst))
+            for i in range(workers)
+        ]
+    else:
+        pool = [
+            threading.Thread(target=_thread_main,
+                             args=(f'{base_id}:t{i}', burst))
+            for i in range(workers)
+        ]
+    for worker in pool:
+        worker.start()
+    for worker in pool:
+        worker.join()
@@ -0,0 +1,131 @@
+"""Отправка писем из персистентной очереди.
+
+QueuedEmailBackend только сохраняет письма в core.QueuedEmail и ставит
+задачу core.jobs, поэтому запрос не ждет SMTP, а письма переживают
+перезапуск процесса. Задача (manage.py run_jobs) отправляет очередь
+пачками через одно соединение с настоящим бэкендом EMAIL_QUEUE_BACKEND.
+Если отправка упала, письма пачки возвращаются в очередь, а задача
+повторяется по правилам core.jobs.
+"""
+import json
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db.models import Q
+from django.utils import timezone
+
+from . import metrics
+from .jobs import enqueue
+from .models import QueuedEmail
+
+logger = logging.getLogger(__name__)
+
+metrics.counter('yatube_mail_total',
+                'Письма из очереди: result="sent" или "failed"')
+metrics.histogram('yatube_mail_latency_seconds',
+                  'Время от постановки письма в очередь до отправки',
+                  buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600))
+metrics.collector(
+    'yatube_mail_queued', 'Писем в очереди core.QueuedEmail',
+    lambda: {(): QueuedEmail.objects.count()})
+
+
+def dump(message):
+    if message.attachments:
+        raise ValueError('Очередь писем не принимает вложения')
+    return json.dumps({
+        'subject': message.subject,
+        'body': message.body,
+        'from_email': message.from_email,
+        'to': message.to,
+        'cc': message.cc,
+        'bcc': message.bcc,
+        'reply_to': message.reply_to,
+        'headers': message.extra_headers,
+        'alternatives': getattr(message, 'alternatives', []),
+        'content_subtype': message.content_subtype,
+    })
+
+
+def load(data):
+    data = json.loads(data)
+    content_subtype = data.pop('content_subtype')
+    message = EmailMultiAlternatives(**data)
+    message.content_subtype = content_subtype
+    return message
+
+
+def _claim(claim_id):
+    """Взять в отправку пачку писем, не занятых другим обработчиком."""
+    stale = timezone.now() - timedelta(seconds=settings.JOBS_TIMEOUT)
+    free = Q(claimed__isnull=True) | Q(claimed__lt=stale)
+    ids = QueuedEmail.objects.filter(free).values_list('pk', flat=True)[
+        :settings.EMAIL_QUEUE_BATCH_SIZE]
+    QueuedEmail.objects.filter(free, pk__in=list(ids)).update(
+        claimed_by=claim_id, claimed=timezone.now())
+    return list(QueuedEmail.objects.filter(claimed_by=claim_id))
+
+
+def _send(connection, messages):
+    try:
+        return connection.send_messages(messages) or 0
+    except Exception:
+        logger.exception('Sending queued email failed, reconnecting')
+        connection.close()
+        # одна повторная попытка на новом соединении
+        return connection.send_messages(messages) or 0
+
+
+def send_queued():
+    """Отправить все письма очереди пачками через одно соединение."""
+    connection = None
+    try:
+        while True:
+            claim_id = uuid.uuid4().hex
+            batch = _claim(claim_id)
+            if not batch:
+                break
+            if connection is None:
+                connection = get_connection(settings.EMAIL_QUEUE_BACKEND)
+            try:
+                sent = _send(connection, [load(e.message) for e in batch])
+            except Exception:
+                QueuedEmail.objects.filter(claimed_by=claim_id).update(
+                    claimed_by='', claimed=None)
+                metrics.inc('yatube_mail_total', len(batch),
+                            result='failed')
+                raise
+            now = timezone.now()
+            for email in batch:
+                metrics.observe('yatube_mail_latency_seconds',
+                                (now - email.created).total_seconds())
+            metrics.inc('yatube_mail_total', sent, result='sent')
+            if sent < len(batch):
+                logger.warning('Backend sent %d of %d queued emails',
+                               sent, len(batch))
+                metrics.inc('yatube_mail_total', len(batch) - sent,
+                            result='failed')
+            QueuedEmail.objects.filter(claimed_by=claim_id).delete()
+    finally:
+        if connection is not None:
+            connection.close()
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """Бэкенд, который только ставит письма в очередь core.QueuedEmail."""
+
+    def send_messages(self, email_messages):
+        from .tasks import send_queued_emails  # tasks импортирует модуль
+
+        if not email_messages:
+            return 0
+        QueuedEmail.objects.bulk_create(
+            QueuedEmail(message=dump(message)) for message in email_messages)
+        # задача без дедупликации: уже запущенная могла проверить очередь
+        # до этих писем, лишняя просто найдет очередь пустой
+        enqueue(send_queued_emails)
+        return len(email_messages)
@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.benchmark import test_database, throughput
+from posts.models import Follow, Post
+
+User = get_user_model()
+
+
+def session_queries(func):
+    with CaptureQueriesContext(connection) as context:
+        func()
+    return sum('django_session' in query['sql']
+               for query in context.captured_queries)
+
+
+class Command(BaseCommand):
+    help = ('Пропускная способность авторизованных запросов '
+            'для каждого движка сессий из SESSION_ENGINES')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+
+    def handle(self, *args, **options):
+        with test_database():
+            user = User.objects.create_user(username='bench')
+            author = User.objects.create_user(username='author')
+            Follow.objects.create(user=user, author=author)
+            post = Post.objects.create(author=author, text='Тестовый пост')
+            Post.objects.bulk_create(
+                Post(author=author, text=f'Пост {i}') for i in range(30))
+            self.stdout.write(f'{"engine":<16}{"endpoint":<14}'
+                              f'{"req/s":>10}{"session SQL":>14}')
+            for name, engine in settings.SESSION_ENGINES.items():
+                with override_settings(SESSION_ENGINE=engine):
+                    caches[settings.SESSION_CACHE_ALIAS].clear()
+                    client = Client()
+                    client.force_login(user)
+                    endpoints = (
+                        ('follow_index', lambda: client.get(
+                            reverse('posts:follow_index'))),
+                        ('post_create', lambda: client.get(
+                            reverse('posts:post_create'))),
+                        ('add_comment', lambda: client.post(
+                            reverse('posts:add_comment', args=[post.pk]),
+                            {'text': 'Комментарий'})),
+                    )
+                    for endpoint, request in endpoints:
+                        request()
+                        queries = session_queries(request)
+                        rps = throughput(request, options['requests'])
+                        self.stdout.write(f'{name:<16}{endpoint:<14}'
+                                          f'{rps:>10.0f}{queries:>14}')
@@ -0,0 +1,32 @@
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = ('Удаление просроченных сессий из django_session небольшими '
+            'пачками, чтобы не держать блокировку записи SQLite')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='пауза между пачками, в секундах')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        deleted = 0
+        while True:
+            keys = list(Session.objects.filter(
+                expire_date__lt=now
+            ).values_list('session_key', flat=True)[:options['batch_size']])
+            if not keys:
+                break
+            with transaction.atomic():
+                Session.objects.filter(session_key__in=keys).delete()
+            deleted += len(keys)
+            if options['pause']:
+                time.sleep(options['pause'])
+        self.stdout.write(f'Удалено сессий: {deleted}')
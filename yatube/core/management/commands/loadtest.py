@@ -0,0 +1,273 @@
+import http.client
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from importlib import import_module
+from itertools import accumulate
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.contrib.auth import (BACKEND_SESSION_KEY, HASH_SESSION_KEY,
+                                 SESSION_KEY, get_user_model)
+from django.db import connection
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpRequest
+from django.middleware.csrf import get_token
+from django.test import override_settings
+from django.urls import reverse
+
+from core.benchmark import percentile, test_database, zipf_cum_weights
+from posts import rankings
+from posts.models import Group
+
+User = get_user_model()
+
+# доли запросов в смеси; последние три доступны только авторизованным
+TRAFFIC_MIX = {
+    'index': 30,
+    'group_posts': 15,
+    'profile': 15,
+    'post_detail': 25,
+    'follow_index': 7,
+    'post_create': 3,
+    'add_comment': 5,
+}
+AUTH_ONLY = {'follow_index', 'post_create', 'add_comment'}
+# сколько ждать запуска и остановки сервера, в секундах
+SERVER_START_TIMEOUT = 30
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест: заполнить временную базу, поднять сервер '
+            'в отдельном процессе (runserver, чтобы клиенты не делили с '
+            'ним GIL) и прогнать смесь запросов из многих клиентов. С --url '
+            'нагружается уже запущенный сервер с данными из базы по '
+            'умолчанию (сессии клиентов пишутся в нее же).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--comments', type=int, default=5000)
+        parser.add_argument('--follows', type=int, default=2000)
+        parser.add_argument('--images', type=float, default=0.05,
+                            help='доля постов с картинкой')
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='показатель степенного закона')
+        parser.add_argument('--clients', type=int, default=20)
+        parser.add_argument('--duration', type=float, default=10.0,
+                            help='длительность нагрузки, в секундах')
+        parser.add_argument('--auth-share', type=float, default=0.5,
+                            help='доля авторизованных клиентов')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--url', help='адрес уже запущенного сервера')
+
+    def handle(self, *args, **options):
+        if options['url']:
+            self.run_load(options['url'], options)
+            return
+        with tempfile.TemporaryDirectory() as tmp, \
+                override_settings(MEDIA_ROOT=tmp), \
+                test_database(name=f'{tmp}/loadtest.sqlite3', debug=False):
+            started = time.perf_counter()
+            self.seed(options)
+            self.stdout.write(
+                f'Данные созданы за {time.perf_counter() - started:.1f} с')
+            database_name = connection.settings_dict['NAME']
+            server, url = self.start_server(database_name, tmp)
+            try:
+                self.run_load(url, options)
+            finally:
+                # сервер выгружает просмотры, пока временная база есть
+                self.stop_server(server)
+
+    def start_server(self, database_name, media_root):
+        """Запустить runserver на временной базе и дождаться его."""
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        # DEBUG берется из окружения: без него нужен collectstatic
+        env = dict(os.environ, DATABASE_NAME=database_name,
+                   MEDIA_ROOT=media_root)
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'),
+             'runserver', '--noreload', f'127.0.0.1:{port}'],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while server.poll() is None and time.monotonic() < deadline:
+            try:
+                socket.create_connection(('127.0.0.1', port), 1).close()
+            except OSError:
+                time.sleep(0.1)
+            else:
+                return server, f'http://127.0.0.1:{port}'
+        self.stop_server(server)
+        raise CommandError('Сервер нагрузочного теста не запустился')
+
+    def stop_server(self, server):
+        # по SIGINT runserver завершается штатно и выгружает буферы
+        server.send_signal(signal.SIGINT)
+        try:
+            server.wait(SERVER_START_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+    def seed(self, options):
+        call_command(
+            'generate_dataset',
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            comments=options['comments'],
+            follows=options['follows'],
+            images=options['images'],
+            author_skew=options['skew'],
+            group_skew=options['skew'],
+            post_skew=options['skew'],
+            seed=options['seed'],
+            prefix='user',
+            stdout=self.stdout,
+        )
+
+    def targets(self, skew):
+        """Адреса страниц; популярные объекты запрашиваются чаще."""
+        usernames = list(User.objects.order_by('pk').values_list(
+            'username', flat=True))
+        slugs = list(Group.objects.order_by('pk').values_list(
+            'slug', flat=True))
+        # самые обсуждаемые посты открывают чаще
+        post_ids = list(rankings.popular_posts().values_list(
+            'pk', flat=True))
+        return {
+            'usernames': (usernames, zipf_cum_weights(len(usernames), skew)),
+            'slugs': (slugs, zipf_cum_weights(len(slugs), skew)),
+            'post_ids': (post_ids, zipf_cum_weights(len(post_ids), skew)),
+        }
+
+    def login_cookies(self, users):
+        """Куки сессии и CSRF для клиентов без прохождения формы входа."""
+        engine = import_module(settings.SESSION_ENGINE)
+        request = HttpRequest()
+        csrf_token = get_token(request)
+        cookies = []
+        for user in users:
+            session = engine.SessionStore()
+            session[SESSION_KEY] = str(user.pk)
+            session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+            session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+            session.save()
+            cookies.append(
+                f'{settings.SESSION_COOKIE_NAME}={session.session_key}; '
+                f'{settings.CSRF_COOKIE_NAME}={request.META["CSRF_COOKIE"]}')
+        return csrf_token, cookies
+
+    def build_request(self, endpoint, rng, targets):
+        def pick(name):
+            values, weights = targets[name]
+            return rng.choices(values, cum_weights=weights)[0]
+
+        if endpoint == 'index':
+            return 'GET', reverse('posts:index'), None
+        if endpoint == 'group_posts':
+            return 'GET', reverse('posts:group_list',
+                                  args=[pick('slugs')]), None
+        if endpoint == 'profile':
+            return 'GET', reverse('posts:profile',
+                                  args=[pick('usernames')]), None
+        if endpoint == 'post_detail':
+            return 'GET', reverse('posts:post_detail',
+                                  args=[pick('post_ids')]), None
+        if endpoint == 'follow_index':
+            return 'GET', reverse('posts:follow_index'), None
+        if endpoint == 'post_create':
+            return 'POST', reverse('posts:post_create'), urlencode(
+                {'text': 'Пост из нагрузочного теста'})
+        return 'POST', reverse('posts:add_comment',
+                               args=[pick('post_ids')]), urlencode(
+            {'text': 'Комментарий из нагрузочного теста'})
+
+    def client(self, url, endpoints, headers, rng, targets, deadline,
+               results):
+        parts = urlsplit(url)
+        names = list(endpoints)
+        weights = list(accumulate(endpoints.values()))
+        while time.perf_counter() < deadline:
+            endpoint = rng.choices(names, cum_weights=weights)[0]
+            method, path, body = self.build_request(endpoint, rng, targets)
+            request_headers = dict(headers)
+            if body is not None:
+                request_headers['Content-Type'] = (
+                    'application/x-www-form-urlencoded')
+            started = time.perf_counter()
+            try:
+                connection = http.client.HTTPConnection(
+                    parts.hostname, parts.port, timeout=30)
+                connection.request(method, path, body, request_headers)
+                response = connection.getresponse()
+                response.read()
+                connection.close()
+                ok = response.status < 400
+            except (OSError, http.client.HTTPException):
+                ok = False
+            results.append((endpoint, time.perf_counter() - started, ok))
+
+    def run_load(self, url, options):
+        skew = options['skew']
+        targets = self.targets(skew)
+        clients = options['clients']
+        auth_clients = round(clients * options['auth_share'])
+        users = list(User.objects.order_by('?')[:auth_clients])
+        csrf_token, cookies = self.login_cookies(users)
+        anonymous_mix = {name: weight for name, weight in TRAFFIC_MIX.items()
+                         if name not in AUTH_ONLY}
+        deadline = time.perf_counter() + options['duration']
+        results = [[] for _ in range(clients)]
+        threads = []
+        for number in range(clients):
+            if number < len(cookies):
+                endpoints = TRAFFIC_MIX
+                headers = {'Cookie': cookies[number],
+                           'X-CSRFToken': csrf_token}
+            else:
+                endpoints, headers = anonymous_mix, {}
+            threads.append(threading.Thread(target=self.client, args=(
+                url, endpoints, headers,
+                random.Random(options['seed'] + number), targets,
+                deadline, results[number])))
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.report([row for rows in results for row in rows],
+                    time.perf_counter() - started)
+
+    def report(self, results, elapsed):
+        by_endpoint = defaultdict(list)
+        for endpoint, latency, ok in results:
+            by_endpoint[endpoint].append((latency, ok))
+        by_endpoint['всего'] = [(latency, ok) for _, latency, ok in results]
+        self.stdout.write(
+            f'{"endpoint":<14}{"requests":>9}{"errors":>8}{"rps":>8}'
+            f'{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}')
+        for endpoint in [*TRAFFIC_MIX, 'всего']:
+            rows = by_endpoint.get(endpoint)
+            if not rows:
+                continue
+            latencies = sorted(latency * 1000 for latency, _ in rows)
+            errors = sum(not ok for _, ok in rows) / len(rows) * 100
+            self.stdout.write(
+                f'{endpoint:<14}{len(rows):>9}{errors:>7.1f}%'
+                f'{len(rows) / elapsed:>8.1f}'
+                f'{percentile(latencies, 50):>9.1f}'
+                f'{percentile(latencies, 95):>9.1f}'
+                f'{percentile(latencies, 99):>9.1f}')
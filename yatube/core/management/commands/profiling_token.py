@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core import profiling
+
+
+class Command(BaseCommand):
+    help = ('Токен для заголовка X-Profile: запрос с ним профилируется '
+            'без входа под сотрудником.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=profiling.MODES,
+                            default='sample')
+
+    def handle(self, *args, **options):
+        self.stdout.write(profiling.make_token(options['mode']))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from core.jobs import run_workers
+
+
+class Command(BaseCommand):
+    help = 'Обработчик персистентной очереди фоновых задач core.Job'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--processes', action='store_true',
+                            help='процессы вместо потоков')
+        parser.add_argument('--burst', action='store_true',
+                            help='завершиться, когда очередь опустеет')
+
+    def handle(self, *args, **options):
+        run_workers(options['workers'], use_processes=options['processes'],
+                    burst=options['burst'])
@@ -0,0 +1,333 @@
+"""Метрики приложения для Prometheus (/metrics).
+
+Каждый процесс копит счетчики и гистограммы в памяти и не чаще раза в
+METRICS_FLUSH_INTERVAL секунд целиком переписывает свой файл
+METRICS_DIR/<pid>.json. Запрос к /metrics складывает файлы всех
+процессов, поэтому за gunicorn видны суммы по всем воркерам. Горячий
+путь - только словарь под блокировкой.
+
+Датчики (gauge) процесса, например длина очередей, вычисляются при
+записи файла; у завершившихся процессов они не учитываются. Сборщики
+(collector) считаются в момент запроса к /metrics, например по базе.
+
+Файлы завершившихся процессов /metrics складывает в один DEAD_FILE и
+удаляет, чтобы каталог не рос, а суммы счетчиков не уменьшались.
+Процесс при первой записи так же убирает файл со своим pid, если его
+оставил прежний процесс с тем же pid.
+"""
+import atexit
+import bisect
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+HISTOGRAM = 'histogram'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_last_flush = time.monotonic()
+# имя -> (тип, описание, границы корзин)
+_metrics = {}
+# (имя, метки) -> значение; у гистограмм - счетчики корзин и сумма
+_values = {}
+_gauges = {}
+_collectors = {}
+# счетчики и гистограммы всех завершившихся процессов
+DEAD_FILE = 'dead.json'
+_started = False
+
+
+def _register(name, kind, description, buckets=None):
+    _metrics[name] = (kind, description, buckets)
+
+
+def counter(name, description):
+    _register(name, COUNTER, description)
+
+
+def histogram(name, description, buckets=DEFAULT_BUCKETS):
+    _register(name, HISTOGRAM, description, tuple(buckets))
+
+
+def gauge(name, description, func, **labels):
+    """Датчик процесса: func() вызывается при записи файла."""
+    _register(name, GAUGE, description)
+    _gauges[_key(name, labels)] = func
+
+
+def queue_depth(queue, func):
+    """Датчик длины очереди queue в памяти процесса."""
+    gauge('yatube_queue_depth', 'Длина очередей фоновой работы в памяти',
+          func, queue=queue)
+
+
+def collector(name, description, func):
+    """Датчик на момент запроса.
+
+    func() возвращает {((метка, значение), ...): значение датчика}.
+    """
+    _register(name, GAUGE, description)
+    _collectors[name] = func
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _values[key] = _values.get(key, 0) + value
+    maybe_flush()
+
+
+def observe(name, value, **labels):
+    key = _key(name, labels)
+    buckets = _metrics[name][2]
+    with _lock:
+        counts = _values.get(key)
+        if counts is None:
+            # корзины, корзина +Inf, сумма
+            counts = _values[key] = [0] * (len(buckets) + 2)
+        counts[bisect.bisect_left(buckets, value)] += 1
+        counts[-1] += value
+    maybe_flush()
+
+
+@contextmanager
+def timer(name, **labels):
+    """Записать в гистограмму name длительность блока with."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def _snapshot():
+    with _lock:
+        values = [
+            [name, dict(labels), value if isinstance(value, (int, float))
+             else list(value)]
+            for (name, labels), value in _values.items()
+        ]
+    gauges = []
+    for (name, labels), func in list(_gauges.items()):
+        try:
+            gauges.append([name, dict(labels), func()])
+        except Exception:
+            logger.exception('Gauge %s failed', name)
+    # описания метрик нужны процессу, который отдает /metrics, даже если
+    # сам он модуль с метрикой не импортировал
+    return {'metrics': _metrics, 'values': values, 'gauges': gauges}
+
+
+def _write():
+    global _last_flush, _started
+    _last_flush = time.monotonic()
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    if not _started:
+        with _dir_lock():
+            _prune(own=True)
+        _started = True
+    path = os.path.join(settings.METRICS_DIR, f'{os.getpid()}.json')
+    with open(f'{path}.tmp', 'w') as file:
+        json.dump(_snapshot(), file)
+    os.replace(f'{path}.tmp', path)
+
+
+def flush():
+    """Переписать файл текущего процесса."""
+    # временный файл у процесса один: потоки пишут его по очереди
+    with _flush_lock:
+        _write()
+
+
+def maybe_flush():
+    if time.monotonic() - _last_flush < settings.METRICS_FLUSH_INTERVAL:
+        return
+    # файл уже переписывает другой поток, запрос его не ждет
+    if not _flush_lock.acquire(blocking=False):
+        return
+    try:
+        _write()
+    except OSError:
+        logger.exception('Writing metrics to %s failed', settings.METRICS_DIR)
+    finally:
+        _flush_lock.release()
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@contextmanager
+def _dir_lock():
+    """Блокировка каталога METRICS_DIR на время переноса файлов."""
+    with open(os.path.join(settings.METRICS_DIR, '.lock'), 'w') as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        yield
+
+
+def _pid(path):
+    name = os.path.basename(path)[:-len('.json')]
+    return int(name) if name.isdigit() else None
+
+
+def _load(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _prune(own=False):
+    """Сложить файлы завершившихся процессов в DEAD_FILE и удалить их.
+
+    Вызывается под _dir_lock. С own - и файл с pid текущего процесса.
+    """
+    stale = []
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json')):
+        pid = _pid(path)
+        if pid is None:
+            continue
+        if own and pid == os.getpid() or not _alive(pid):
+            stale.append(path)
+    if not stale:
+        return
+    dead_path = os.path.join(settings.METRICS_DIR, DEAD_FILE)
+    dead = _load(dead_path) or {'metrics': {}, 'values': []}
+    totals = {}
+    for data in [dead, *filter(None, map(_load, stale))]:
+        dead['metrics'].update(data['metrics'])
+        for name, labels, value in data['values']:
+            _add(totals, name, labels, value)
+    dead['values'] = [[name, dict(labels), value]
+                      for (name, labels), value in totals.items()]
+    dead['gauges'] = []
+    with open(f'{dead_path}.tmp', 'w') as file:
+        json.dump(dead, file)
+    os.replace(f'{dead_path}.tmp', dead_path)
+    for path in stale:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _add(totals, name, labels, value):
+    key = _key(name, labels)
+    if isinstance(value, list):
+        current = totals.get(key)
+        if current is None or len(current) != len(value):
+            totals[key] = list(value)
+        else:
+            totals[key] = [a + b for a, b in zip(current, value)]
+    else:
+        totals[key] = totals.get(key, 0) + value
+
+
+def _read_files(totals):
+    metrics = {}
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json')):
+        data = _load(path)
+        if data is None:
+            continue
+        metrics.update(data['metrics'])
+        for name, labels, value in data['values']:
+            _add(totals, name, labels, value)
+        pid = _pid(path)
+        if pid is not None and _alive(pid):
+            for name, labels, value in data['gauges']:
+                _add(totals, name, labels, value)
+    return metrics
+
+
+def collect():
+    """Описания метрик и суммы по файлам всех процессов и сборщикам."""
+    flush()
+    totals = {}
+    with _dir_lock():
+        _prune()
+        metrics = _read_files(totals)
+    metrics.update(_metrics)
+    for name, func in list(_collectors.items()):
+        try:
+            samples = func()
+        except Exception:
+            logger.exception('Collector %s failed', name)
+            continue
+        for labels, value in samples.items():
+            totals[_key(name, dict(labels))] = value
+    return metrics, totals
+
+
+def _escape(value):
+    return (str(value).replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'))
+
+
+def _labels(labels, **extra):
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def render():
+    """Текст в формате экспозиции Prometheus 0.0.4."""
+    metrics, totals = collect()
+    by_name = defaultdict(list)
+    for (name, labels), value in sorted(totals.items()):
+        by_name[name].append((labels, value))
+    lines = []
+    for name, samples in sorted(by_name.items()):
+        kind, description, buckets = metrics[name]
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in samples:
+            if kind != HISTOGRAM:
+                lines.append(f'{name}{_labels(labels)} {value}')
+                continue
+            cumulative = 0
+            for bound, count in zip((*buckets, '+Inf'), value[:-1]):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(labels, le=bound)} '
+                             f'{cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {value[-1]}')
+            lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+def _flush_at_exit():
+    if not _values:
+        # manage.py migrate и подобные ничего не измеряли
+        return
+    try:
+        flush()
+    except Exception:
+        pass
+
+
+atexit.register(_flush_at_exit)
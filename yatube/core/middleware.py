@@ -0,0 +1,119 @@
+import hashlib
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control, patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+from django.utils.module_loading import import_string
+
+from . import metrics
+
+metrics.counter('yatube_http_requests_total',
+                'HTTP-запросы по представлению, методу и коду ответа')
+metrics.histogram('yatube_http_request_duration_seconds',
+                  'Время ответа по представлению')
+metrics.histogram('yatube_http_request_db_queries',
+                  'SQL-запросов на HTTP-запрос по представлению',
+                  buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200))
+
+
+class CacheHeadersMiddleware:
+    """Заголовки кэширования для страниц из PUBLIC_CACHE_VIEWS.
+
+    Анонимам отдается public-ответ с s-maxage и валидаторами
+    ETag/Last-Modified, авторизованным пользователям - private.
+    Представления из PUBLIC_CACHE_RUN_VIEWS выполняются и тогда, когда
+    клиенту уйдет 304.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.validators_funcs = {
+            view_name: import_string(path)
+            for view_name, path in settings.PUBLIC_CACHE_VIEWS.items()
+        }
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not hasattr(request, '_cache_validators'):
+            return response
+        if request.user.is_authenticated:
+            patch_cache_control(response, private=True)
+            return response
+        etag, timestamp = request._cache_validators
+        if response.status_code not in (200, 304) or response.cookies:
+            # персональные заголовки нельзя отдавать в общий кэш
+            patch_cache_control(response, private=True)
+            return response
+        if (response.status_code == 200 and request.resolver_match.view_name
+                in settings.PUBLIC_CACHE_RUN_VIEWS):
+            response = get_conditional_response(
+                request, etag=etag, last_modified=timestamp,
+                response=response)
+        if etag:
+            response['ETag'] = etag
+        if timestamp:
+            response['Last-Modified'] = http_date(timestamp)
+        patch_cache_control(response, public=True, max_age=0,
+                            s_maxage=settings.PUBLIC_CACHE_S_MAXAGE)
+        patch_vary_headers(response, ('Cookie',))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        view_name = request.resolver_match.view_name
+        validators_func = self.validators_funcs.get(view_name)
+        if validators_func is None:
+            return None
+        if request.user.is_authenticated:
+            request._cache_validators = (None, None)
+            return None
+        last_modified, key = validators_func(request, *view_args,
+                                             **view_kwargs)
+        timestamp = last_modified and int(last_modified.timestamp())
+        etag = quote_etag(hashlib.md5(
+            f'{request.get_full_path()}:{timestamp}:{key}'.encode()
+        ).hexdigest())
+        request._cache_validators = (etag, timestamp)
+        if view_name in settings.PUBLIC_CACHE_RUN_VIEWS:
+            # 304 вернет __call__ после ответа представления
+            return None
+        return get_conditional_response(request, etag=etag,
+                                        last_modified=timestamp)
+
+
+class MetricsMiddleware:
+    """Счетчики запросов, время ответа и число SQL-запросов (core.metrics).
+
+    Стоит первым, чтобы учитывать время всех остальных middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = 0
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count_query))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        metrics.inc('yatube_http_requests_total', view=view,
+                    method=request.method, status=response.status_code)
+        metrics.observe('yatube_http_request_duration_seconds', duration,
+                        view=view)
+        metrics.observe('yatube_http_request_db_queries', queries, view=view)
+        return response
@@ -0,0 +1,46 @@
+# Generated by Django 2.2.16 on 2026-10-19 08:29
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('name', models.CharField(max_length=200, verbose_name='Задача')),
+                ('payload', models.TextField(default='{}', verbose_name='Аргументы (JSON)')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Выполняется'), ('done', 'Выполнена'), ('failed', 'Ошибка')], default='queued', max_length=16, verbose_name='Статус')),
+                ('dedupe_key', models.CharField(blank=True, max_length=200, null=True, verbose_name='Ключ дедупликации')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('max_attempts', models.PositiveSmallIntegerField(default=5, verbose_name='Максимум попыток')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Не раньше')),
+                ('started', models.DateTimeField(blank=True, null=True, verbose_name='Начата')),
+                ('finished', models.DateTimeField(blank=True, null=True, verbose_name='Завершена')),
+                ('worker', models.CharField(blank=True, max_length=100, verbose_name='Обработчик')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+            ],
+            options={
+                'verbose_name': 'Фоновая задача',
+                'verbose_name_plural': 'Фоновые задачи',
+                'ordering': ['-created'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['status', 'run_after'], name='core_job_status_df1a33_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(condition=models.Q(status__in=('queued', 'running')), fields=('dedupe_key',), name='unique_pending_job'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.16 on 2026-10-19 08:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0001_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileRecord',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('method', models.CharField(max_length=10, verbose_name='Метод')),
+                ('path', models.CharField(max_length=2000, verbose_name='Адрес')),
+                ('view_name', models.CharField(blank=True, max_length=200, verbose_name='Представление')),
+                ('mode', models.CharField(choices=[('cprofile', 'cProfile'), ('sample', 'Сэмплирование')], max_length=16, verbose_name='Профилировщик')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='Код ответа')),
+                ('duration', models.FloatField(verbose_name='Длительность, мс')),
+                ('samples', models.PositiveIntegerField(default=0, verbose_name='Сэмплов')),
+                ('stats_file', models.CharField(max_length=200, verbose_name='Файл pstats')),
+                ('stacks_file', models.CharField(max_length=200, verbose_name='Файл стеков')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Профиль запроса',
+                'verbose_name_plural': 'Профили запросов',
+                'ordering': ['-created'],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_profilerecord'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=32, unique=True, verbose_name='Отпечаток')),
+                ('sql', models.TextField(verbose_name='Нормализованный SQL')),
+                ('example_sql', models.TextField(verbose_name='Пример запроса')),
+                ('params_shape', models.CharField(blank=True, max_length=200, verbose_name='Параметры')),
+                ('view_name', models.CharField(blank=True, max_length=200, verbose_name='Представление')),
+                ('plan', models.TextField(blank=True, verbose_name='План запроса')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Количество')),
+                ('total_time', models.FloatField(default=0, verbose_name='Суммарное время, мс')),
+                ('max_time', models.FloatField(default=0, verbose_name='Максимальное время, мс')),
+                ('first_seen', models.DateTimeField(auto_now_add=True, verbose_name='Впервые')),
+                ('last_seen', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Последний раз')),
+            ],
+            options={
+                'verbose_name': 'Медленный запрос',
+                'verbose_name_plural': 'Медленные запросы',
+                'ordering': ['-total_time'],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-19 10:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_slowquery'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedEmail',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('message', models.TextField(verbose_name='Письмо (JSON)')),
+                ('claimed_by', models.CharField(blank=True, max_length=32, verbose_name='Отправляет')),
+                ('claimed', models.DateTimeField(blank=True, null=True, verbose_name='Взято в отправку')),
+            ],
+            options={
+                'verbose_name': 'Письмо в очереди',
+                'verbose_name_plural': 'Письма в очереди',
+                'ordering': ['pk'],
+            },
+        ),
+    ]
@@ -1,4 +1,6 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 
 class CreatedModel(models.Model):
@@ -9,3 +11,127 @@ class CreatedModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class Job(CreatedModel):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+    PENDING = (QUEUED, RUNNING)
+
+    name = models.CharField('Задача', max_length=200)
+    payload = models.TextField('Аргументы (JSON)', default='{}')
+    status = models.CharField('Статус', max_length=16,
+                              choices=STATUS_CHOICES, default=QUEUED)
+    dedupe_key = models.CharField('Ключ дедупликации', max_length=200,
+                                  blank=True, null=True)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField('Максимум попыток',
+                                                    default=5)
+    run_after = models.DateTimeField('Не раньше', default=timezone.now)
+    started = models.DateTimeField('Начата', blank=True, null=True)
+    finished = models.DateTimeField('Завершена', blank=True, null=True)
+    worker = models.CharField('Обработчик', max_length=100, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+
+    def __str__(self) -> str:
+        return f'{self.name} #{self.pk}'
+
+    class Meta:
+        ordering = ['-created']
+        indexes = [models.Index(fields=['status', 'run_after'])]
+        constraints = [models.UniqueConstraint(
+            fields=['dedupe_key'],
+            condition=models.Q(status__in=('queued', 'running')),
+            name='unique_pending_job')
+        ]
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+
+
+class ProfileRecord(CreatedModel):
+    CPROFILE = 'cprofile'
+    SAMPLE = 'sample'
+    MODE_CHOICES = (
+        (CPROFILE, 'cProfile'),
+        (SAMPLE, 'Сэмплирование'),
+    )
+
+    method = models.CharField('Метод', max_length=10)
+    path = models.CharField('Адрес', max_length=2000)
+    view_name = models.CharField('Представление', max_length=200,
+                                 blank=True)
+    mode = models.CharField('Профилировщик', max_length=16,
+                            choices=MODE_CHOICES)
+    status_code = models.PositiveSmallIntegerField('Код ответа')
+    duration = models.FloatField('Длительность, мс')
+    samples = models.PositiveIntegerField('Сэмплов', default=0)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        verbose_name='Пользователь',
+    )
+    stats_file = models.CharField('Файл pstats', max_length=200)
+    stacks_file = models.CharField('Файл стеков', max_length=200)
+
+    def __str__(self) -> str:
+        return f'{self.method} {self.path} #{self.pk}'
+
+    class Meta:
+        ordering = ['-created']
+        verbose_name = 'Профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+
+
+class SlowQuery(models.Model):
+    fingerprint = models.CharField('Отпечаток', max_length=32, unique=True)
+    sql = models.TextField('Нормализованный SQL')
+    example_sql = models.TextField('Пример запроса')
+    params_shape = models.CharField('Параметры', max_length=200,
+                                    blank=True)
+    view_name = models.CharField('Представление', max_length=200,
+                                 blank=True)
+    plan = models.TextField('План запроса', blank=True)
+    count = models.PositiveIntegerField('Количество', default=0)
+    total_time = models.FloatField('Суммарное время, мс', default=0)
+    max_time = models.FloatField('Максимальное время, мс', default=0)
+    first_seen = models.DateTimeField('Впервые', auto_now_add=True)
+    last_seen = models.DateTimeField('Последний раз', default=timezone.now)
+
+    def __str__(self) -> str:
+        return self.sql[:100]
+
+    @property
+    def avg_time(self):
+        return self.total_time / self.count if self.count else 0
+
+    class Meta:
+        ordering = ['-total_time']
+        verbose_name = 'Медленный запрос'
+        verbose_name_plural = 'Медленные запросы'
+
+
+class QueuedEmail(CreatedModel):
+    message = models.TextField('Письмо (JSON)')
+    # обработчик, который отправляет письмо; после сбоя заявка
+    # устаревает через JOBS_TIMEOUT
+    claimed_by = models.CharField('Отправляет', max_length=32, blank=True)
+    claimed = models.DateTimeField('Взято в отправку', blank=True,
+                                   null=True)
+
+    def __str__(self) -> str:
+        return f'Письмо #{self.pk}'
+
+    class Meta:
+        ordering = ['pk']
+        verbose_name = 'Письмо в очереди'
+        verbose_name_plural = 'Письма в очереди'
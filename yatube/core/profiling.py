@@ -0,0 +1,252 @@
+"""Профилирование отдельных запросов на боевом сервере.
+
+Запрос профилируется, если сотрудник добавил к адресу ?_profile=cprofile
+(или sample), либо в заголовке X-Profile пришел подписанный токен
+(manage.py profiling_token). cProfile точен, но замедляет запрос в
+несколько раз; сэмплирующий профилировщик раз в
+PROFILING_SAMPLE_INTERVAL секунд снимает стек потока запроса из
+соседнего потока и почти не мешает ему.
+
+Результат пишется в PROFILING_ROOT двумя файлами: pstats (открывается
+pstats, snakeviz) и свернутые стеки для flamegraph.pl/speedscope.
+Скачать их можно из админки.
+"""
+import cProfile
+import logging
+import marshal
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import ProfileRecord
+
+logger = logging.getLogger(__name__)
+
+QUERY_PARAM = '_profile'
+HEADER = 'HTTP_X_PROFILE'
+TOKEN_SALT = 'core.profiling'
+MODES = (ProfileRecord.CPROFILE, ProfileRecord.SAMPLE)
+# самые мелкие ветки из cProfile не разворачиваются в стеки, секунд
+MIN_BRANCH_TIME = 1e-5
+
+# одновременно профилируется один запрос на процесс
+_lock = threading.Lock()
+
+
+def storage():
+    return FileSystemStorage(location=settings.PROFILING_ROOT)
+
+
+def make_token(mode):
+    return signing.dumps(mode, salt=TOKEN_SALT)
+
+
+def requested_mode(request):
+    """Режим профилирования запроса или None."""
+    token = request.META.get(HEADER)
+    if token:
+        try:
+            mode = signing.loads(token, salt=TOKEN_SALT,
+                                 max_age=settings.PROFILING_TOKEN_MAX_AGE)
+        except signing.BadSignature:
+            return None
+        return mode if mode in MODES else None
+    mode = request.GET.get(QUERY_PARAM)
+    if mode in MODES and request.user.is_staff:
+        return mode
+    return None
+
+
+def _label(func):
+    filename, line, name = func
+    if filename == '~':
+        # встроенные функции cProfile записывает как ('~', 0, '<...>')
+        return name
+    return f'{name} ({filename}:{line})'
+
+
+class Sampler(threading.Thread):
+    """Снимает стеки потока thread_id, пока не вызван stop()."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    (code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def pstats(self):
+        """Сэмплы в формате pstats: (cc, nc, tt, ct, callers)."""
+        own = Counter()
+        total = Counter()
+        edges = defaultdict(Counter)
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for func in set(stack):
+                total[func] += count
+            for caller, callee in set(zip(stack, stack[1:])):
+                edges[callee][caller] += count
+        interval = self.interval
+        return {
+            func: (count, count, own[func] * interval, count * interval, {
+                caller: (n, n, 0.0, n * interval)
+                for caller, n in edges[func].items()
+            })
+            for func, count in total.items()
+        }
+
+    def collapsed(self):
+        return {
+            ';'.join(_label(func) for func in stack): count
+            for stack, count in self.stacks.items()
+        }
+
+
+def collapse_pstats(stats):
+    """Приблизительные стеки из графа вызовов cProfile.
+
+    cProfile хранит только пары вызывающий-вызываемый, поэтому время
+    функции делится между вызывающими пропорционально их доле, в
+    микросекундах. Рекурсия (цепочка middleware вызывает одну и ту же
+    функцию на каждом уровне) сворачивается в один кадр.
+    """
+    callees = defaultdict(dict)
+    for func, (cc, nc, tt, ct, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees[caller][func] = edge[3]
+    stacks = Counter()
+
+    def walk(func, stack, seen, spent):
+        tt, ct = stats[func][2], stats[func][3]
+        share = min(spent / ct, 1) if ct else 0
+        stack = stack + (_label(func),)
+        stacks[';'.join(stack)] += tt * share
+        branches = {callee: edge_ct * share
+                    for callee, edge_ct in callees[func].items()
+                    if callee not in seen}
+        # при рекурсии ct ребер пересекаются, их сумма не больше ct
+        # вызывающего
+        children = sum(branches.values())
+        scale = min(1, max(spent - tt * share, 0) / children) \
+            if children else 0
+        for callee, branch in branches.items():
+            if branch * scale >= MIN_BRANCH_TIME:
+                walk(callee, stack, seen | {callee}, branch * scale)
+
+    for func, (cc, nc, tt, ct, callers) in stats.items():
+        # вызовы верхнего уровня не записаны ни у одного вызывающего
+        top = nc - sum(edge[1] for edge in callers.values())
+        if top > 0 and cc:
+            walk(func, (), {func}, ct * min(top / cc, 1))
+    return {stack: round(spent * 1e6) for stack, spent in stacks.items()
+            if round(spent * 1e6)}
+
+
+def save(request, response, mode, duration, stats, collapsed, samples=0):
+    name = uuid.uuid4().hex
+    files = storage()
+    stats_file = files.save(f'{name}.prof',
+                            ContentFile(marshal.dumps(stats)))
+    stacks_file = files.save(f'{name}.txt', ContentFile('\n'.join(
+        f'{stack} {count}' for stack, count in sorted(collapsed.items())
+    ).encode()))
+    match = request.resolver_match
+    record = ProfileRecord.objects.create(
+        method=request.method,
+        path=request.get_full_path()[:2000],
+        view_name=match.view_name if match else '',
+        mode=mode,
+        status_code=response.status_code,
+        duration=duration * 1000,
+        samples=samples,
+        user=request.user if request.user.is_authenticated else None,
+        stats_file=stats_file,
+        stacks_file=stacks_file,
+    )
+    stale = ProfileRecord.objects.order_by('-created', '-pk')[
+        settings.PROFILING_MAX_RECORDS:]
+    for old in stale:
+        old.delete()
+    return record
+
+
+@receiver(post_delete, sender=ProfileRecord)
+def delete_files(sender, instance, **kwargs):
+    files = storage()
+    for name in (instance.stats_file, instance.stacks_file):
+        if name:
+            files.delete(name)
+
+
+class ProfilingMiddleware:
+    """Профилирует запрос по ?_profile= от сотрудника или по токену.
+
+    Должен стоять после AuthenticationMiddleware. Номер записи
+    возвращается в заголовке X-Profile-Id.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = requested_mode(request)
+        if mode is None or not _lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self.profile(request, mode)
+        finally:
+            _lock.release()
+
+    def profile(self, request, mode):
+        started = time.perf_counter()
+        if mode == ProfileRecord.CPROFILE:
+            profiler = cProfile.Profile()
+            response = profiler.runcall(self.get_response, request)
+            duration = time.perf_counter() - started
+            profiler.create_stats()
+            stats = profiler.stats
+            collapsed, samples = collapse_pstats(stats), 0
+        else:
+            sampler = Sampler(threading.get_ident(),
+                              settings.PROFILING_SAMPLE_INTERVAL)
+            sampler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                sampler.stop()
+            duration = time.perf_counter() - started
+            stats, collapsed = sampler.pstats(), sampler.collapsed()
+            samples = sum(sampler.stacks.values())
+        try:
+            record = save(request, response, mode, duration, stats,
+                          collapsed, samples)
+        except Exception:
+            logger.exception('Saving profile of %s failed', request.path)
+        else:
+            response['X-Profile-Id'] = str(record.pk)
+        return response
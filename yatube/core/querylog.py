@@ -0,0 +1,170 @@
+"""Журнал медленных SQL-запросов.
+
+SlowQueryMiddleware на время запроса ставит на все соединения
+execute_wrapper, который замеряет каждый запрос. Запросы дольше
+SLOW_QUERY_THRESHOLD секунд после ответа пишутся в фоне в SlowQuery:
+одна строка на нормализованный текст (литералы и списки IN заменены),
+со счетчиком и суммарным временем. Для самого медленного случая
+сохраняются имя представления, типы параметров и EXPLAIN QUERY PLAN.
+"""
+import hashlib
+import logging
+import re
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .background import submit
+from .models import SlowQuery
+
+logger = logging.getLogger(__name__)
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+SPACE_RE = re.compile(r'\s+')
+
+
+def normalize(sql):
+    """SQL без значений: одинаковые по форме запросы совпадают."""
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = LIST_RE.sub('(...)', sql)
+    return SPACE_RE.sub(' ', sql).strip()
+
+
+def fingerprint(sql):
+    return hashlib.md5(sql.encode()).hexdigest()
+
+
+def params_shape(params, many):
+    if many:
+        size = len(params) if hasattr(params, '__len__') else '?'
+        return f'executemany x {size}'
+    if not params:
+        return ''
+    if isinstance(params, dict):
+        shape = ', '.join(f'{key}: {type(value).__name__}'
+                          for key, value in params.items())
+    else:
+        shape = ', '.join(type(value).__name__ for value in params)
+    return shape[:200]
+
+
+def _format_plan(rows):
+    if rows and all(len(row) == 4 for row in rows):
+        # SQLite: (id, parent, notused, detail), вложенность по parent
+        depth = {0: -1}
+        lines = []
+        for node, parent, _, detail in rows:
+            depth[node] = depth.get(parent, -1) + 1
+            lines.append('  ' * depth[node] + str(detail))
+        return '\n'.join(lines)
+    return '\n'.join(' '.join(str(value) for value in row) for row in rows)
+
+
+def explain(alias, sql, params):
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return ''
+    connection = connections[alias]
+    try:
+        prefix = connection.ops.explain_query_prefix()
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            return _format_plan(cursor.fetchall())
+    except (DatabaseError, NotImplementedError):
+        logger.warning('EXPLAIN failed for %s', sql[:200], exc_info=True)
+        return ''
+
+
+class Recorder:
+    """execute_wrapper: запоминает запросы дольше порога."""
+
+    def __init__(self, alias, threshold):
+        self.alias = alias
+        self.threshold = threshold
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            if duration >= self.threshold:
+                self.slow.append((self.alias, sql, params, many, duration))
+
+
+def record(queries, view_name):
+    """Сохранить медленные запросы одного HTTP-запроса."""
+    now = timezone.now()
+    for alias, sql, params, many, duration in queries:
+        normalized = normalize(sql)
+        key = fingerprint(normalized)
+        duration *= 1000
+        max_time = SlowQuery.objects.filter(fingerprint=key).values_list(
+            'max_time', flat=True).first()
+        sample = {}
+        if max_time is None or duration > max_time:
+            # пример и план храним для самого медленного случая
+            sample = {
+                'example_sql': sql,
+                'params_shape': params_shape(params, many),
+                'view_name': view_name,
+                'plan': '' if many else explain(alias, sql, params),
+                'max_time': duration,
+            }
+        if max_time is None:
+            try:
+                with transaction.atomic():
+                    SlowQuery.objects.create(
+                        fingerprint=key, sql=normalized, count=1,
+                        total_time=duration, last_seen=now, **sample)
+                continue
+            except IntegrityError:
+                # строку успел создать параллельный запрос
+                sample = {}
+        SlowQuery.objects.filter(fingerprint=key).update(
+            count=F('count') + 1, total_time=F('total_time') + duration,
+            last_seen=now, **sample)
+
+
+def _record_safely(queries, view_name):
+    try:
+        record(queries, view_name)
+    except Exception:
+        logger.exception('Saving %d slow queries failed', len(queries))
+
+
+class SlowQueryMiddleware:
+    """Замеряет SQL-запросы каждого HTTP-запроса.
+
+    Без SLOW_QUERY_THRESHOLD (None) ничего не делает.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        threshold = settings.SLOW_QUERY_THRESHOLD
+        if threshold is None:
+            return self.get_response(request)
+        recorders = [Recorder(connection.alias, threshold)
+                     for connection in connections.all()]
+        with ExitStack() as stack:
+            for recorder in recorders:
+                stack.enter_context(
+                    connections[recorder.alias].execute_wrapper(recorder))
+            response = self.get_response(request)
+        queries = [query for recorder in recorders
+                   for query in recorder.slow]
+        if queries:
+            match = request.resolver_match
+            submit(_record_safely, queries,
+                   match.view_name if match else '')
+        return response
@@ -0,0 +1,100 @@
+import mimetypes
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def accepted_encodings(header):
+    """Кодировки из ENCODINGS, которые разрешает Accept-Encoding.
+
+    Кодировка с q=0 запрещена, '*' относится ко всем не названным явно.
+    """
+    qualities = {}
+    for item in header.split(','):
+        coding, *params = item.split(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    default = qualities.get('*', 0.0)
+    return {coding for coding, _ in ENCODINGS
+            if qualities.get(coding, default) > 0}
+
+
+class StaticFilesMiddleware:
+    """Раздача STATIC_ROOT без внешнего веб-сервера.
+
+    Файлы с хэшем в имени (из манифеста) отдаются как immutable,
+    при поддержке клиентом - в сжатом виде (.br или .gz).
+    """
+
+    def __init__(self, get_response):
+        if not settings.SERVE_STATIC:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL
+        self.hashed_names = set(
+            getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+    def __call__(self, request):
+        if (request.method not in ('GET', 'HEAD')
+                or not request.path.startswith(self.prefix)):
+            return self.get_response(request)
+        name = request.path[len(self.prefix):]
+        try:
+            path = safe_join(settings.STATIC_ROOT, name)
+        except SuspiciousFileOperation:
+            # путь за пределами STATIC_ROOT: обычный 404 дальше по цепочке
+            return self.get_response(request)
+        if not os.path.isfile(path):
+            return self.get_response(request)
+        return self.serve(request, name, path)
+
+    def serve(self, request, name, path):
+        stat = os.stat(path)
+        if name in self.hashed_names:
+            cache_control = IMMUTABLE_CACHE_CONTROL
+        else:
+            cache_control = 'public, max-age=60'
+        if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'),
+                                  stat.st_mtime, stat.st_size):
+            response = HttpResponseNotModified()
+        else:
+            response = self.file_response(request, path)
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        response['Cache-Control'] = cache_control
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    def file_response(self, request, path):
+        content_type = (mimetypes.guess_type(path)[0]
+                        or 'application/octet-stream')
+        accepted = accepted_encodings(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        encoding = None
+        for candidate, extension in ENCODINGS:
+            if candidate in accepted and os.path.isfile(path + extension):
+                encoding, path = candidate, path + extension
+                break
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        if encoding:
+            response['Content-Encoding'] = encoding
+        return response
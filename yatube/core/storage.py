@@ -0,0 +1,44 @@
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_EXTENSIONS = (
+    '.css', '.js', '.svg', '.ico', '.txt', '.html', '.json', '.map', '.xml',
+)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Хэшированные имена файлов плюс сжатые копии .gz и .br рядом.
+
+    Копия .br пишется, только если установлен пакет brotli.
+    """
+    manifest_strict = False
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in set(self.hashed_files.values()):
+            if name.endswith(COMPRESS_EXTENSIONS):
+                self.compress(name)
+
+    def compress(self, name):
+        with self.open(name) as source:
+            content = source.read()
+        self._write_if_smaller(
+            name + '.gz', gzip.compress(content, compresslevel=9, mtime=0),
+            content)
+        if brotli is not None:
+            self._write_if_smaller(name + '.br', brotli.compress(content),
+                                   content)
+
+    def _write_if_smaller(self, name, compressed, content):
+        if len(compressed) >= len(content):
+            return
+        with open(self.path(name), 'wb') as destination:
+            destination.write(compressed)
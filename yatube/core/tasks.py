@@ -0,0 +1,8 @@
+from . import mail
+from .jobs import job
+
+
+@job
+def send_queued_emails():
+    """Отправить письма из очереди core.QueuedEmail."""
+    mail.send_queued()
@@ -0,0 +1,38 @@
+import os
+import tempfile
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+
+from core.cache import CACHED_SESSION_ENGINES, check_session_cache, is_shared
+
+SHARED_CACHES = {
+    alias: {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        # ключи не пишутся, постоянный путь не плодит каталоги
+        'LOCATION': os.path.join(tempfile.gettempdir(), f'yatube-{alias}'),
+    }
+    for alias in ('default', 'sessions')
+}
+
+
+class SessionCacheCheckTest(SimpleTestCase):
+    def test_local_cache_rejected(self):
+        """сессии в кэше одного процесса не запускаются"""
+        self.assertFalse(is_shared('sessions'))
+        for engine in CACHED_SESSION_ENGINES:
+            with self.subTest(engine=engine), \
+                    override_settings(SESSION_ENGINE=engine):
+                with self.assertRaises(ImproperlyConfigured):
+                    check_session_cache()
+
+    def test_db_and_shared_cache_allowed(self):
+        """сессии в базе или в общем кэше допустимы"""
+        with override_settings(
+                SESSION_ENGINE='django.contrib.sessions.backends.db'):
+            check_session_cache()
+        with override_settings(
+                CACHES=SHARED_CACHES,
+                SESSION_ENGINE='django.contrib.sessions.backends.cached_db'):
+            self.assertTrue(is_shared('sessions'))
+            check_session_cache()
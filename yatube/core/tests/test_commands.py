@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+
+class ClearExpiredSessionsTest(TestCase):
+    def test_expired_sessions_deleted_in_batches(self):
+        """просроченные сессии удаляются, живые остаются"""
+        now = timezone.now()
+        Session.objects.bulk_create(
+            Session(session_key=f'expired{i}', session_data='',
+                    expire_date=now - timedelta(days=1))
+            for i in range(5)
+        )
+        Session.objects.create(session_key='alive', session_data='',
+                               expire_date=now + timedelta(days=1))
+        out = StringIO()
+        call_command('clear_expired_sessions', batch_size=2, stdout=out)
+        self.assertIn('5', out.getvalue())
+        self.assertEqual(
+            list(Session.objects.values_list('session_key', flat=True)),
+            ['alive'])
+
+
+class LoadTestCommandTest(SimpleTestCase):
+    def test_report(self):
+        """короткий прогон с сервером в отдельном процессе дает отчет"""
+        # своя временная база команды не должна задеть базу тестов,
+        # поэтому команда запускается отдельным процессом
+        with tempfile.TemporaryDirectory() as tmp:
+            result = subprocess.run(
+                [sys.executable,
+                 os.path.join(settings.BASE_DIR, 'manage.py'), 'loadtest',
+                 '--users=5', '--groups=2', '--posts=20', '--comments=20',
+                 '--follows=5', '--clients=2', '--duration=0.5'],
+                env=dict(os.environ, METRICS_DIR=tmp),
+                capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        lines = result.stdout.splitlines()
+        header = lines.index(next(line for line in lines
+                                  if line.startswith('endpoint')))
+        self.assertEqual(lines[header].split(), [
+            'endpoint', 'requests', 'errors', 'rps',
+            'p50', 'ms', 'p95', 'ms', 'p99', 'ms'])
+        total = lines[-1].split()
+        self.assertEqual(total[0], 'всего')
+        self.assertGreater(int(total[1]), 0)
+        self.assertEqual(total[2], '0.0%')
+        self.assertGreater(float(total[3]), 0)
@@ -0,0 +1,84 @@
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import jobs
+from core.models import Job
+
+calls = []
+
+
+@jobs.job
+def record(value):
+    calls.append(value)
+
+
+@jobs.job(max_attempts=2)
+def flaky(value):
+    calls.append(value)
+    if len(calls) == 1:
+        raise RuntimeError('first attempt fails')
+
+
+@jobs.job(max_attempts=2)
+def broken():
+    raise RuntimeError('always fails')
+
+
+@override_settings(JOBS_RETRY_BACKOFF=60)
+class JobsTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def run_ready(self):
+        Job.objects.filter(status=Job.QUEUED).update(
+            run_after=timezone.now())
+        return jobs.work('test', burst=True)
+
+    def test_job_executed(self):
+        """задача выполняется и помечается выполненной"""
+        job = jobs.enqueue(record, 'value')
+        self.assertEqual(jobs.work('test', burst=True), 1)
+        self.assertEqual(calls, ['value'])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 1)
+
+    def test_retry_with_backoff(self):
+        """упавшая задача откладывается и выполняется повторно"""
+        job = jobs.enqueue(flaky, 'value')
+        jobs.work('test', burst=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn('first attempt fails', job.last_error)
+        self.assertEqual(jobs.work('test', burst=True), 0)
+        self.run_ready()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(calls, ['value', 'value'])
+
+    def test_failed_after_max_attempts(self):
+        """после исчерпания попыток задача помечается ошибкой"""
+        job = jobs.enqueue(broken)
+        jobs.work('test', burst=True)
+        self.run_ready()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_dedupe_pending_jobs(self):
+        """пока задача в очереди, дубль не создается"""
+        first = jobs.enqueue(record, 1, dedupe_key='record')
+        second = jobs.enqueue(record, 2, dedupe_key='record')
+        self.assertEqual(first.pk, second.pk)
+        jobs.work('test', burst=True)
+        third = jobs.enqueue(record, 3, dedupe_key='record')
+        self.assertNotEqual(first.pk, third.pk)
+
+    def test_backoff_is_capped(self):
+        """задержка растет экспоненциально до предела"""
+        with self.settings(JOBS_RETRY_BACKOFF=10,
+                           JOBS_RETRY_BACKOFF_MAX=100):
+            self.assertEqual(
+                [jobs.backoff(attempt) for attempt in range(1, 6)],
+                [10, 20, 40, 80, 100])
@@ -0,0 +1,144 @@
+import socket
+import socketserver
+import threading
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import jobs, metrics
+from core.models import Job, QueuedEmail
+
+User = get_user_model()
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Минимальный SMTP-сервер: принимает письма и считает их."""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply('220 localhost')
+        in_data = False
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                break
+            command = line.decode().strip()
+            if in_data:
+                if command == '.':
+                    in_data = False
+                    server.messages += 1
+                    self.reply('250 OK')
+                continue
+            verb = command.split(' ', 1)[0].upper()
+            if verb == 'DATA':
+                in_data = True
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                break
+            else:
+                self.reply('250 OK')
+
+
+class SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.connections = 0
+        self.messages = 0
+
+
+class QueuedEmailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = SMTPServer()
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.user = User.objects.create_user(
+            username='auth', email='auth@example.com', password='password')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.connections = 0
+        self.server.messages = 0
+        self.settings_override = override_settings(
+            EMAIL_BACKEND='core.mail.QueuedEmailBackend',
+            EMAIL_QUEUE_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=self.server.server_address[1],
+        )
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+
+    def sent_count(self):
+        key = ('yatube_mail_total', (('result', 'sent'),))
+        return metrics._values.get(key, 0)
+
+    def latency_count(self):
+        counts = metrics._values.get(('yatube_mail_latency_seconds', ()))
+        return sum(counts[:-1]) if counts else 0
+
+    def test_password_reset_is_queued(self):
+        """письмо для сброса пароля уходит задачей из очереди"""
+        sent_before = self.sent_count()
+        latency_before = self.latency_count()
+        response = Client().post(reverse('users:password_reset'),
+                                 {'email': self.user.email})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.server.messages, 0)
+        self.assertEqual(QueuedEmail.objects.count(), 1)
+        jobs.work('test', burst=True)
+        self.assertEqual(self.server.messages, 1)
+        self.assertFalse(QueuedEmail.objects.exists())
+        self.assertEqual(self.sent_count() - sent_before, 1)
+        self.assertEqual(self.latency_count() - latency_before, 1)
+
+    def test_signup_email(self):
+        """при регистрации с почтой отправляется приветствие"""
+        Client().post(reverse('users:signup'), {
+            'username': 'new_user',
+            'email': 'new@example.com',
+            'password1': 'Str0ng-pass-word',
+            'password2': 'Str0ng-pass-word',
+        })
+        jobs.work('test', burst=True)
+        self.assertEqual(self.server.messages, 1)
+
+    def test_connection_reused(self):
+        """пачка писем отправляется через одно соединение"""
+        client = Client()
+        for _ in range(3):
+            client.post(reverse('users:password_reset'),
+                        {'email': self.user.email})
+        jobs.work('test', burst=True)
+        self.assertEqual(self.server.messages, 3)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_failed_send_stays_queued(self):
+        """письмо, которое не удалось отправить, ждет повтора задачи"""
+        with socket.socket() as closed:
+            closed.bind(('127.0.0.1', 0))
+            port = closed.getsockname()[1]
+        with override_settings(EMAIL_PORT=port):
+            Client().post(reverse('users:password_reset'),
+                          {'email': self.user.email})
+            jobs.work('test', burst=True)
+        email = QueuedEmail.objects.get()
+        self.assertEqual(email.claimed_by, '')
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.attempts, 1)
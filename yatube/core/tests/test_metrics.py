@@ -0,0 +1,172 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics
+from posts.models import Post
+
+User = get_user_model()
+
+METRICS_DIR = tempfile.mkdtemp()
+
+
+@override_settings(METRICS_DIR=METRICS_DIR,
+                   METRICS_ALLOWED_NETWORKS=['127.0.0.0/8'])
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        for i in range(12):
+            Post.objects.create(author=cls.user, text=f'Пост {i}')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def scrape(self, **extra):
+        response = self.client.get(reverse('metrics'), **extra)
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def sample(self, text, line_start):
+        for line in text.splitlines():
+            if line.startswith(line_start):
+                return float(line.rsplit(' ', 1)[1])
+        return 0
+
+    def test_request_metrics(self):
+        """запросы, время ответа и число SQL по представлениям"""
+        before = self.sample(
+            self.scrape(),
+            'yatube_http_requests_total{method="GET",status="200",'
+            'view="posts:profile"}')
+        self.client.get(reverse('posts:profile', args=('auth',)))
+        text = self.scrape()
+        self.assertEqual(self.sample(
+            text, 'yatube_http_requests_total{method="GET",status="200",'
+                  'view="posts:profile"}'), before + 1)
+        self.assertIn('# TYPE yatube_http_request_duration_seconds '
+                      'histogram', text)
+        self.assertIn('yatube_http_request_duration_seconds_bucket'
+                      '{view="posts:profile",le="+Inf"}', text)
+        self.assertGreater(self.sample(
+            text, 'yatube_http_request_db_queries_sum{view="posts:profile"}'),
+            0)
+        self.assertIn('yatube_paginator_count_seconds_count', text)
+
+    def test_cache_hits_and_queues(self):
+        """попадания в кэш по алиасам и длины очередей"""
+        cache = caches['default']
+        hits = self.sample(self.scrape(), 'yatube_cache_requests_total'
+                                          '{cache="default",result="hit"}')
+        cache.set('key', 'value')
+        cache.get('key')
+        cache.get('missing')
+        text = self.scrape()
+        self.assertEqual(self.sample(
+            text, 'yatube_cache_requests_total{cache="default",'
+                  'result="hit"}'), hits + 1)
+        for queue in ('background', 'notifications', 'view_counts'):
+            with self.subTest(queue=queue):
+                self.assertIn(f'yatube_queue_depth{{queue="{queue}"}}', text)
+        self.assertIn('yatube_jobs{status="queued"} 0', text)
+
+    def test_processes_aggregated(self):
+        """значения из файлов других процессов складываются"""
+        metrics.inc('yatube_http_requests_total', view='test',
+                    method='GET', status=200)
+        metrics.gauge('yatube_test_gauge', 'Тестовый датчик', lambda: 1)
+        metrics.flush()
+        with open(os.path.join(METRICS_DIR, f'{os.getpid()}.json')) as file:
+            own = json.load(file)
+        # процесс с таким pid уже завершился: счетчики остаются,
+        # датчики нет
+        dead_path = os.path.join(METRICS_DIR, '999999999.json')
+        with open(dead_path, 'w') as file:
+            json.dump(own, file)
+        self.addCleanup(os.remove, os.path.join(METRICS_DIR,
+                                                metrics.DEAD_FILE))
+        text = self.scrape()
+        self.assertEqual(self.sample(
+            text, 'yatube_http_requests_total{method="GET",status="200",'
+                  'view="test"}'), 2)
+        self.assertEqual(self.sample(text, 'yatube_test_gauge '), 1)
+        # файл завершившегося процесса сложен в общий и удален
+        self.assertFalse(os.path.exists(dead_path))
+        self.assertEqual(self.sample(
+            self.scrape(), 'yatube_http_requests_total{method="GET",'
+                           'status="200",view="test"}'), 2)
+
+    def test_own_stale_file_folded_at_start(self):
+        """файл прежнего процесса с тем же pid не затирается"""
+        path = os.path.join(METRICS_DIR, f'{os.getpid()}.json')
+        with open(path, 'w') as file:
+            json.dump({
+                'metrics': {'yatube_test_total': ['counter', 'Тест', None]},
+                'gauges': [],
+                'values': [['yatube_test_total', {}, 3]],
+            }, file)
+        self.addCleanup(os.remove, os.path.join(METRICS_DIR,
+                                                metrics.DEAD_FILE))
+        started = metrics._started
+        metrics._started = False
+        try:
+            metrics.flush()
+        finally:
+            metrics._started = started
+        self.assertEqual(self.sample(self.scrape(), 'yatube_test_total '), 3)
+
+    def test_concurrent_flush(self):
+        """потоки переписывают файл процесса по очереди, он остается целым"""
+        errors = []
+
+        def write():
+            for _ in range(50):
+                try:
+                    metrics.flush()
+                except OSError as exc:
+                    errors.append(exc)
+
+        threads = [threading.Thread(target=write) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        with open(os.path.join(METRICS_DIR, f'{os.getpid()}.json')) as file:
+            self.assertIn('values', json.load(file))
+
+    def test_external_access_denied(self):
+        """снаружи и через прокси /metrics недоступен"""
+        for extra in ({'REMOTE_ADDR': '8.8.8.8'},
+                      {'HTTP_X_FORWARDED_FOR': '8.8.8.8'}):
+            with self.subTest(extra=extra):
+                response = self.client.get(reverse('metrics'), **extra)
+                self.assertEqual(response.status_code, 404)
+
+    @override_settings(METRICS_ALLOWED_NETWORKS=[])
+    def test_closed_by_default(self):
+        """без явно разрешенных сетей /metrics закрыт и для localhost"""
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(METRICS_ALLOWED_NETWORKS=[], METRICS_TOKEN='secret')
+    def test_token(self):
+        """с токеном /metrics доступен и через прокси"""
+        for token, status in (('secret', 200), ('wrong', 404)):
+            with self.subTest(token=token):
+                response = self.client.get(
+                    reverse('metrics'), HTTP_X_FORWARDED_FOR='8.8.8.8',
+                    HTTP_AUTHORIZATION=f'Bearer {token}')
+                self.assertEqual(response.status_code, status)
@@ -0,0 +1,123 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import counters
+from posts.models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class CacheHeadersMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            group=cls.group,
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.pk}),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_anonymous_public_headers(self):
+        """анонимам отдается public-ответ с валидаторами"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('public', response['Cache-Control'])
+                self.assertIn('s-maxage=', response['Cache-Control'])
+                self.assertIn('Cookie', response['Vary'])
+                self.assertTrue(response.has_header('ETag'))
+                self.assertTrue(response.has_header('Last-Modified'))
+
+    def test_anonymous_not_modified(self):
+        """повторный запрос с ETag получает 304 без рендеринга"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_new_post_changes_etag(self):
+        """новый пост меняет ETag ленты"""
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        etag = self.client.get(url)['ETag']
+        Post.objects.filter(pk=self.post.pk).update(
+            pub_date=self.post.pub_date.replace(year=2100))
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+
+    def test_edit_changes_validators(self):
+        """правка поста и перенос в другую группу меняют валидаторы"""
+        Post.objects.filter(pk=self.post.pk).update(
+            pub_date=self.post.pub_date.replace(year=2000))
+        old = {url: self.client.get(url) for url in self.urls}
+        self.authorized_client.post(
+            reverse('posts:post_edit', args=(self.post.pk,)),
+            {'text': 'Исправленный пост', 'group': self.group.pk})
+        for url, response in old.items():
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']).status_code,
+                    200)
+                self.assertEqual(self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                ).status_code, 200)
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        etag = self.client.get(url)['ETag']
+        Post.objects.filter(pk=self.post.pk).update(group=None)
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+
+    @override_settings(BACKGROUND_EAGER=True, VIEW_COUNTS_FLUSH_INTERVAL=60)
+    def test_not_modified_post_counts_view(self):
+        """304 для страницы поста тоже учитывает просмотр"""
+        counters.flush()
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertEqual(counters.pending(), 2)
+        counters.flush()
+
+    def test_personal_page_not_shared(self):
+        """кэшированная страница пользователя не достается анонимам"""
+        url = reverse('posts:index')
+        alice = User.objects.create_user(username='alice')
+        Follow.objects.create(user=alice, author=self.user)
+        self.client.force_login(alice)
+        response = self.client.get(url)
+        self.assertContains(response, 'alice')
+        self.assertContains(response, 'отписаться')
+        self.assertNotIn('public', response['Cache-Control'])
+        self.client.logout()
+        response = self.client.get(url)
+        self.assertNotContains(response, 'alice')
+        self.assertNotContains(response, 'отписаться')
+        self.assertIn('public', response['Cache-Control'])
+
+    def test_authorized_private_headers(self):
+        """авторизованным отдается private-ответ без валидаторов"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertIn('private', response['Cache-Control'])
+                self.assertNotIn('public', response['Cache-Control'])
+                self.assertFalse(response.has_header('ETag'))
@@ -0,0 +1,114 @@
+import marshal
+import pstats
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import profiling
+from core.models import ProfileRecord
+
+User = get_user_model()
+
+PROFILING_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(PROFILING_ROOT=PROFILING_ROOT,
+                   PROFILING_SAMPLE_INTERVAL=0.0005)
+class ProfilingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_superuser(
+            username='staff', email='staff@example.com', password='pass')
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(PROFILING_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+        self.user_client = Client()
+        self.user_client.force_login(self.user)
+
+    def test_staff_cprofile(self):
+        """сотрудник получает профиль cProfile в pstats и стеках"""
+        response = self.staff_client.get(
+            reverse('posts:profile', args=(self.user.username,)),
+            {'_profile': 'cprofile'})
+        record = ProfileRecord.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual(record.view_name, 'posts:profile')
+        self.assertEqual(record.user, self.staff)
+        files = profiling.storage()
+        stats = pstats.Stats(files.path(record.stats_file))
+        self.assertTrue(any(name == 'profile' for _, _, name in stats.stats))
+        with files.open(record.stacks_file) as stacks:
+            lines = stacks.read().decode().splitlines()
+        self.assertTrue(any('profile (' in line for line in lines))
+        for line in lines:
+            self.assertRegex(line, r' \d+$')
+
+    def test_regular_user_not_profiled(self):
+        """обычному пользователю параметр не помогает"""
+        response = self.user_client.get(
+            reverse('posts:index'), {'_profile': 'cprofile'})
+        self.assertFalse(response.has_header('X-Profile-Id'))
+        self.assertFalse(ProfileRecord.objects.exists())
+
+    def test_signed_header(self):
+        """подписанный заголовок включает сэмплирование без входа"""
+        response = self.client.get(
+            reverse('posts:index'),
+            HTTP_X_PROFILE=profiling.make_token('sample'))
+        record = ProfileRecord.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual(record.mode, ProfileRecord.SAMPLE)
+        self.assertIsNone(record.user)
+        with profiling.storage().open(record.stats_file) as stats:
+            self.assertEqual(len(marshal.load(stats)) > 0,
+                             record.samples > 0)
+
+    def test_forged_header_ignored(self):
+        """заголовок без подписи не действует"""
+        response = self.client.get(reverse('posts:index'),
+                                   HTTP_X_PROFILE='sample')
+        self.assertFalse(response.has_header('X-Profile-Id'))
+
+    def test_sampler_stats(self):
+        """сэмплы сворачиваются в стеки и pstats с вызывающими"""
+        sampler = profiling.Sampler(0, 0.01)
+        outer, inner = ('a.py', 1, 'outer'), ('a.py', 5, 'inner')
+        sampler.stacks.update({(outer, inner): 3, (outer,): 1})
+        stats = sampler.pstats()
+        self.assertEqual(stats[outer][:2], (4, 4))
+        self.assertAlmostEqual(stats[inner][2], 0.03)
+        self.assertEqual(stats[inner][4][outer][1], 3)
+        self.assertEqual(sampler.collapsed()[
+            'outer (a.py:1);inner (a.py:5)'], 3)
+
+    @override_settings(PROFILING_MAX_RECORDS=1)
+    def test_admin_download_and_cleanup(self):
+        """профиль скачивается из админки, старые удаляются с файлами"""
+        url = reverse('posts:index')
+        first = self.staff_client.get(url, {'_profile': 'cprofile'})
+        old = ProfileRecord.objects.get(pk=first['X-Profile-Id'])
+        second = self.staff_client.get(url, {'_profile': 'cprofile'})
+        self.assertEqual(
+            list(ProfileRecord.objects.values_list('pk', flat=True)),
+            [int(second['X-Profile-Id'])])
+        self.assertFalse(profiling.storage().exists(old.stats_file))
+        for kind in ('pstats', 'stacks'):
+            with self.subTest(kind=kind):
+                response = self.staff_client.get(reverse(
+                    'admin:core_profilerecord_download',
+                    args=(second['X-Profile-Id'], kind)))
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('attachment', response['Content-Disposition'])
+        response = self.staff_client.get(
+            reverse('admin:core_profilerecord_changelist'))
+        self.assertContains(response, 'pstats')
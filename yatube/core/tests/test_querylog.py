@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import querylog
+from core.models import SlowQuery
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+@override_settings(SLOW_QUERY_THRESHOLD=0, BACKGROUND_EAGER=True)
+class SlowQueryLogTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        Post.objects.create(author=cls.user, text='Тестовый пост',
+                            group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_normalize(self):
+        """значения и списки IN не влияют на отпечаток"""
+        first = querylog.normalize(
+            "SELECT * FROM t WHERE a = 'x' AND b IN (1, 2, 3) LIMIT 21")
+        second = querylog.normalize(
+            'SELECT * FROM t WHERE a = %s AND b IN (%s, %s)  LIMIT 10')
+        self.assertEqual(first, second)
+        self.assertEqual(first,
+                         'SELECT * FROM t WHERE a = ? AND b IN (...) LIMIT ?')
+
+    def test_queries_grouped_with_plan(self):
+        """запросы группируются по отпечатку, план сохраняется"""
+        url = reverse('posts:group_list', args=(self.group.slug,))
+        self.client.get(url)
+        query = SlowQuery.objects.exclude(sql__contains='COUNT').get(
+            sql__contains='"posts_post"."group_id" = ?',
+            sql__startswith='SELECT')
+        self.assertEqual(query.view_name, 'posts:group_list')
+        self.assertIn('int', query.params_shape)
+        self.assertIn('posts_post', query.plan)
+        count = query.count
+        cache.clear()
+        self.client.get(url)
+        query.refresh_from_db()
+        self.assertEqual(query.count, count * 2)
+        self.assertGreaterEqual(query.total_time, query.max_time)
+
+    @override_settings(SLOW_QUERY_THRESHOLD=60)
+    def test_fast_queries_ignored(self):
+        """запросы быстрее порога не записываются"""
+        self.client.get(reverse('posts:index'))
+        self.assertFalse(SlowQuery.objects.exists())
+
+    def test_admin_dashboard(self):
+        """сводка медленных запросов в админке"""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        self.client.force_login(admin)
+        self.client.get(reverse('posts:index'))
+        query = SlowQuery.objects.exclude(plan='').first()
+        response = self.client.get(
+            reverse('admin:core_slowquery_changelist'))
+        self.assertContains(response, 'Отпечатков')
+        response = self.client.get(
+            reverse('admin:core_slowquery_change', args=(query.pk,)))
+        self.assertContains(response, '<pre>')
@@ -0,0 +1,112 @@
+import gzip
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.http import HttpResponseNotFound
+from django.test import RequestFactory, TestCase, override_settings
+
+from core.static import (IMMUTABLE_CACHE_CONTROL, StaticFilesMiddleware,
+                         accepted_encodings)
+
+TEMP_STATIC_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SOURCE_DIR = os.path.join(TEMP_STATIC_DIR, 'source')
+STATIC_ROOT = os.path.join(TEMP_STATIC_DIR, 'root')
+CSS = b'body { color: black; }\n' * 100
+
+
+@override_settings(
+    STATICFILES_DIRS=[SOURCE_DIR],
+    STATIC_ROOT=STATIC_ROOT,
+    STATICFILES_STORAGE='core.storage.CompressedManifestStaticFilesStorage',
+    SERVE_STATIC=True,
+)
+class StaticPipelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(SOURCE_DIR, 'css'))
+        with open(os.path.join(SOURCE_DIR, 'css', 'style.css'), 'wb') as f:
+            f.write(CSS)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_STATIC_DIR, ignore_errors=True)
+
+    def setUp(self):
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.hashed_name = staticfiles_storage.stored_name('css/style.css')
+        self.middleware = StaticFilesMiddleware(
+            lambda request: HttpResponseNotFound())
+        self.factory = RequestFactory()
+
+    def test_collectstatic_writes_hashed_and_gzip_files(self):
+        """collectstatic пишет файл с хэшем и сжатую копию"""
+        self.assertNotEqual(self.hashed_name, 'css/style.css')
+        with open(staticfiles_storage.path(self.hashed_name + '.gz'),
+                  'rb') as f:
+            self.assertEqual(gzip.decompress(f.read()), CSS)
+
+    def test_hashed_file_served_compressed_and_immutable(self):
+        """файл с хэшем отдается сжатым и с immutable"""
+        request = self.factory.get(settings.STATIC_URL + self.hashed_name,
+                                   HTTP_ACCEPT_ENCODING='gzip, deflate')
+        response = self.middleware(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)), CSS)
+
+    def test_unhashed_file_short_cache(self):
+        """файл без хэша не кэшируется надолго"""
+        request = self.factory.get(settings.STATIC_URL + 'css/style.css')
+        response = self.middleware(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+    def test_missing_file_passed_through(self):
+        """несуществующий файл уходит дальше по цепочке"""
+        request = self.factory.get(settings.STATIC_URL + 'css/missing.css')
+        self.assertEqual(self.middleware(request).status_code, 404)
+
+    def test_traversal_is_not_found(self):
+        """путь за пределы STATIC_ROOT - обычный 404"""
+        request = self.factory.get(settings.STATIC_URL + '../../settings.py')
+        self.assertEqual(self.middleware(request).status_code, 404)
+
+    def test_not_modified_keeps_cache_control(self):
+        """304 сохраняет Cache-Control файла"""
+        url = settings.STATIC_URL + self.hashed_name
+        last_modified = self.middleware(self.factory.get(url))['Last-Modified']
+        response = self.middleware(self.factory.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+
+    def test_refused_encoding_not_served(self):
+        """кодировка с q=0 не отдается"""
+        request = self.factory.get(settings.STATIC_URL + self.hashed_name,
+                                   HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        response = self.middleware(request)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(response.streaming_content), CSS)
+
+
+class AcceptedEncodingsTest(TestCase):
+    def test_accept_encoding_parsing(self):
+        """Accept-Encoding разбирается по токенам и весам q"""
+        for header, expected in (
+                ('gzip, deflate, br', {'gzip', 'br'}),
+                ('gzip;q=0, br;q=0.5', {'br'}),
+                ('x-gzip-like, BR', {'br'}),
+                ('*;q=0.1, br;q=0', {'gzip'}),
+                ('identity', set()),
+                ('', set())):
+            with self.subTest(header=header):
+                self.assertEqual(accepted_encodings(header), expected)
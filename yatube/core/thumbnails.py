@@ -0,0 +1,14 @@
+from sorl.thumbnail.base import ThumbnailBackend
+
+from . import metrics
+
+metrics.histogram('yatube_thumbnail_seconds',
+                  'Время создания миниатюры sorl-thumbnail')
+
+
+class TimedThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl-thumbnail, замеряющий создание файла миниатюры."""
+
+    def _create_thumbnail(self, *args, **kwargs):
+        with metrics.timer('yatube_thumbnail_seconds'):
+            return super()._create_thumbnail(*args, **kwargs)
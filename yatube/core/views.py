@@ -1,5 +1,12 @@
+import hmac
+import ipaddress
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
 
+from . import metrics as app_metrics
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -11,3 +18,33 @@ def csrf_failure(request, reason=''):
 
 def internal_server_error(request, reason=''):
     return render(request, 'core/500.html', {'path': request.path}, status=500)
+
+
+def is_internal(request):
+    """Запрос с METRICS_TOKEN или напрямую из METRICS_ALLOWED_NETWORKS.
+
+    Запросы через обратный прокси (с X-Forwarded-For) без токена не
+    считаются внутренними, даже если прокси на localhost.
+    """
+    if settings.METRICS_TOKEN:
+        expected = f'Bearer {settings.METRICS_TOKEN}'
+        if hmac.compare_digest(
+                request.META.get('HTTP_AUTHORIZATION', '').encode(),
+                expected.encode()):
+            return True
+    if 'HTTP_X_FORWARDED_FOR' in request.META:
+        return False
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network)
+               for network in settings.METRICS_ALLOWED_NETWORKS)
+
+
+def metrics(request):
+    if not is_internal(request):
+        raise Http404
+    return HttpResponse(app_metrics.render(),
+                        content_type='text/plain; version=0.0.4; '
+                                     'charset=utf-8')
@@ -1,6 +1,43 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import format_html
 
-from .models import Group, Post
+from . import group_stats, revisions
+from .models import Group, ModerationTask, Post, PostRevision
+from .moderation import start_task
+
+
+class ModerationActionForm(ActionForm):
+    group = forms.ModelChoiceField(
+        queryset=Group.objects.all(),
+        required=False,
+        label='Группа',
+    )
+
+
+class PostRevisionInline(admin.TabularInline):
+    model = PostRevision
+    fields = ('revision_link', 'author', 'created', 'is_snapshot')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('data').select_related(
+            'author')
+
+    def revision_link(self, revision):
+        return format_html(
+            '<a href="{}">#{}</a>',
+            reverse('admin:posts_postrevision_change', args=(revision.pk,)),
+            revision.number)
+    revision_link.short_description = 'Ревизия'
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -9,6 +46,52 @@ class PostAdmin(admin.ModelAdmin):
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
+    readonly_fields = ('version', 'edited')
+    inlines = (PostRevisionInline,)
+    action_form = ModerationActionForm
+    actions = ('reassign_group', 'delete_by_author', 'purge_comments')
+
+    def save_model(self, request, obj, form, change):
+        old_group_id = form.initial.get('group') if change else None
+        if change:
+            obj.version += 1
+            obj.edited = timezone.now()
+        super().save_model(request, obj, form, change)
+        if change and 'group' in form.changed_data:
+            group_stats.post_moved(obj, old_group_id)
+        if change and 'text' in form.changed_data:
+            revisions.record(obj, form.initial['text'], request.user)
+
+    def _start(self, request, action, post_ids, group=None):
+        task = start_task(action, post_ids, user=request.user, group=group)
+        self.message_user(
+            request,
+            f'Задача #{task.pk} поставлена в очередь: '
+            f'{task.total} постов.',
+        )
+
+    def reassign_group(self, request, queryset):
+        group_id = request.POST.get('group')
+        group = Group.objects.filter(pk=group_id).first() if group_id else None
+        if group is None:
+            self.message_user(request, 'Выберите группу.', messages.ERROR)
+            return
+        self._start(request, ModerationTask.REASSIGN_GROUP,
+                    queryset.values_list('pk', flat=True), group=group)
+    reassign_group.short_description = 'Сменить группу (в фоне)'
+
+    def delete_by_author(self, request, queryset):
+        post_ids = Post.objects.filter(
+            author__in=queryset.values('author')
+        ).values_list('pk', flat=True)
+        self._start(request, ModerationTask.DELETE_BY_AUTHOR, post_ids)
+    delete_by_author.short_description = (
+        'Удалить все посты авторов (в фоне)')
+
+    def purge_comments(self, request, queryset):
+        self._start(request, ModerationTask.PURGE_COMMENTS,
+                    queryset.values_list('pk', flat=True))
+    purge_comments.short_description = 'Удалить комментарии (в фоне)'
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -17,5 +100,46 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
+class ModerationTaskAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'action', 'status', 'progress', 'created_by',
+                    'created', 'finished')
+    list_filter = ('status', 'action')
+    readonly_fields = ('action', 'status', 'group', 'created_by', 'total',
+                       'processed', 'error', 'created', 'finished')
+
+    def progress(self, obj):
+        return f'{obj.processed}/{obj.total}'
+    progress.short_description = 'Прогресс'
+
+    def has_add_permission(self, request):
+        return False
+
+
+class PostRevisionAdmin(admin.ModelAdmin):
+    list_display = ('post', 'number', 'author', 'created', 'is_snapshot',
+                    'chain', 'size')
+    list_filter = ('is_snapshot',)
+    list_select_related = ('author', 'post')
+    search_fields = ('=post__pk',)
+    fields = ('post', 'number', 'author', 'created', 'is_snapshot', 'chain',
+              'size', 'text')
+    readonly_fields = fields
+
+    def size(self, revision):
+        return len(revision.data)
+    size.short_description = 'Размер, байт'
+
+    def text(self, revision):
+        return format_html(
+            '<pre style="white-space: pre-wrap">{}</pre>',
+            revisions.text_at(revision.post_id, revision.number))
+    text.short_description = 'Текст'
+
+    def has_add_permission(self, request):
+        return False
+
+
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
+admin.site.register(ModerationTask, ModerationTaskAdmin)
+admin.site.register(PostRevision, PostRevisionAdmin)
@@ -0,0 +1,108 @@
+"""Архив старых постов.
+
+archive_posts переносит посты вместе с комментариями в ArchivedPost и
+ArchivedComment и удаляет их из горячих таблиц, так что ленты и индексы
+Post и Comment остаются маленькими. Архивные таблицы лежат в основной
+базе или в отдельной 'archive' (posts.routers).
+
+Перенос повторяем: сначала строки копируются в архив (уже
+скопированные пропускаются), затем удаляются из Post. Если процесс
+упал между шагами, следующий запуск просто удалит остаток. Вместе с
+постом удаляются история правок, рейтинг и уведомления о нем.
+
+post_detail и profile читают архив, если поста нет в горячей таблице.
+Пользователи и группы архивных постов подгружаются отдельным запросом к
+основной базе.
+"""
+from django.db import transaction
+from django.utils.functional import cached_property
+
+from .models import ArchivedComment, ArchivedPost, Comment, Post
+from .routers import archive_alias
+from .threads import thread_key
+
+POST_FIELDS = ('id', 'text', 'pub_date', 'author_id', 'group_id', 'image',
+               'views', 'version')
+COMMENT_FIELDS = ('id', 'post_id', 'author_id', 'text', 'created',
+                  'parent_id', 'path', 'depth', 'reply_count')
+
+
+def archive_posts(post_ids):
+    """Перенести посты post_ids с комментариями в архив."""
+    posts = [ArchivedPost(**values) for values in Post.objects.filter(
+        pk__in=post_ids).values(*POST_FIELDS)]
+    comments = [ArchivedComment(**values) for values in Comment.objects
+                .filter(post_id__in=post_ids).values(*COMMENT_FIELDS)]
+    with transaction.atomic(using=archive_alias()):
+        ArchivedPost.objects.bulk_create(posts, ignore_conflicts=True)
+        ArchivedComment.objects.bulk_create(comments, ignore_conflicts=True)
+    with transaction.atomic():
+        # через ORM, чтобы сработали каскады и сигналы (group_stats)
+        Post.objects.filter(pk__in=[post.pk for post in posts]).delete()
+    return len(posts)
+
+
+def _attach(objects, field):
+    """Подставить объекты связи field одним запросом к основной базе.
+
+    Объекты, чья связь уже удалена, отбрасываются, если связь
+    обязательная.
+    """
+    ids = {getattr(obj, field.attname) for obj in objects} - {None}
+    related = field.related_model.objects.in_bulk(ids) if ids else {}
+    attached = []
+    for obj in objects:
+        value = related.get(getattr(obj, field.attname))
+        if value is None and not field.null:
+            continue
+        field.set_cached_value(obj, value)
+        attached.append(obj)
+    return attached
+
+
+def attach_relations(posts):
+    # автор мог быть удален после переноса, такие посты не показываем
+    posts = _attach(posts, ArchivedPost.group.field)
+    return _attach(posts, ArchivedPost.author.field)
+
+
+def get_post(post_id):
+    """Архивный пост с автором и группой или None."""
+    posts = attach_relations(list(ArchivedPost.objects.filter(pk=post_id)))
+    return posts[0] if posts else None
+
+
+def get_comments(post):
+    """Комментарии архивного поста в порядке веток."""
+    comments = post.comments.annotate(thread_key=thread_key())
+    return _attach(list(comments.order_by('thread_key')),
+                   ArchivedComment.author.field)
+
+
+class TieredPosts:
+    """Посты автора для пагинации: сначала горячие, за ними архивные.
+
+    В архив попадают посты старше горячих, поэтому порядок по убыванию
+    даты сохраняется. Архив читается, только когда страница заходит за
+    последний горячий пост.
+    """
+    ordered = True
+
+    def __init__(self, hot, archived):
+        self.hot = hot
+        self.archived = archived
+
+    @cached_property
+    def hot_count(self):
+        return self.hot.count()
+
+    def count(self):
+        return self.hot_count + self.archived.count()
+
+    def __getitem__(self, index):
+        start, stop = index.start or 0, index.stop
+        posts = list(self.hot[start:stop]) if start < self.hot_count else []
+        if stop > self.hot_count:
+            posts += attach_relations(list(self.archived[
+                max(start - self.hot_count, 0):stop - self.hot_count]))
+        return posts
@@ -0,0 +1,12 @@
+from django.utils.functional import SimpleLazyObject
+
+from .notifications import unread_count
+
+
+def notifications(request):
+    if not request.user.is_authenticated:
+        return {}
+    user = request.user
+    return {
+        'unread_notifications': SimpleLazyObject(lambda: unread_count(user)),
+    }
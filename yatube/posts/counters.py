@@ -0,0 +1,123 @@
+"""Счетчики просмотров постов с буферизацией в памяти процесса.
+
+Просмотр только увеличивает счетчик в словаре. Не чаще раза в
+VIEW_COUNTS_FLUSH_INTERVAL секунд накопленное пишется в фоне пачкой
+UPDATE ... CASE: сразу, если интервал уже прошел, иначе по таймеру,
+так что и в простаивающем процессе просмотры не задерживаются дольше
+интервала. При обычной остановке процесса остаток пишется из atexit,
+но только в ту базу, для которой копились просмотры: временную базу
+бенчмарка к этому моменту уже удалили, ее команды выгружают буфер сами.
+База сама прибавляет приращения, поэтому несколько процессов с
+собственными буферами не мешают друг другу, а при падении процесса
+теряются только просмотры за последний интервал.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from core import metrics
+from core.background import submit
+
+from . import rankings
+from .models import Post
+from .utils import bulk_increment
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_pending = Counter()
+_last_flush = time.monotonic()
+_timer = None
+# база, в которую пойдет буфер; к выходу ее могут подменить или удалить
+_database = None
+
+
+def _take():
+    global _pending, _last_flush
+    batch, _pending = _pending, Counter()
+    _last_flush = time.monotonic()
+    return batch
+
+
+def _start_timer():
+    global _timer
+    if _timer is not None:
+        return
+    _timer = threading.Timer(settings.VIEW_COUNTS_FLUSH_INTERVAL, _on_timer)
+    _timer.daemon = True
+    _timer.start()
+
+
+def _on_timer():
+    global _timer
+    with _lock:
+        _timer = None
+        batch = _take()
+    submit(write, batch)
+
+
+def record_view(post_id):
+    global _database
+    with _lock:
+        if not _pending:
+            _database = connection.settings_dict['NAME']
+        _pending[post_id] += 1
+        if (time.monotonic() - _last_flush
+                < settings.VIEW_COUNTS_FLUSH_INTERVAL):
+            # новых просмотров может и не быть
+            _start_timer()
+            return
+        batch = _take()
+    submit(write, batch)
+
+
+def flush():
+    """Записать накопленные просмотры сразу."""
+    global _timer
+    with _lock:
+        if _timer is not None:
+            _timer.cancel()
+            _timer = None
+        batch = _take()
+    write(batch)
+
+
+def pending():
+    with _lock:
+        return sum(_pending.values())
+
+
+metrics.queue_depth('view_counts', pending)
+
+
+def _flush_at_exit():
+    count = pending()
+    if not settings.VIEW_COUNTS_FLUSH_AT_EXIT or not count:
+        return
+    if connection.settings_dict['NAME'] != _database:
+        logger.warning('Dropping %d post views: database %s is gone',
+                       count, _database)
+        return
+    flush()
+
+
+atexit.register(_flush_at_exit)
+
+
+def write(counts):
+    if not counts:
+        return
+    try:
+        with transaction.atomic():
+            bulk_increment(Post, 'views', counts)
+            rankings.add_views(counts)
+    except Exception:
+        logger.exception('Flushing %d post view counts failed', len(counts))
+        # вернем в буфер, запишутся при следующей выгрузке
+        with _lock:
+            _pending.update(counts)
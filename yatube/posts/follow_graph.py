@@ -0,0 +1,130 @@
+"""Граф подписок в кэше.
+
+Для каждого пользователя в кэше лежат отсортированные массивы id тех,
+на кого он подписан, и его подписчиков. Массивы обновляются сигналами
+при подписке и отписке, поэтому чтение не обращается к базе.
+
+Сигнал обновляет только кэш процесса, обработавшего подписку, поэтому
+граф кэшируется, лишь когда кэш общий для всех процессов
+(core.cache.is_shared). С LocMem массивы каждый раз читаются из базы.
+"""
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.cache import is_shared
+
+from .models import Follow
+
+FOLLOWING_KEY = 'follow_graph:following:{}'
+FOLLOWERS_KEY = 'follow_graph:followers:{}'
+ARRAY_TYPECODE = 'I'
+
+
+def _query_many(key_template, user_ids):
+    """Массивы для user_ids одним запросом."""
+    if key_template == FOLLOWING_KEY:
+        rows = Follow.objects.filter(user_id__in=user_ids).values_list(
+            'user_id', 'author_id')
+    else:
+        rows = Follow.objects.filter(author_id__in=user_ids).values_list(
+            'author_id', 'user_id')
+    ids = {user_id: [] for user_id in user_ids}
+    for user_id, other_id in rows:
+        ids[user_id].append(other_id)
+    return {user_id: array(ARRAY_TYPECODE, sorted(other_ids))
+            for user_id, other_ids in ids.items()}
+
+
+def _store(key_template, user_id):
+    ids = _query_many(key_template, [user_id])[user_id]
+    cache.set(key_template.format(user_id), ids.tobytes(),
+              settings.FOLLOW_GRAPH_TIMEOUT)
+    return ids
+
+
+def _load_many(key_template, user_ids):
+    if not is_shared():
+        return _query_many(key_template, user_ids)
+    keys = {key_template.format(user_id): user_id for user_id in user_ids}
+    cached = cache.get_many(keys)
+    result = {}
+    for key, user_id in keys.items():
+        if key in cached:
+            ids = array(ARRAY_TYPECODE)
+            ids.frombytes(cached[key])
+            result[user_id] = ids
+        else:
+            result[user_id] = _store(key_template, user_id)
+    return result
+
+
+def _load(key_template, user_id):
+    return _load_many(key_template, [user_id])[user_id]
+
+
+def following_of(user_id):
+    """Отсортированный массив id авторов, на которых подписан user_id."""
+    return _load(FOLLOWING_KEY, user_id)
+
+
+def followers_of(user_id):
+    """Отсортированный массив id подписчиков user_id."""
+    return _load(FOLLOWERS_KEY, user_id)
+
+
+def is_following(user_id, author_id):
+    if user_id is None:
+        return False
+    ids = following_of(user_id)
+    position = bisect_left(ids, author_id)
+    return position < len(ids) and ids[position] == author_id
+
+
+def mutuals(user_id):
+    """id пользователей, подписанных друг на друга с user_id."""
+    return sorted(set(following_of(user_id)) & set(followers_of(user_id)))
+
+
+def suggested_authors(user_id, limit=10):
+    """Авторы, на которых чаще всего подписаны авторы из подписок."""
+    following = following_of(user_id)
+    counter = Counter()
+    for ids in _load_many(FOLLOWING_KEY, following).values():
+        counter.update(ids)
+    excluded = set(following)
+    excluded.add(user_id)
+    return [
+        author_id for author_id, _ in counter.most_common()
+        if author_id not in excluded
+    ][:limit]
+
+
+def annotate_following(user, objects, author_attr='author_id'):
+    """Проставить объектам is_following одной проверкой по массиву подписок.
+
+    Подходит для страницы постов (author_attr='author_id') и для списка
+    пользователей (author_attr='pk').
+    """
+    following = set(following_of(user.id)) if user.is_authenticated else ()
+    for obj in objects:
+        obj.is_following = getattr(obj, author_attr) in following
+    return objects
+
+
+def refresh(user_id, author_id):
+    if not is_shared():
+        return
+    _store(FOLLOWING_KEY, user_id)
+    _store(FOLLOWERS_KEY, author_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    refresh(instance.user_id, instance.author_id)
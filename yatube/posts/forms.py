@@ -1,4 +1,6 @@
 from django import forms
+from django.db.models import F
+from django.utils import timezone
 
 from .models import Post, Comment
 
@@ -8,6 +10,40 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def __init__(self, *args, version=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # версия поста, которую видел автор правки; шаблон отдает ее
+        # скрытым полем вне формы, чтобы набор полей поста не менялся
+        if version is None and self.instance.pk and not self.is_bound:
+            version = self.instance.version
+        self.version = version
+
+    def save_changed(self):
+        """Записать только измененные поля одним UPDATE.
+
+        Если форме передана версия, а пост с тех пор изменили, ничего не
+        пишется и возвращается False. Неизмененная картинка не
+        перезаписывается.
+        """
+        post = self.instance
+        fields = [name for name in self.changed_data
+                  if name in self._meta.fields]
+        if not fields:
+            return True
+        # pre_save сохраняет в хранилище только новый файл картинки
+        values = {name: Post._meta.get_field(name).pre_save(post, False)
+                  for name in fields}
+        posts = Post.objects.filter(pk=post.pk)
+        if self.version is not None:
+            posts = posts.filter(version=self.version)
+        if not posts.update(version=F('version') + 1,
+                            edited=timezone.now(), **values):
+            if 'image' in fields and post.image:
+                post.image.delete(save=False)
+            return False
+        post.refresh_from_db(fields=['version'])
+        return True
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,164 @@
+"""Статистика групп для каталога /groups/.
+
+Счетчики в GroupStats и GroupAuthorStats меняются на единицу при
+создании и удалении поста (сигналы) и при переносе поста в другую
+группу (post_moved из post_edit и админки). Массовые изменения через
+QuerySet.update сигналов не шлют, поэтому после них вызывается
+rebuild для затронутых групп.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DateTimeField, F, Max, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.cache import shared_timeout
+
+from .models import Group, GroupAuthorStats, GroupStats, Post, User
+
+DIRECTORY_KEY = 'group_stats:directory'
+
+TOP_AUTHORS_SQL = '''
+    SELECT id, group_id, author_id, post_count FROM (
+        SELECT s.*, ROW_NUMBER() OVER (
+            PARTITION BY s.group_id ORDER BY s.post_count DESC, s.author_id
+        ) AS position
+        FROM posts_groupauthorstats s
+    ) WHERE position <= %s
+'''
+
+
+def _add(group_id, author_id, delta, pub_date):
+    if group_id is None:
+        return
+    fields = {'post_count': F('post_count') + delta}
+    if delta > 0:
+        pub_date = Value(pub_date, output_field=DateTimeField())
+        fields['last_activity'] = Greatest(
+            Coalesce('last_activity', pub_date), pub_date)
+    updated = GroupStats.objects.filter(pk=group_id).update(**fields)
+    if not updated:
+        # строки еще нет: посчитаем группу целиком
+        rebuild([group_id])
+        return
+    if delta < 0:
+        # удален, возможно, самый свежий пост группы
+        GroupStats.objects.filter(
+            pk=group_id, last_activity__lte=pub_date
+        ).update(last_activity=Post.objects.filter(
+            group_id=group_id).aggregate(latest=Max('pub_date'))['latest'])
+    updated = GroupAuthorStats.objects.filter(
+        group_id=group_id, author_id=author_id
+    ).update(post_count=F('post_count') + delta)
+    if not updated and delta > 0:
+        # строку мог только что создать параллельный запрос
+        _, created = GroupAuthorStats.objects.get_or_create(
+            group_id=group_id, author_id=author_id,
+            defaults={'post_count': delta})
+        if not created:
+            GroupAuthorStats.objects.filter(
+                group_id=group_id, author_id=author_id
+            ).update(post_count=F('post_count') + delta)
+    elif delta < 0:
+        GroupAuthorStats.objects.filter(
+            group_id=group_id, author_id=author_id, post_count=0).delete()
+    cache.delete(DIRECTORY_KEY)
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        _add(instance.group_id, instance.author_id, 1, instance.pub_date)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    _add(instance.group_id, instance.author_id, -1, instance.pub_date)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, **kwargs):
+    cache.delete(DIRECTORY_KEY)
+
+
+def post_moved(post, old_group_id):
+    """Учесть перенос поста из old_group_id в его текущую группу."""
+    if post.group_id == old_group_id:
+        return
+    with transaction.atomic():
+        _add(old_group_id, post.author_id, -1, post.pub_date)
+        _add(post.group_id, post.author_id, 1, post.pub_date)
+
+
+def rebuild(group_ids=None):
+    """Пересчитать статистику групп group_ids (по умолчанию всех)."""
+    posts = Post.objects.filter(group__isnull=False)
+    group_stats = GroupStats.objects.all()
+    author_stats = GroupAuthorStats.objects.all()
+    if group_ids is not None:
+        group_ids = [pk for pk in group_ids if pk is not None]
+        posts = posts.filter(group_id__in=group_ids)
+        group_stats = group_stats.filter(group_id__in=group_ids)
+        author_stats = author_stats.filter(group_id__in=group_ids)
+    with transaction.atomic():
+        group_stats.delete()
+        author_stats.delete()
+        GroupStats.objects.bulk_create(
+            GroupStats(group_id=row['group_id'],
+                       post_count=row['post_count'],
+                       last_activity=row['last_activity'])
+            for row in posts.order_by().values('group_id').annotate(
+                post_count=Count('pk'), last_activity=Max('pub_date'))
+        )
+        GroupAuthorStats.objects.bulk_create(
+            GroupAuthorStats(**row)
+            for row in posts.order_by().values(
+                'group_id', 'author_id').annotate(post_count=Count('pk'))
+        )
+    cache.delete(DIRECTORY_KEY)
+
+
+def _build_directory():
+    top_authors = {}
+    for row in GroupAuthorStats.objects.raw(
+            TOP_AUTHORS_SQL, [settings.GROUP_DIRECTORY_TOP_AUTHORS]):
+        top_authors.setdefault(row.group_id, []).append(row)
+    authors = {
+        row.author_id for rows in top_authors.values() for row in rows}
+    names = {
+        user.pk: (user.get_full_name() or user.username, user.username)
+        for user in User.objects.filter(pk__in=authors)
+    }
+    directory = []
+    groups = Group.objects.select_related('stats').order_by(
+        F('stats__post_count').desc(nulls_last=True), 'title')
+    for group in groups:
+        stats = getattr(group, 'stats', None)
+        directory.append({
+            'title': group.title,
+            'slug': group.slug,
+            'description': group.description,
+            'post_count': stats.post_count if stats else 0,
+            'last_activity': stats.last_activity if stats else None,
+            'top_authors': [
+                {'name': names[row.author_id][0],
+                 'username': names[row.author_id][1],
+                 'post_count': row.post_count}
+                for row in top_authors.get(group.pk, [])
+            ],
+        })
+    return directory
+
+
+def directory():
+    """Каталог групп из кэша; пересобирается после любого изменения."""
+    result = cache.get(DIRECTORY_KEY)
+    if result is None:
+        result = _build_directory()
+        # сброс ключа доходит только до кэша своего процесса
+        cache.set(DIRECTORY_KEY, result,
+                  shared_timeout(settings.GROUP_DIRECTORY_TIMEOUT))
+    return result
@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts import archive
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Перенести старые посты с комментариями в архивные таблицы '
+            '(posts.archive)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            default=settings.POST_ARCHIVE_AFTER_DAYS,
+                            help='переносить посты старше стольких дней')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='только посчитать посты')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        old_posts = Post.objects.filter(pub_date__lt=cutoff).order_by('pk')
+        if options['dry_run']:
+            self.stdout.write(f'Постов к переносу: {old_posts.count()}')
+            return
+        moved = 0
+        while True:
+            # каждая пачка удаляется из Post, поэтому всегда берем первую
+            ids = list(old_posts.values_list('pk', flat=True)[
+                :options['batch_size']])
+            if not ids:
+                break
+            moved += archive.archive_posts(ids)
+            self.stdout.write(f'Перенесено постов: {moved}')
+        self.stdout.write(f'Готово, перенесено постов: {moved}')
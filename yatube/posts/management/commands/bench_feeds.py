@@ -0,0 +1,119 @@
+import os
+import statistics
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+
+from core.benchmark import test_database
+from posts import partitions
+from posts.models import Follow, Group, Post
+from posts.utils import NUM_POST_ON_THE_PAGE, FeedPaginator
+
+
+def offset_page(queryset, number, cursor):
+    # как ленты с ?page=: COUNT(*) и OFFSET
+    paginator = FeedPaginator(queryset.order_by(*partitions.ORDERING),
+                              NUM_POST_ON_THE_PAGE)
+    return list(paginator.get_page(number))
+
+
+def keyset_page(queryset, number, cursor):
+    # курсор по всей таблице, без разделов
+    position = partitions.parse_cursor(cursor) if cursor else None
+    matching = queryset
+    if position is not None:
+        matching = partitions.after(queryset, position)
+    return partitions.page_rows(queryset, matching, NUM_POST_ON_THE_PAGE + 1)
+
+
+def partitioned_page(queryset, number, cursor):
+    return partitions.feed_page(queryset, NUM_POST_ON_THE_PAGE, cursor)
+
+
+METHODS = (('offset', offset_page), ('keyset', keyset_page),
+           ('partitioned', partitioned_page))
+
+
+class Command(BaseCommand):
+    help = ('Время страниц лент index, group_posts и follow_index на '
+            'разной глубине: OFFSET с COUNT(*), курсор по всей таблице и '
+            'курсор по месячным разделам (posts.partitions)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--follows', type=int, default=200000)
+        parser.add_argument('--days', type=int, default=5 * 365)
+        parser.add_argument('--pages', type=int, nargs='+',
+                            default=[1, 10, 100, 1000])
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--database',
+                            help='файл базы вместо памяти: если его нет, '
+                                 'данные создаются и файл сохраняется, '
+                                 'если есть - замер идет по нему')
+        parser.add_argument('--without-indexes', action='store_true',
+                            help='удалить индексы лент перед замером')
+
+    def handle(self, *args, **options):
+        name = options['database']
+        if name and os.path.exists(name):
+            # набор на десятки миллионов постов создается долго
+            with test_database(name, keep=True):
+                self.report(options)
+            return
+        with test_database(name, keep=name is not None):
+            call_command(
+                'generate_dataset', posts=options['posts'],
+                users=options['users'], groups=options['groups'],
+                follows=options['follows'], comments=0,
+                days=options['days'], no_rebuild=True, stdout=self.stdout)
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            self.report(options)
+
+    def report(self, options):
+        if options['without_indexes']:
+            with connection.schema_editor() as editor:
+                for index in Post._meta.indexes:
+                    editor.remove_index(Post, index)
+        self.stdout.write(
+            f'{"feed":<8}{"page":>6}'
+            + ''.join(f'{name + " ms":>16}' for name, _ in METHODS))
+        for feed, queryset in self.feeds():
+            for number in options['pages']:
+                self.measure(feed, queryset, number, options['repeat'])
+
+    def feeds(self):
+        group = Group.objects.annotate(size=Count('posts')).order_by(
+            '-size').first()
+        reader = Follow.objects.values('user').annotate(
+            size=Count('pk')).order_by('-size').first()
+        return (
+            ('index', Post.objects.select_related('group', 'author')),
+            ('group', group.posts.select_related('author')),
+            ('follow', Post.objects.filter(
+                author__following__user=reader['user'])),
+        )
+
+    def measure(self, feed, queryset, number, repeat):
+        offset = (number - 1) * NUM_POST_ON_THE_PAGE
+        cursor = None
+        if offset:
+            last = queryset.order_by(*partitions.ORDERING)[offset - 1:offset]
+            if not last:
+                return
+            cursor = partitions.make_cursor(last[0])
+        times = []
+        for _, method in METHODS:
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                method(queryset, number, cursor)
+                samples.append((time.perf_counter() - started) * 1000)
+            times.append(statistics.median(samples))
+        self.stdout.write(f'{feed:<8}{number:>6}'
+                          + ''.join(f'{ms:>16.2f}' for ms in times))
@@ -0,0 +1,86 @@
+import timeit
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory
+from django.utils import timezone
+
+from posts.models import Group, Post, User
+
+FEED_TEMPLATES = (
+    'posts/index.html',
+    'posts/group_list.html',
+    'posts/profile.html',
+    'posts/follow.html',
+)
+PLAIN_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+CACHED_LOADERS = [('django.template.loaders.cached.Loader', PLAIN_LOADERS)]
+
+
+def make_engine(loaders):
+    config = settings.TEMPLATES[0]
+    return DjangoTemplates({
+        'NAME': 'bench',
+        'DIRS': config['DIRS'],
+        'APP_DIRS': False,
+        'OPTIONS': {
+            'context_processors': config['OPTIONS']['context_processors'],
+            'loaders': loaders,
+        },
+    })
+
+
+def make_page(size):
+    author = User(pk=1, username='bench', first_name='Bench',
+                  last_name='User')
+    group = Group(pk=1, title='Bench', slug='bench', description='Bench')
+    now = timezone.now()
+    posts = [
+        Post(pk=i, text=f'Текст поста {i}\nвторая строка', pub_date=now,
+             author=author, group=group)
+        for i in range(1, size + 1)
+    ]
+    page_obj = Paginator(posts, size).get_page(1)
+    return {'page_obj': page_obj, 'author': author, 'group': group}
+
+
+class Command(BaseCommand):
+    help = 'Замер времени рендеринга лент постов (10, 50 и 100 на странице)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+',
+                            default=[10, 50, 100])
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        backends = [
+            ('plain', make_engine(PLAIN_LOADERS)),
+            ('cached', make_engine(CACHED_LOADERS)),
+        ]
+        if 'jinja2' in engines:
+            backends.append(('jinja2', engines['jinja2']))
+        self.stdout.write(f'{"template":<24}{"posts":>6}'
+                          + ''.join(f'{name:>12}' for name, _ in backends))
+        for template_name in FEED_TEMPLATES:
+            for size in options['sizes']:
+                context = make_page(size)
+                row = f'{template_name:<24}{size:>6}'
+                for _, engine in backends:
+                    def render():
+                        engine.get_template(template_name).render(
+                            dict(context), request)
+                    render()
+                    # минимум из нескольких серий меньше зависит от шума
+                    seconds = min(timeit.repeat(
+                        render, number=options['repeat'], repeat=5))
+                    row += f'{seconds / options["repeat"] * 1000:>9.2f} ms'
+                self.stdout.write(row)
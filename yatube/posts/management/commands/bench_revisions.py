@@ -0,0 +1,86 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from django.test import override_settings
+
+from core.benchmark import percentile, test_database
+from posts import revisions
+from posts.models import Post, PostRevision, User
+
+WORDS = ('лев', 'толстой', 'дорога', 'поле', 'утро', 'город', 'письмо',
+         'река', 'книга', 'сад', 'осень', 'дом', 'друг', 'вечер')
+
+
+def edit(rng, text):
+    """Небольшая правка: заменить, вставить или удалить пару слов."""
+    words = text.split(' ')
+    position = rng.randrange(len(words))
+    count = rng.randint(1, 3)
+    action = rng.random()
+    if action < 0.4:
+        words[position:position + count] = rng.choices(WORDS, k=count)
+    elif action < 0.8 or len(words) < 10:
+        words[position:position] = rng.choices(WORDS, k=count)
+    else:
+        del words[position:position + count]
+    return ' '.join(words)
+
+
+class Command(BaseCommand):
+    help = ('Размер истории правок и время сборки версии для поста с '
+            'множеством правок при разной частоте полных снимков')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--edits', type=int, default=500)
+        parser.add_argument('--words', type=int, default=1000,
+                            help='длина исходного текста, в словах')
+        parser.add_argument('--snapshot-every', type=int, nargs='+',
+                            default=[1, 8, 16, 32, 64])
+        parser.add_argument('--reads', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with test_database():
+            author = User.objects.create_user(username='bench')
+            self.stdout.write(
+                f'{"every":>6}{"revisions":>10}{"full KB":>9}'
+                f'{"stored KB":>10}{"ratio":>7}{"write ms":>9}'
+                f'{"read p50":>9}{"read p95":>9}{"read max":>9}')
+            for every in options['snapshot_every']:
+                with override_settings(POST_REVISION_SNAPSHOT_EVERY=every):
+                    self.run(author, every, options)
+
+    def run(self, author, every, options):
+        rng = random.Random(options['seed'])
+        text = ' '.join(rng.choices(WORDS, k=options['words']))
+        post = Post.objects.create(author=author, text=text)
+        full_size = 0
+        started = time.perf_counter()
+        for _ in range(options['edits']):
+            old_text, text = text, edit(rng, text)
+            # как post_edit: UPDATE с новой версией, затем ревизия
+            Post.objects.filter(pk=post.pk).update(
+                text=text, version=F('version') + 1)
+            post.text = text
+            post.version += 1
+            revisions.record(post, old_text, author)
+            full_size += len(text.encode())
+        write = (time.perf_counter() - started) / options['edits']
+        numbers = list(post.revisions.values_list('number', flat=True))
+        stored = sum(len(data) for data in post.revisions.values_list(
+            'data', flat=True))
+        latencies = []
+        for number in rng.choices(numbers, k=options['reads']):
+            started = time.perf_counter()
+            revisions.text_at(post.pk, number)
+            latencies.append((time.perf_counter() - started) * 1000)
+        latencies.sort()
+        assert revisions.text_at(post.pk, post.version) == text
+        self.stdout.write(
+            f'{every:>6}{len(numbers):>10}{full_size / 1024:>9.0f}'
+            f'{stored / 1024:>10.0f}{full_size / stored:>7.1f}'
+            f'{write * 1000:>9.2f}{percentile(latencies, 50):>9.2f}'
+            f'{percentile(latencies, 95):>9.2f}{latencies[-1]:>9.2f}')
+        PostRevision.objects.filter(post=post).delete()
@@ -0,0 +1,231 @@
+import random
+import time
+from datetime import timedelta
+from io import BytesIO
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image
+
+from core.benchmark import zipf_cum_weights
+from posts import group_stats, rankings
+from posts.models import Comment, Follow, Group, Post
+from posts.utils import bulk_insert
+
+User = get_user_model()
+
+IMAGE_VARIANTS = 10
+WORDS = ('лев', 'толстой', 'дорога', 'поле', 'утро', 'город', 'письмо',
+         'река', 'книга', 'сад', 'осень', 'дом', 'друг', 'вечер')
+
+
+class Command(BaseCommand):
+    help = ('Синтетические данные для нагрузочных тестов: пользователи, '
+            'группы, посты, комментарии и подписки со степенным '
+            'распределением популярности. Посты, комментарии и подписки '
+            'пишутся пачками через executemany в обход ORM.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=300000)
+        parser.add_argument('--follows', type=int, default=50000)
+        parser.add_argument('--author-skew', type=float, default=1.1,
+                            help='насколько посты сосредоточены у '
+                                 'популярных авторов')
+        parser.add_argument('--group-skew', type=float, default=1.0)
+        parser.add_argument('--post-skew', type=float, default=1.2,
+                            help='насколько комментарии сосредоточены '
+                                 'на вирусных постах')
+        parser.add_argument('--grouped', type=float, default=0.7,
+                            help='доля постов с группой')
+        parser.add_argument('--images', type=float, default=0.0,
+                            help='доля постов с картинкой-заглушкой')
+        parser.add_argument('--days', type=int, default=365,
+                            help='за сколько дней распределить даты')
+        parser.add_argument('--chunk-size', type=int, default=50000)
+        parser.add_argument('--prefix', default='gen',
+                            help='префикс имен пользователей и групп')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--no-rebuild', action='store_true',
+                            help='не пересчитывать статистику групп и '
+                                 'рейтинги (rebuild_group_stats и '
+                                 'refresh_rankings --full позже)')
+
+    def handle(self, *args, **options):
+        if User.objects.filter(
+                username__startswith=options['prefix']).exists():
+            raise CommandError(
+                f'Пользователи с префиксом {options["prefix"]} уже есть, '
+                f'задайте другой --prefix')
+        self.rng = random.Random(options['seed'])
+        self.options = options
+        self.now = timezone.now()
+        started = time.perf_counter()
+        if connection.vendor == 'sqlite' and not connection.in_atomic_block:
+            # данные можно сгенерировать заново, надежность не нужна
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA synchronous = OFF')
+        user_ids = self.create_users()
+        group_ids = self.create_groups()
+        post_ids = self.create_posts(user_ids, group_ids)
+        self.create_comments(user_ids, post_ids)
+        self.create_follows(user_ids)
+        if not options['no_rebuild']:
+            # bulk-вставка не шлет сигналов, производные таблицы
+            # считаются заново
+            stage = time.perf_counter()
+            group_stats.rebuild()
+            rankings.rebuild()
+            self.log(f'Статистика групп и рейтинги пересчитаны за '
+                     f'{time.perf_counter() - stage:.1f} с')
+        cache.clear()
+        self.log(f'Готово за {time.perf_counter() - started:.1f} с')
+
+    def log(self, message):
+        self.stdout.write(message)
+
+    def random_date(self):
+        seconds = self.rng.random() * self.options['days'] * 24 * 60 * 60
+        return connection.ops.adapt_datetimefield_value(
+            self.now - timedelta(seconds=seconds))
+
+    def insert(self, model, fields, rows, ignore_conflicts=False):
+        """Вставить строки пачками по chunk-size, каждую в транзакции."""
+        started = time.perf_counter()
+        total = 0
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, self.options['chunk_size']))
+            if not chunk:
+                break
+            with transaction.atomic():
+                bulk_insert(model, fields, chunk, ignore_conflicts)
+            total += len(chunk)
+        self.log(f'{model._meta.verbose_name_plural}: {total} '
+                 f'за {time.perf_counter() - started:.1f} с')
+
+    def ids(self, model, **filters):
+        return list(model.objects.filter(**filters).order_by(
+            'pk').values_list('pk', flat=True))
+
+    def create_users(self):
+        prefix = self.options['prefix']
+        password = make_password(None)
+        User.objects.bulk_create(
+            User(username=f'{prefix}{i}', first_name='Пользователь',
+                 last_name=str(i), password=password)
+            for i in range(self.options['users'])
+        )
+        self.log(f'Пользователи: {self.options["users"]}')
+        return self.ids(User, username__startswith=prefix)
+
+    def create_groups(self):
+        prefix = self.options['prefix']
+        Group.objects.bulk_create(
+            Group(title=f'Группа {i}', slug=f'{prefix}-group-{i}',
+                  description='Описание группы')
+            for i in range(self.options['groups'])
+        )
+        self.log(f'Группы: {self.options["groups"]}')
+        return self.ids(Group, slug__startswith=f'{prefix}-group-')
+
+    def placeholder_images(self):
+        images = []
+        for variant in range(IMAGE_VARIANTS):
+            buffer = BytesIO()
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            Image.new('RGB', (960, 540), color).save(buffer, 'JPEG')
+            images.append(default_storage.save(
+                f'posts/placeholder_{variant}.jpg',
+                ContentFile(buffer.getvalue())))
+        return images
+
+    def text(self, low, high):
+        return ' '.join(self.rng.choices(WORDS, k=self.rng.randint(low, high)))
+
+    def create_posts(self, user_ids, group_ids):
+        rng = self.rng
+        options = self.options
+        images = self.placeholder_images() if options['images'] else []
+        author_weights = zipf_cum_weights(len(user_ids),
+                                          options['author_skew'])
+        group_weights = zipf_cum_weights(len(group_ids),
+                                         options['group_skew'])
+        last_pk = Post.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0
+
+        def rows():
+            chunk_size = options['chunk_size']
+            for start in range(0, options['posts'], chunk_size):
+                count = min(chunk_size, options['posts'] - start)
+                authors = rng.choices(user_ids, cum_weights=author_weights,
+                                      k=count)
+                groups = (rng.choices(group_ids, cum_weights=group_weights,
+                                      k=count)
+                          if group_ids else [None] * count)
+                for author_id, group_id in zip(authors, groups):
+                    if rng.random() >= options['grouped']:
+                        group_id = None
+                    image = (rng.choice(images)
+                             if images and rng.random() < options['images']
+                             else '')
+                    yield (self.text(5, 60), self.random_date(), author_id,
+                           group_id, image, 0, 1)
+
+        self.insert(Post, ('text', 'pub_date', 'author', 'group', 'image',
+                           'views', 'version'), rows())
+        post_ids = self.ids(Post, pk__gt=last_pk)
+        # вирусные посты разбросаны по времени, а не только самые старые
+        rng.shuffle(post_ids)
+        return post_ids
+
+    def create_comments(self, user_ids, post_ids):
+        rng = self.rng
+        options = self.options
+        if not post_ids:
+            return
+        post_weights = zipf_cum_weights(len(post_ids), options['post_skew'])
+
+        def rows():
+            chunk_size = options['chunk_size']
+            for start in range(0, options['comments'], chunk_size):
+                count = min(chunk_size, options['comments'] - start)
+                posts = rng.choices(post_ids, cum_weights=post_weights,
+                                    k=count)
+                for post_id in posts:
+                    # комментарии верхнего уровня, без ответов
+                    yield (post_id, rng.choice(user_ids), self.text(1, 15),
+                           self.random_date(), '', 0, 0)
+
+        self.insert(Comment, ('post', 'author', 'text', 'created', 'path',
+                              'depth', 'reply_count'), rows())
+
+    def create_follows(self, user_ids):
+        rng = self.rng
+        options = self.options
+        author_weights = zipf_cum_weights(len(user_ids),
+                                          options['author_skew'])
+
+        def rows():
+            chunk_size = options['chunk_size']
+            for start in range(0, options['follows'], chunk_size):
+                count = min(chunk_size, options['follows'] - start)
+                authors = rng.choices(user_ids, cum_weights=author_weights,
+                                      k=count)
+                for author_id in authors:
+                    user_id = rng.choice(user_ids)
+                    if user_id != author_id:
+                        yield user_id, author_id
+
+        # повторные пары отбрасывает ограничение unique_follow
+        self.insert(Follow, ('user', 'author'), rows(),
+                    ignore_conflicts=True)
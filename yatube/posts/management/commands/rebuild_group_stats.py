@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts import group_stats
+from posts.models import GroupStats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитать статистику групп для каталога /groups/'
+
+    def handle(self, *args, **options):
+        group_stats.rebuild()
+        self.stdout.write(f'Групп с постами: {GroupStats.objects.count()}')
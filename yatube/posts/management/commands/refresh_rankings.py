@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts import rankings
+
+
+class Command(BaseCommand):
+    help = ('Учесть новые посты и комментарии в рейтингах популярного; '
+            'запускать по cron или через очередь задач')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='пересчитать рейтинги с нуля')
+
+    def handle(self, *args, **options):
+        if options['full']:
+            processed = rankings.rebuild()
+        else:
+            processed = rankings.refresh()
+        self.stdout.write(f'Учтено событий: {processed}')
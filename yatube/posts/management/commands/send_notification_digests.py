@@ -0,0 +1,56 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+
+from posts.models import Notification
+
+
+def digest_message(user, notifications):
+    lines = []
+    for notification in notifications:
+        if notification.kind == Notification.NEW_COMMENT:
+            action = 'прокомментировал ваш пост'
+        else:
+            action = 'опубликовал новый пост'
+        lines.append(f'{notification.actor.username} {action} '
+                     f'«{notification.post}»')
+    return EmailMessage(
+        subject=f'Yatube: новых уведомлений - {len(notifications)}',
+        body='\n'.join(lines),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[user.email],
+    )
+
+
+class Command(BaseCommand):
+    help = ('Письма-дайджесты о непрочитанных уведомлениях: одно письмо '
+            'на пользователя, все письма через одно соединение')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        pending = Notification.objects.filter(
+            is_read=False, emailed=False
+        ).exclude(user__email='').select_related('user', 'actor', 'post')
+        sent = 0
+        connection = get_connection()
+        while True:
+            batch = list(pending[:options['batch_size']])
+            if not batch:
+                break
+            by_user = defaultdict(list)
+            for notification in batch:
+                by_user[notification.user].append(notification)
+            messages = [
+                digest_message(user, notifications)
+                for user, notifications in by_user.items()
+            ]
+            connection.send_messages(messages)
+            Notification.objects.filter(
+                pk__in=[notification.pk for notification in batch]
+            ).update(emailed=True)
+            sent += len(messages)
+        self.stdout.write(f'Отправлено писем: {sent}')
@@ -0,0 +1,37 @@
+# Generated by Django 2.2.16 on 2026-10-19 08:16
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0007_auto_20220830_0915'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModerationTask',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('reassign_group', 'Смена группы'), ('delete_by_author', 'Удаление постов авторов'), ('purge_comments', 'Удаление комментариев')], max_length=32, verbose_name='Действие')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Выполняется'), ('done', 'Завершена'), ('failed', 'Ошибка')], default='queued', max_length=16, verbose_name='Статус')),
+                ('post_ids', models.TextField(verbose_name='Идентификаторы постов')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Всего')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='Обработано')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Создана')),
+                ('finished', models.DateTimeField(blank=True, null=True, verbose_name='Завершена')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Модератор')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='posts.Group', verbose_name='Новая группа')),
+            ],
+            options={
+                'verbose_name': 'Задача модерации',
+                'verbose_name_plural': 'Задачи модерации',
+                'ordering': ['-created'],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-19 08:28
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0008_moderationtask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('comment', 'Новый комментарий'), ('post', 'Новый пост автора')], max_length=16, verbose_name='Тип')),
+                ('is_read', models.BooleanField(default=False, verbose_name='Прочитано')),
+                ('emailed', models.BooleanField(default=False, verbose_name='Отправлено письмом')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата')),
+                ('actor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор события')),
+                ('comment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Comment', verbose_name='Комментарий')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Post', verbose_name='Пост')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL, verbose_name='Получатель')),
+            ],
+            options={
+                'verbose_name': 'Уведомление',
+                'verbose_name_plural': 'Уведомления',
+                'ordering': ['-created'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read'], name='posts_notif_user_id_1b13a9_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 2.2.16 on 2026-10-19 08:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_notification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupScore',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='posts.Group', verbose_name='Группа')),
+                ('score', models.FloatField(db_index=True, default=0, verbose_name='Рейтинг')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Обновлен')),
+            ],
+            options={
+                'verbose_name': 'Рейтинг группы',
+                'verbose_name_plural': 'Рейтинги групп',
+                'ordering': ['-score'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PostScore',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='posts.Post', verbose_name='Пост')),
+                ('score', models.FloatField(db_index=True, default=0, verbose_name='Рейтинг')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Обновлен')),
+            ],
+            options={
+                'verbose_name': 'Рейтинг поста',
+                'verbose_name_plural': 'Рейтинги постов',
+                'ordering': ['-score'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RankingState',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_post_id', models.PositiveIntegerField(default=0)),
+                ('last_comment_id', models.PositiveIntegerField(default=0)),
+                ('landmark', models.DateTimeField(blank=True, null=True, verbose_name='Точка отсчета')),
+                ('refreshed', models.DateTimeField(blank=True, null=True, verbose_name='Пересчитан')),
+            ],
+        ),
+    ]
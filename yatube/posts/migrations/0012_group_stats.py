@@ -0,0 +1,66 @@
+# Generated by Django 2.2.16 on 2026-10-19 08:37
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_group_stats(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    GroupStats = apps.get_model('posts', 'GroupStats')
+    GroupAuthorStats = apps.get_model('posts', 'GroupAuthorStats')
+    posts = Post.objects.filter(group__isnull=False).order_by()
+    GroupStats.objects.bulk_create(
+        GroupStats(**row) for row in posts.values('group_id').annotate(
+            post_count=models.Count('pk'),
+            last_activity=models.Max('pub_date'))
+    )
+    GroupAuthorStats.objects.bulk_create(
+        GroupAuthorStats(**row) for row in posts.values(
+            'group_id', 'author_id').annotate(post_count=models.Count('pk'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0011_post_views'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupStats',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='posts.Group', verbose_name='Группа')),
+                ('post_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('last_activity', models.DateTimeField(blank=True, null=True, verbose_name='Последняя публикация')),
+            ],
+            options={
+                'verbose_name': 'Статистика группы',
+                'verbose_name_plural': 'Статистика групп',
+            },
+        ),
+        migrations.CreateModel(
+            name='GroupAuthorStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='author_stats', to='posts.Group', verbose_name='Группа')),
+            ],
+            options={
+                'verbose_name': 'Статистика автора в группе',
+                'verbose_name_plural': 'Статистика авторов в группах',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='groupauthorstats',
+            index=models.Index(fields=['group', '-post_count'], name='posts_group_group_i_777893_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='groupauthorstats',
+            constraint=models.UniqueConstraint(fields=('group', 'author'), name='unique_group_author_stats'),
+        ),
+        migrations.RunPython(fill_group_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_group_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='version',
+            field=models.PositiveIntegerField(default=1, verbose_name='Версия'),
+        ),
+    ]
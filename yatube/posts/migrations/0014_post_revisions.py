@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:07
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0013_post_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostRevision',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField(verbose_name='Номер')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата')),
+                ('is_snapshot', models.BooleanField(default=False, verbose_name='Снимок')),
+                ('chain', models.PositiveSmallIntegerField(default=0, verbose_name='Разниц от снимка')),
+                ('checksum', models.BigIntegerField(verbose_name='CRC32 текста')),
+                ('data', models.BinaryField(verbose_name='Данные')),
+                ('author', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор правки')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='posts.Post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Ревизия поста',
+                'verbose_name_plural': 'Ревизии постов',
+                'ordering': ['post', '-number'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='postrevision',
+            constraint=models.UniqueConstraint(fields=('post', 'number'), name='unique_post_revision'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0014_post_revisions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPost',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False, verbose_name='Номер')),
+                ('text', models.TextField(verbose_name='Текст публикации')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('image', models.ImageField(blank=True, upload_to='posts/', verbose_name='Картинка')),
+                ('views', models.PositiveIntegerField(default=0, verbose_name='Просмотры')),
+                ('version', models.PositiveIntegerField(default=1, verbose_name='Версия')),
+                ('archived', models.DateTimeField(auto_now_add=True, verbose_name='Перенесен в архив')),
+                ('author', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор публикации')),
+                ('group', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='posts.Group', verbose_name='Группа')),
+            ],
+            options={
+                'verbose_name': 'Архивная публикация',
+                'verbose_name_plural': 'Архивные публикации',
+                'ordering': ['-pub_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedComment',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False, verbose_name='Номер')),
+                ('text', models.TextField()),
+                ('created', models.DateTimeField()),
+                ('author', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='posts.ArchivedPost')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedpost',
+            index=models.Index(fields=['author', '-pub_date'], name='posts_archi_author__44b4bd_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_archive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['pub_date', 'id'], name='posts_post_pub_dat_cce227_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', 'pub_date', 'id'], name='posts_post_group_i_d0a9eb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'pub_date', 'id'], name='posts_post_author__67f637_idx'),
+        ),
+    ]
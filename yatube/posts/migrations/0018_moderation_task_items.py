@@ -0,0 +1,45 @@
+# Generated by Django 2.2.16 on 2026-10-19 10:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def move_post_ids(apps, schema_editor):
+    ModerationTask = apps.get_model('posts', 'ModerationTask')
+    ModerationTaskItem = apps.get_model('posts', 'ModerationTaskItem')
+    for task in ModerationTask.objects.exclude(post_ids=''):
+        ModerationTaskItem.objects.bulk_create(
+            ModerationTaskItem(task_id=task.pk, post_id=int(pk))
+            for pk in sorted(set(task.post_ids.split(',')) - {''}, key=int)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_comment_threads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModerationTaskItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_id', models.PositiveIntegerField(verbose_name='Идентификатор поста')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='posts.ModerationTask', verbose_name='Задача')),
+            ],
+            options={
+                'verbose_name': 'Пост задачи модерации',
+                'verbose_name_plural': 'Посты задач модерации',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='moderationtaskitem',
+            constraint=models.UniqueConstraint(fields=('task', 'post_id'), name='unique_moderation_task_post'),
+        ),
+        migrations.RunPython(move_post_ids, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='moderationtask',
+            name='post_ids',
+        ),
+    ]
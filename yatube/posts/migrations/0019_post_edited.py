@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-19 10:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_moderation_task_items'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='edited',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Изменен'),
+        ),
+    ]
@@ -39,12 +39,23 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    views = models.PositiveIntegerField('Просмотры', default=0)
+    # растет при каждом редактировании, см. PostForm.save_changed
+    version = models.PositiveIntegerField('Версия', default=1)
+    # меняется вместе с version: валидаторы кэша страниц (posts.utils)
+    edited = models.DateTimeField('Изменен', blank=True, null=True)
 
     def __str__(self) -> str:
         return self.text[:LINE_SLICE]
 
     class Meta:
         ordering = ['-pub_date']
+        # ленты по месячным разделам и курсору (posts.partitions)
+        indexes = [
+            models.Index(fields=['pub_date', 'id']),
+            models.Index(fields=['group', 'pub_date', 'id']),
+            models.Index(fields=['author', 'pub_date', 'id']),
+        ]
         verbose_name = 'Публикация'
         verbose_name_plural = 'Публикации'
 
@@ -62,6 +73,19 @@ class Comment(models.Model):
     )
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
+    # ветки комментариев, path и счетчики заполняет posts.threads
+    parent = models.ForeignKey(
+        'self',
+        blank=True,
+        null=True,
+        on_delete=models.CASCADE,
+        verbose_name='Ответ на',
+        related_name='replies',
+    )
+    path = models.CharField('Путь в ветке', max_length=255, blank=True,
+                            default='')
+    depth = models.PositiveSmallIntegerField('Глубина', default=0)
+    reply_count = models.PositiveIntegerField('Ответов', default=0)
 
 
 class Follow(models.Model):
@@ -81,3 +105,324 @@ class Follow(models.Model):
             fields=['user', 'author'],
             name='unique_follow')
         ]
+
+
+class ModerationTask(models.Model):
+    REASSIGN_GROUP = 'reassign_group'
+    DELETE_BY_AUTHOR = 'delete_by_author'
+    PURGE_COMMENTS = 'purge_comments'
+    ACTION_CHOICES = (
+        (REASSIGN_GROUP, 'Смена группы'),
+        (DELETE_BY_AUTHOR, 'Удаление постов авторов'),
+        (PURGE_COMMENTS, 'Удаление комментариев'),
+    )
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Завершена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    action = models.CharField('Действие', max_length=32,
+                              choices=ACTION_CHOICES)
+    status = models.CharField('Статус', max_length=16,
+                              choices=STATUS_CHOICES, default=QUEUED)
+    group = models.ForeignKey(
+        Group,
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        verbose_name='Новая группа',
+        related_name='+',
+    )
+    created_by = models.ForeignKey(
+        User,
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        verbose_name='Модератор',
+        related_name='+',
+    )
+    total = models.PositiveIntegerField('Всего', default=0)
+    processed = models.PositiveIntegerField('Обработано', default=0)
+    error = models.TextField('Ошибка', blank=True)
+    created = models.DateTimeField('Создана', auto_now_add=True)
+    finished = models.DateTimeField('Завершена', blank=True, null=True)
+
+    def __str__(self) -> str:
+        return f'{self.get_action_display()} #{self.pk}'
+
+    class Meta:
+        ordering = ['-created']
+        verbose_name = 'Задача модерации'
+        verbose_name_plural = 'Задачи модерации'
+
+
+class ModerationTaskItem(models.Model):
+    task = models.ForeignKey(
+        ModerationTask,
+        on_delete=models.CASCADE,
+        verbose_name='Задача',
+        related_name='items',
+    )
+    # не ForeignKey: задача сама удаляет свои посты по ходу работы
+    post_id = models.PositiveIntegerField('Идентификатор поста')
+
+    class Meta:
+        constraints = [models.UniqueConstraint(
+            fields=['task', 'post_id'],
+            name='unique_moderation_task_post')
+        ]
+        verbose_name = 'Пост задачи модерации'
+        verbose_name_plural = 'Посты задач модерации'
+
+
+class Notification(models.Model):
+    NEW_COMMENT = 'comment'
+    NEW_POST = 'post'
+    KIND_CHOICES = (
+        (NEW_COMMENT, 'Новый комментарий'),
+        (NEW_POST, 'Новый пост автора'),
+    )
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Получатель',
+        related_name='notifications',
+    )
+    actor = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Автор события',
+        related_name='+',
+    )
+    kind = models.CharField('Тип', max_length=16, choices=KIND_CHOICES)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        verbose_name='Пост',
+        related_name='+',
+    )
+    comment = models.ForeignKey(
+        Comment,
+        blank=True,
+        null=True,
+        on_delete=models.CASCADE,
+        verbose_name='Комментарий',
+        related_name='+',
+    )
+    is_read = models.BooleanField('Прочитано', default=False)
+    emailed = models.BooleanField('Отправлено письмом', default=False)
+    created = models.DateTimeField('Дата', auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created']
+        indexes = [models.Index(fields=['user', 'is_read'])]
+        verbose_name = 'Уведомление'
+        verbose_name_plural = 'Уведомления'
+
+
+class PostScore(models.Model):
+    """Рейтинг поста с forward decay (см. posts.rankings).
+
+    score хранится относительно фиксированной точки отсчета, поэтому
+    порядок по нему совпадает с порядком по затухшему рейтингу на
+    любой момент и не требует пересчета старых строк.
+    """
+    post = models.OneToOneField(
+        Post,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        verbose_name='Пост',
+        related_name='score',
+    )
+    score = models.FloatField('Рейтинг', default=0, db_index=True)
+    updated = models.DateTimeField('Обновлен', auto_now=True)
+
+    class Meta:
+        ordering = ['-score']
+        verbose_name = 'Рейтинг поста'
+        verbose_name_plural = 'Рейтинги постов'
+
+
+class GroupScore(models.Model):
+    group = models.OneToOneField(
+        Group,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        verbose_name='Группа',
+        related_name='score',
+    )
+    score = models.FloatField('Рейтинг', default=0, db_index=True)
+    updated = models.DateTimeField('Обновлен', auto_now=True)
+
+    class Meta:
+        ordering = ['-score']
+        verbose_name = 'Рейтинг группы'
+        verbose_name_plural = 'Рейтинги групп'
+
+
+class RankingState(models.Model):
+    """Докуда уже учтены события при пересчете рейтингов."""
+    last_post_id = models.PositiveIntegerField(default=0)
+    last_comment_id = models.PositiveIntegerField(default=0)
+    landmark = models.DateTimeField('Точка отсчета', blank=True, null=True)
+    refreshed = models.DateTimeField('Пересчитан', blank=True, null=True)
+
+
+class GroupStats(models.Model):
+    """Счетчики группы для каталога, ведутся в posts.group_stats."""
+    group = models.OneToOneField(
+        Group,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        verbose_name='Группа',
+        related_name='stats',
+    )
+    post_count = models.PositiveIntegerField('Постов', default=0)
+    last_activity = models.DateTimeField(
+        'Последняя публикация', blank=True, null=True)
+
+    class Meta:
+        verbose_name = 'Статистика группы'
+        verbose_name_plural = 'Статистика групп'
+
+
+class GroupAuthorStats(models.Model):
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        verbose_name='Группа',
+        related_name='author_stats',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Автор',
+        related_name='+',
+    )
+    post_count = models.PositiveIntegerField('Постов', default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(
+            fields=['group', 'author'],
+            name='unique_group_author_stats')
+        ]
+        indexes = [models.Index(fields=['group', '-post_count'])]
+        verbose_name = 'Статистика автора в группе'
+        verbose_name_plural = 'Статистика авторов в группах'
+
+
+class PostRevision(models.Model):
+    """Версия текста поста (см. posts.revisions).
+
+    data - сжатый zlib полный текст (снимок) или разница с предыдущей
+    ревизией. Номер ревизии совпадает с Post.version после правки.
+    """
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        verbose_name='Пост',
+        related_name='revisions',
+    )
+    number = models.PositiveIntegerField('Номер')
+    author = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        verbose_name='Автор правки',
+        related_name='+',
+    )
+    created = models.DateTimeField('Дата', auto_now_add=True)
+    is_snapshot = models.BooleanField('Снимок', default=False)
+    # сколько разниц отделяет ревизию от ближайшего снимка
+    chain = models.PositiveSmallIntegerField('Разниц от снимка', default=0)
+    checksum = models.BigIntegerField('CRC32 текста')
+    data = models.BinaryField('Данные')
+
+    def __str__(self) -> str:
+        return f'{self.post_id} #{self.number}'
+
+    class Meta:
+        ordering = ['post', '-number']
+        constraints = [models.UniqueConstraint(
+            fields=['post', 'number'],
+            name='unique_post_revision')
+        ]
+        verbose_name = 'Ревизия поста'
+        verbose_name_plural = 'Ревизии постов'
+
+
+class ArchivedPost(models.Model):
+    """Старый пост, перенесенный из Post (см. posts.archive).
+
+    Номер совпадает с номером исходного поста, поэтому адреса постов не
+    меняются. Таблица может жить в отдельной базе 'archive', поэтому
+    связи с пользователями и группами без ограничений в базе.
+    """
+    id = models.IntegerField('Номер', primary_key=True)
+    text = models.TextField('Текст публикации')
+    pub_date = models.DateTimeField('Дата публикации')
+    author = models.ForeignKey(
+        User,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        verbose_name='Автор публикации',
+        related_name='+',
+    )
+    group = models.ForeignKey(
+        Group,
+        blank=True,
+        null=True,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        verbose_name='Группа',
+        related_name='+',
+    )
+    image = models.ImageField('Картинка', upload_to='posts/', blank=True)
+    views = models.PositiveIntegerField('Просмотры', default=0)
+    version = models.PositiveIntegerField('Версия', default=1)
+    archived = models.DateTimeField('Перенесен в архив', auto_now_add=True)
+
+    def __str__(self) -> str:
+        return self.text[:LINE_SLICE]
+
+    class Meta:
+        ordering = ['-pub_date']
+        indexes = [models.Index(fields=['author', '-pub_date'])]
+        verbose_name = 'Архивная публикация'
+        verbose_name_plural = 'Архивные публикации'
+
+
+class ArchivedComment(models.Model):
+    id = models.IntegerField('Номер', primary_key=True)
+    post = models.ForeignKey(
+        ArchivedPost,
+        on_delete=models.CASCADE,
+        related_name='comments',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+    )
+    text = models.TextField()
+    created = models.DateTimeField()
+    parent = models.ForeignKey(
+        'self',
+        blank=True,
+        null=True,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+    )
+    path = models.CharField(max_length=255, blank=True, default='')
+    depth = models.PositiveSmallIntegerField(default=0)
+    reply_count = models.PositiveIntegerField(default=0)
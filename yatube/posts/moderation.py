@@ -0,0 +1,106 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.jobs import enqueue
+
+from . import group_stats
+from .models import Comment, ModerationTask, ModerationTaskItem, Post
+
+
+def _reassign_group(task, chunk):
+    posts = Post.objects.filter(pk__in=chunk)
+    group_ids = set(posts.values_list('group_id', flat=True))
+    # новая версия: открытые формы правки этих постов получат конфликт
+    posts.update(group=task.group, version=F('version') + 1,
+                 edited=timezone.now())
+    # update() не шлет сигналов: статистику этих групп пересчитает run_task
+    return group_ids | {task.group_id}
+
+
+def _delete_posts(task, chunk):
+    Post.objects.filter(pk__in=chunk).delete()
+
+
+def _purge_comments(task, chunk):
+    Comment.objects.filter(post_id__in=chunk).delete()
+
+
+HANDLERS = {
+    ModerationTask.REASSIGN_GROUP: _reassign_group,
+    ModerationTask.DELETE_BY_AUTHOR: _delete_posts,
+    ModerationTask.PURGE_COMMENTS: _purge_comments,
+}
+
+
+def start_task(action, post_ids, user=None, group=None):
+    """Сохранить задачу модерации и поставить ее в очередь core.jobs.
+
+    Задача переживает перезапуск процесса: run_jobs вернет зависшую
+    задачу в очередь, а run_task продолжит ее с первой незаписанной пачки.
+    """
+    from .tasks import run_moderation_task  # tasks импортирует этот модуль
+
+    post_ids = sorted(set(post_ids))
+    with transaction.atomic():
+        task = ModerationTask.objects.create(
+            action=action,
+            total=len(post_ids),
+            group=group,
+            created_by=user,
+        )
+        ModerationTaskItem.objects.bulk_create(
+            (ModerationTaskItem(task=task, post_id=pk) for pk in post_ids),
+            batch_size=settings.MODERATION_CHUNK_SIZE,
+        )
+    enqueue(run_moderation_task, task.pk, dedupe_key=f'moderation:{task.pk}')
+    return task
+
+
+def run_task(task_id):
+    task = ModerationTask.objects.get(pk=task_id)
+    ModerationTask.objects.filter(pk=task_id).update(
+        status=ModerationTask.RUNNING)
+    handler = HANDLERS[task.action]
+    post_ids = task.items.order_by('post_id').values_list(
+        'post_id', flat=True)
+    chunk_size = settings.MODERATION_CHUNK_SIZE
+    processed = task.processed
+    last_id = post_ids[processed - 1] if processed else -1
+    # группы пачек, записанных до сбоя, неизвестны: пересчитаем все
+    rebuild_all = (processed > 0
+                   and task.action == ModerationTask.REASSIGN_GROUP)
+    stale_groups = set()
+    try:
+        while True:
+            chunk = list(post_ids.filter(post_id__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            # каждая пачка в своей короткой транзакции вместе с прогрессом,
+            # чтобы не держать блокировку базы на всю задачу
+            with transaction.atomic():
+                stale_groups |= handler(task, chunk) or set()
+                processed += len(chunk)
+                ModerationTask.objects.filter(pk=task_id).update(
+                    processed=processed)
+            last_id = chunk[-1]
+    except Exception as exc:
+        ModerationTask.objects.filter(pk=task_id).update(
+            status=ModerationTask.FAILED,
+            error=repr(exc),
+            finished=timezone.now(),
+        )
+        raise
+    finally:
+        # один пересчет на задачу, в том числе после уже записанных
+        # пачек упавшей задачи, а не на каждую пачку
+        if rebuild_all:
+            group_stats.rebuild()
+        elif stale_groups:
+            group_stats.rebuild(stale_groups)
+    ModerationTask.objects.filter(pk=task_id).update(
+        status=ModerationTask.DONE,
+        error='',
+        finished=timezone.now(),
+    )
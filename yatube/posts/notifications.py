@@ -0,0 +1,113 @@
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core import metrics
+from core.background import submit
+from core.cache import shared_timeout
+
+from . import follow_graph
+from .models import Notification
+
+UNREAD_KEY = 'notifications:unread:{}'
+
+_pending = []
+_lock = threading.Lock()
+_flush_scheduled = False
+
+metrics.queue_depth('notifications', lambda: len(_pending))
+
+
+def _queue(notifications):
+    """Поставить уведомления в очередь после коммита транзакции.
+
+    При откате транзакции уведомления отбрасываются вместе с ней.
+    """
+    notifications = list(notifications)
+    if notifications:
+        transaction.on_commit(lambda: _enqueue(notifications))
+
+
+def _enqueue(notifications):
+    """Положить уведомления в очередь и запланировать запись пачкой.
+
+    Пока запись не выполнена, новые уведомления копятся в той же пачке.
+    """
+    global _flush_scheduled
+    with _lock:
+        _pending.extend(notifications)
+        if _flush_scheduled:
+            return
+        _flush_scheduled = True
+    submit(flush)
+
+
+def flush():
+    global _flush_scheduled
+    time.sleep(settings.NOTIFICATIONS_FLUSH_DELAY)
+    with _lock:
+        batch = _pending[:]
+        del _pending[:]
+        _flush_scheduled = False
+    Notification.objects.bulk_create(
+        batch, batch_size=settings.NOTIFICATIONS_BATCH_SIZE)
+    for user_id, count in Counter(n.user_id for n in batch).items():
+        try:
+            # в кэше процесса это ускоряет лишь этот воркер, остальные
+            # пересчитают счетчик из базы через LOCAL_CACHE_TIMEOUT
+            cache.incr(UNREAD_KEY.format(user_id), count)
+        except ValueError:
+            # счетчика нет в кэше, он будет посчитан при чтении
+            pass
+
+
+def notify_new_comment(comment):
+    post = comment.post
+    if post.author_id == comment.author_id:
+        return
+    _queue([Notification(
+        user_id=post.author_id,
+        actor_id=comment.author_id,
+        kind=Notification.NEW_COMMENT,
+        post_id=post.pk,
+        comment_id=comment.pk,
+    )])
+
+
+def _fan_out_post(post_id, author_id):
+    _queue(
+        Notification(
+            user_id=follower_id,
+            actor_id=author_id,
+            kind=Notification.NEW_POST,
+            post_id=post_id,
+        )
+        for follower_id in follow_graph.followers_of(author_id)
+    )
+
+
+def notify_new_post(post):
+    # рассылка подписчикам популярного автора тоже уходит в фон
+    transaction.on_commit(
+        lambda: submit(_fan_out_post, post.pk, post.author_id))
+
+
+def unread_count(user):
+    key = UNREAD_KEY.format(user.pk)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(user=user, is_read=False).count()
+        cache.set(key, count,
+                  shared_timeout(settings.NOTIFICATIONS_UNREAD_TIMEOUT))
+    return count
+
+
+def mark_all_read(user):
+    Notification.objects.filter(user=user, is_read=False).update(
+        is_read=True)
+    cache.set(UNREAD_KEY.format(user.pk), 0,
+              shared_timeout(settings.NOTIFICATIONS_UNREAD_TIMEOUT))
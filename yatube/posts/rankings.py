@@ -0,0 +1,162 @@
+"""Рейтинги популярных постов и групп с forward decay.
+
+Вклад события весом w в момент t равен w * 2 ** ((t - landmark) / T),
+где T - период полураспада RANKING_HALF_LIFE. Затухание на текущий
+момент - общий множитель для всех строк, поэтому сортировка по
+хранимому score уже дает порядок "популярно сейчас", а новые события
+только прибавляются к старым строкам.
+
+Пересчет инкрементальный: учитываются посты и комментарии с id больше
+сохраненного в RankingState.
+"""
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.jobs import enqueue
+
+from .models import Comment, GroupScore, Post, PostScore, RankingState
+from .utils import bulk_increment, bulk_insert
+
+SCHEDULE_KEY = 'rankings:scheduled'
+
+
+def decay(when, landmark):
+    seconds = (when - landmark).total_seconds()
+    return 2 ** (seconds / settings.RANKING_HALF_LIFE)
+
+
+def _add_scores(model, deltas):
+    """Прибавить deltas {pk: вклад} к score, создав недостающие строки."""
+    if not deltas:
+        return
+    now = timezone.now()
+    existing = set(model.objects.filter(
+        pk__in=list(deltas)).values_list('pk', flat=True))
+    updated = connection.ops.adapt_datetimefield_value(now)
+    bulk_insert(model, (model._meta.pk.name, 'score', 'updated'), [
+        (pk, delta, updated)
+        for pk, delta in deltas.items() if pk not in existing
+    ])
+    bulk_increment(
+        model, 'score', {pk: deltas[pk] for pk in existing}, updated=now)
+
+
+def _rebase(state, now):
+    """Сдвинуть точку отсчета, пока множители не переполнили float."""
+    if state.landmark is None:
+        state.landmark = now
+        return
+    shift = math.floor(
+        (now - state.landmark).total_seconds() / settings.RANKING_HALF_LIFE)
+    if shift < settings.RANKING_REBASE_AFTER:
+        return
+    factor = 2.0 ** -shift
+    for model in (PostScore, GroupScore):
+        model.objects.update(score=F('score') * factor)
+    state.landmark += timedelta(seconds=shift * settings.RANKING_HALF_LIFE)
+
+
+def apply_events(state, events):
+    """Учесть события (post_id, group_id, вес, время) в рейтингах."""
+    post_deltas = {}
+    group_deltas = {}
+    for post_id, group_id, weight, when in events:
+        delta = weight * decay(when, state.landmark)
+        post_deltas[post_id] = post_deltas.get(post_id, 0) + delta
+        if group_id is not None:
+            group_deltas[group_id] = group_deltas.get(group_id, 0) + delta
+    _add_scores(PostScore, post_deltas)
+    _add_scores(GroupScore, group_deltas)
+
+
+def refresh():
+    """Учесть посты и комментарии, появившиеся с прошлого пересчета."""
+    weights = settings.RANKING_WEIGHTS
+    batch_size = settings.RANKING_BATCH_SIZE
+    processed = 0
+    with transaction.atomic():
+        state, _ = RankingState.objects.select_for_update().get_or_create(
+            pk=1)
+        _rebase(state, timezone.now())
+        while True:
+            posts = list(Post.objects.filter(
+                pk__gt=state.last_post_id
+            ).order_by('pk').values_list(
+                'pk', 'group_id', 'pub_date')[:batch_size])
+            apply_events(state, (
+                (pk, group_id, weights['post'], pub_date)
+                for pk, group_id, pub_date in posts
+            ))
+            if posts:
+                state.last_post_id = posts[-1][0]
+            comments = list(Comment.objects.filter(
+                pk__gt=state.last_comment_id
+            ).order_by('pk').values_list(
+                'pk', 'post_id', 'post__group_id', 'created')[:batch_size])
+            apply_events(state, (
+                (post_id, group_id, weights['comment'], created)
+                for _, post_id, group_id, created in comments
+            ))
+            if comments:
+                state.last_comment_id = comments[-1][0]
+            processed += len(posts) + len(comments)
+            if len(posts) < batch_size and len(comments) < batch_size:
+                break
+        state.refreshed = timezone.now()
+        state.save()
+    return processed
+
+
+def add_views(counts):
+    """Учесть просмотры {post_id: число} из posts.counters."""
+    weight = settings.RANKING_WEIGHTS['view']
+    now = timezone.now()
+    with transaction.atomic():
+        state, _ = RankingState.objects.get_or_create(pk=1)
+        if state.landmark is None:
+            state.landmark = now
+            state.save(update_fields=['landmark'])
+        groups = dict(Post.objects.filter(
+            pk__in=list(counts)).values_list('pk', 'group_id'))
+        apply_events(state, (
+            (pk, groups[pk], weight * count, now)
+            for pk, count in counts.items() if pk in groups
+        ))
+
+
+def rebuild():
+    """Пересчитать рейтинги с нуля."""
+    with transaction.atomic():
+        PostScore.objects.all().delete()
+        GroupScore.objects.all().delete()
+        RankingState.objects.all().delete()
+        return refresh()
+
+
+def schedule():
+    """Поставить пересчет в очередь не чаще раза в RANKING_REFRESH_DELAY."""
+    from .tasks import refresh_rankings  # tasks импортирует этот модуль
+
+    if cache.add(SCHEDULE_KEY, True, settings.RANKING_REFRESH_DELAY):
+        transaction.on_commit(lambda: enqueue(
+            refresh_rankings, dedupe_key='refresh_rankings',
+            delay=settings.RANKING_REFRESH_DELAY))
+
+
+def popular_posts():
+    return Post.objects.filter(score__isnull=False).select_related(
+        'author', 'group').order_by('-score__score')
+
+
+def trending_groups(limit=None):
+    limit = limit or settings.RANKING_TRENDING_GROUPS
+    return [
+        group_score.group for group_score in
+        GroupScore.objects.select_related('group')[:limit]
+    ]
@@ -0,0 +1,121 @@
+"""История правок текста постов.
+
+Ревизия хранит разницу с предыдущей: список кусков нового текста, где
+пара [i, j] - слова i..j-1 предыдущей версии, а строка - вставленный
+текст. Разница сжимается zlib. Каждая POST_REVISION_SNAPSHOT_EVERY-я
+ревизия - полный снимок, поэтому любая версия собирается из снимка и
+меньше чем POST_REVISION_SNAPSHOT_EVERY разниц, прочитанных одним
+запросом.
+"""
+import json
+import re
+import zlib
+from difflib import SequenceMatcher
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import PostRevision
+
+TOKEN_RE = re.compile(r'\s+|\S+')
+
+
+def tokenize(text):
+    """Слова и пробелы между ними; ''.join(tokenize(text)) == text."""
+    return TOKEN_RE.findall(text)
+
+
+def make_delta(old, new):
+    old_tokens, new_tokens = tokenize(old), tokenize(new)
+    # общие начало и конец отрезаются заранее: правки обычно мелкие, а
+    # SequenceMatcher на частых словах квадратичен от длины текста
+    limit = min(len(old_tokens), len(new_tokens))
+    head = 0
+    while head < limit and old_tokens[head] == new_tokens[head]:
+        head += 1
+    tail = 0
+    while (tail < limit - head
+           and old_tokens[-1 - tail] == new_tokens[-1 - tail]):
+        tail += 1
+    matcher = SequenceMatcher(
+        None, old_tokens[head:len(old_tokens) - tail],
+        new_tokens[head:len(new_tokens) - tail], autojunk=False)
+    delta = [[0, head]] if head else []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            delta.append([head + i1, head + i2])
+        elif j2 > j1:
+            delta.append(''.join(new_tokens[head + j1:head + j2]))
+    if tail:
+        delta.append([len(old_tokens) - tail, len(old_tokens)])
+    return delta
+
+
+def apply_delta(old, delta):
+    tokens = tokenize(old)
+    return ''.join(
+        piece if isinstance(piece, str) else ''.join(tokens[slice(*piece)])
+        for piece in delta
+    )
+
+
+def checksum(text):
+    return zlib.crc32(text.encode())
+
+
+def _save(post, number, text, author, base=None, chain=0):
+    if base is None:
+        data = text.encode()
+    else:
+        data = json.dumps(make_delta(base, text), ensure_ascii=False,
+                          separators=(',', ':')).encode()
+    return PostRevision.objects.create(
+        post=post, number=number, author=author, is_snapshot=base is None,
+        chain=chain, checksum=checksum(text),
+        data=zlib.compress(data, 9))
+
+
+def record(post, old_text, author=None):
+    """Записать правку текста уже сохраненного поста.
+
+    post.version должна быть версией после правки. Если истории еще нет
+    (первая правка) или текст меняли в обход истории, старый текст
+    сначала сохраняется снимком.
+    """
+    if post.text == old_text:
+        return
+    every = settings.POST_REVISION_SNAPSHOT_EVERY
+    with transaction.atomic():
+        last = post.revisions.order_by('-number').first()
+        has_base = last is not None and last.checksum == checksum(old_text)
+        if not has_base and (last is None
+                             or last.number < post.version - 1):
+            last = _save(post, post.version - 1, old_text, None)
+            has_base = True
+        if has_base and last.chain + 1 < every:
+            _save(post, post.version, post.text, author, base=old_text,
+                  chain=last.chain + 1)
+        else:
+            _save(post, post.version, post.text, author)
+
+
+def text_at(post_id, number):
+    """Текст поста в ревизии number: снимок плюс цепочка разниц."""
+    rows = list(PostRevision.objects.filter(
+        post_id=post_id, number__lte=number
+    ).order_by('-number').values_list('number', 'is_snapshot', 'data')[
+        :settings.POST_REVISION_SNAPSHOT_EVERY])
+    if not rows or rows[0][0] != number:
+        raise PostRevision.DoesNotExist(f'{post_id} #{number}')
+    deltas = []
+    for _, is_snapshot, data in rows:
+        data = zlib.decompress(bytes(data))
+        if is_snapshot:
+            text = data.decode()
+            break
+        deltas.append(json.loads(data))
+    else:
+        raise PostRevision.DoesNotExist(f'{post_id} #{number}: нет снимка')
+    for delta in reversed(deltas):
+        text = apply_delta(text, delta)
+    return text
@@ -0,0 +1,44 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+
+ARCHIVE_DB = 'archive'
+ARCHIVE_MODELS = {'archivedpost', 'archivedcomment'}
+
+
+def archive_alias():
+    """База архивных таблиц: 'archive', если она настроена."""
+    if ARCHIVE_DB in connections.databases:
+        return ARCHIVE_DB
+    return DEFAULT_DB_ALIAS
+
+
+def _is_archive(obj):
+    """obj - модель или ее объект."""
+    meta = obj._meta
+    return meta.app_label == 'posts' and meta.model_name in ARCHIVE_MODELS
+
+
+class ArchiveRouter:
+    """Архивные посты и комментарии - в базу 'archive', остальное нет."""
+
+    def db_for_read(self, model, **hints):
+        if _is_archive(model):
+            return archive_alias()
+        instance = hints.get('instance')
+        if instance is not None and _is_archive(instance):
+            # иначе автора архивного поста Django искал бы в базе поста
+            return DEFAULT_DB_ALIAS
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if _is_archive(obj1) or _is_archive(obj2):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label == 'posts' and model_name in ARCHIVE_MODELS:
+            return db == archive_alias()
+        if db == ARCHIVE_DB:
+            return False
+        return None
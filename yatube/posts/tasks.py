@@ -0,0 +1,29 @@
+from sorl.thumbnail import get_thumbnail
+
+from core.jobs import job
+
+from . import moderation, rankings
+from .models import Post
+
+THUMBNAIL_GEOMETRY = '480x270'
+THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+
+
+@job
+def generate_thumbnail(post_id):
+    """Заранее создать миниатюру, которую покажут ленты и post_detail."""
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None and post.image:
+        get_thumbnail(post.image, THUMBNAIL_GEOMETRY, **THUMBNAIL_OPTIONS)
+
+
+@job
+def refresh_rankings():
+    """Учесть новые посты и комментарии в рейтингах популярного."""
+    rankings.refresh()
+
+
+@job
+def run_moderation_task(task_id):
+    """Выполнить задачу модерации из админки пачками."""
+    moderation.run_task(task_id)
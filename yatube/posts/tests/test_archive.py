@@ -0,0 +1,97 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import archive
+from posts.models import (ArchivedComment, ArchivedPost, Comment, Group,
+                          Post)
+from posts.utils import NUM_POST_ON_THE_PAGE
+
+User = get_user_model()
+
+
+class ArchiveTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test_slug',
+            description='Тестовое описание')
+        long_ago = timezone.now() - timedelta(days=1000)
+        cls.old_posts = []
+        for i in range(NUM_POST_ON_THE_PAGE + 3):
+            post = Post.objects.create(author=cls.user, group=cls.group,
+                                       text=f'Старый пост {i}')
+            cls.old_posts.append(post)
+        Post.objects.filter(pk__in=[post.pk for post in cls.old_posts]
+                            ).update(pub_date=long_ago)
+        cls.old_post = cls.old_posts[-1]
+        cls.comment = Comment.objects.create(
+            post=cls.old_post, author=cls.reader, text='Старый комментарий')
+        cls.new_posts = [
+            Post.objects.create(author=cls.user, text=f'Новый пост {i}')
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_archive_command(self):
+        """старые посты и комментарии переносятся, новые остаются"""
+        call_command('archive_posts', days=365, batch_size=4,
+                     stdout=StringIO())
+        self.assertEqual(Post.objects.count(), len(self.new_posts))
+        self.assertFalse(Comment.objects.exists())
+        archived = ArchivedPost.objects.get(pk=self.old_post.pk)
+        self.assertEqual(archived.text, self.old_post.text)
+        self.assertEqual(archived.group_id, self.group.pk)
+        self.assertEqual(
+            ArchivedComment.objects.get(pk=self.comment.pk).post_id,
+            self.old_post.pk)
+        # повторный перенос ничего не ломает
+        archive.archive_posts([self.old_post.pk])
+        self.assertEqual(ArchivedPost.objects.count(), len(self.old_posts))
+
+    def test_post_detail_reads_archive(self):
+        """архивный пост открывается по прежнему адресу без формы"""
+        archive.archive_posts([self.old_post.pk])
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.old_post.pk,)))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, self.old_post.text)
+        self.assertContains(response, 'Старый комментарий')
+        self.assertTrue(response.context['is_archived'])
+        self.assertNotContains(response, reverse(
+            'posts:add_comment', args=(self.old_post.pk,)))
+        response = self.client.get(
+            reverse('posts:post_detail', args=(10 ** 6,)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_profile_continues_into_archive(self):
+        """после горячих постов профиль листает архивные"""
+        archive.archive_posts([post.pk for post in self.old_posts])
+        url = reverse('posts:profile', args=('auth',))
+        first = self.client.get(url)
+        total = len(self.old_posts) + len(self.new_posts)
+        self.assertEqual(first.context['page_obj'].paginator.count, total)
+        self.assertEqual(
+            [post.text for post in first.context['page_obj']][:5],
+            [post.text for post in reversed(self.new_posts)])
+        texts = [post.text for post in first.context['page_obj']]
+        # счетчики обеих таблиц, архивная страница, ее группы и авторы
+        with self.assertNumQueries(7):
+            second = self.client.get(url, {'page': 2})
+        texts += [post.text for post in second.context['page_obj']]
+        self.assertEqual(len(texts), total)
+        self.assertEqual(
+            set(texts),
+            {post.text for post in self.old_posts + self.new_posts})
+        self.assertIsInstance(second.context['page_obj'][0], ArchivedPost)
@@ -0,0 +1,113 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import counters
+from posts.models import Post, PostScore
+
+User = get_user_model()
+
+
+@override_settings(BACKGROUND_EAGER=True)
+class ViewCountersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # просмотры из других тестов, пока их постов еще нет
+        counters.flush()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+        cls.other = Post.objects.create(author=cls.user, text='Другой пост')
+
+    def setUp(self):
+        cache.clear()
+        # буфер и таймер, оставленные просмотрами из других тестов
+        counters.flush()
+        self.url = reverse('posts:post_detail', args=(self.post.pk,))
+
+    def views(self, post):
+        post.refresh_from_db(fields=['views'])
+        return post.views
+
+    @override_settings(VIEW_COUNTS_FLUSH_INTERVAL=60)
+    def test_views_are_buffered(self):
+        """просмотры копятся в памяти до выгрузки"""
+        client = Client()
+        for _ in range(3):
+            client.get(self.url)
+        self.assertEqual(self.views(self.post), 0)
+        self.assertEqual(counters.pending(), 3)
+        counters.flush()
+        self.assertEqual(self.views(self.post), 3)
+        self.assertEqual(counters.pending(), 0)
+
+    @override_settings(VIEW_COUNTS_FLUSH_INTERVAL=60)
+    def test_flush_is_one_batch(self):
+        """выгрузка пишет счетчики всех постов одним UPDATE"""
+        for post in (self.post, self.post, self.other):
+            counters.record_view(post.pk)
+        with CaptureQueriesContext(connection) as ctx:
+            counters.flush()
+        updates = [query for query in ctx.captured_queries
+                   if query['sql'].startswith('UPDATE "posts_post"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.views(self.post), 2)
+        self.assertEqual(self.views(self.other), 1)
+
+    @override_settings(VIEW_COUNTS_FLUSH_INTERVAL=0)
+    def test_flush_after_interval(self):
+        """по истечении интервала просмотр выгружается сам"""
+        Client().get(self.url)
+        self.assertEqual(self.views(self.post), 1)
+
+    @override_settings(VIEW_COUNTS_FLUSH_INTERVAL=60)
+    def test_idle_flush_by_timer(self):
+        """без новых просмотров буфер выгружает таймер"""
+        counters.record_view(self.post.pk)
+        timer = counters._timer
+        self.assertEqual(timer.interval, 60)
+        # не ждем минуту: выполняем таймер сразу
+        timer.cancel()
+        timer.function()
+        self.assertEqual(self.views(self.post), 1)
+        self.assertEqual(counters.pending(), 0)
+        self.assertIsNone(counters._timer)
+
+    @override_settings(VIEW_COUNTS_FLUSH_AT_EXIT=True)
+    def test_flush_at_exit(self):
+        """при выходе из процесса остаток буфера записывается"""
+        with override_settings(VIEW_COUNTS_FLUSH_INTERVAL=60):
+            counters.record_view(self.post.pk)
+        counters._flush_at_exit()
+        self.assertEqual(self.views(self.post), 1)
+
+    @override_settings(VIEW_COUNTS_FLUSH_AT_EXIT=True,
+                       VIEW_COUNTS_FLUSH_INTERVAL=60)
+    def test_no_flush_at_exit_to_other_database(self):
+        """при выходе буфер не пишется, если его база уже закрыта"""
+        counters.record_view(self.post.pk)
+        test_name = connection.settings_dict['NAME']
+        connection.settings_dict['NAME'] = 'удаленная база бенчмарка'
+        try:
+            with self.assertLogs('posts.counters', 'WARNING'):
+                counters._flush_at_exit()
+        finally:
+            connection.settings_dict['NAME'] = test_name
+        self.assertEqual(counters.pending(), 1)
+        counters.flush()
+
+    @override_settings(VIEW_COUNTS_FLUSH_INTERVAL=0)
+    def test_views_feed_rankings(self):
+        """просмотры поднимают пост в рейтинге"""
+        Client().get(self.url)
+        self.assertTrue(PostScore.objects.filter(pk=self.post.pk).exists())
+        self.assertFalse(PostScore.objects.filter(pk=self.other.pk).exists())
+
+    @override_settings(VIEW_COUNTS_FLUSH_INTERVAL=0)
+    def test_views_shown_in_feed(self):
+        """число просмотров выводится в ленте"""
+        Client().get(self.url)
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, 'Просмотры: 1')
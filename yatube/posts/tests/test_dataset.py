@@ -0,0 +1,53 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import TestCase
+
+from posts.models import (Comment, Follow, Group, GroupStats, Post,
+                          PostScore)
+
+
+class GenerateDatasetTest(TestCase):
+    def generate(self, prefix, seed=1):
+        call_command(
+            'generate_dataset', users=20, groups=3, posts=200,
+            comments=500, follows=100, chunk_size=64, prefix=prefix,
+            seed=seed, stdout=StringIO())
+
+    def test_counts_and_derived_tables(self):
+        """создаются строки и пересчитываются статистика и рейтинги"""
+        self.generate('gen')
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 500)
+        self.assertTrue(0 < Follow.objects.count() <= 100)
+        self.assertEqual(
+            sum(GroupStats.objects.values_list('post_count', flat=True)),
+            Post.objects.filter(group__isnull=False).count())
+        self.assertEqual(PostScore.objects.count(), 200)
+
+    def test_deterministic_seed(self):
+        """одинаковый seed дает одинаковые данные"""
+        self.generate('first')
+        self.generate('second')
+        first, second = (
+            list(Post.objects.filter(
+                author__username__startswith=prefix
+            ).order_by('pk').values_list('text', flat=True))
+            for prefix in ('first', 'second')
+        )
+        self.assertEqual(first, second)
+
+    def test_power_law(self):
+        """первые пользователи и группы получают больше всего постов"""
+        self.generate('gen')
+        counts = [
+            Post.objects.filter(author__username=f'gen{i}').count()
+            for i in range(20)
+        ]
+        self.assertEqual(max(counts), counts[0])
+        self.assertGreater(counts[0], counts[-1] * 3)
+        self.assertEqual(
+            Group.objects.annotate(size=Count('posts')).order_by(
+                '-size').first().slug, 'gen-group-0')
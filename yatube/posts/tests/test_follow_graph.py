@@ -0,0 +1,173 @@
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import follow_graph
+from posts.models import Follow, Group, Post
+
+User = get_user_model()
+SHARED_CACHE_DIR = tempfile.mkdtemp()
+
+
+# граф кэшируется, только если кэш общий для всех процессов
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': SHARED_CACHE_DIR,
+}})
+class FollowGraphTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.popular = User.objects.create_user(username='popular')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(SHARED_CACHE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_follow_and_unfollow_update_cache(self):
+        """подписка и отписка через views обновляют граф"""
+        self.authorized_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author}))
+        self.assertTrue(follow_graph.is_following(self.user.id,
+                                                  self.author.id))
+        self.assertEqual(list(follow_graph.followers_of(self.author.id)),
+                         [self.user.id])
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}))
+        self.assertFalse(follow_graph.is_following(self.user.id,
+                                                   self.author.id))
+        self.assertEqual(len(follow_graph.followers_of(self.author.id)), 0)
+
+    def test_warm_cache_without_queries(self):
+        """повторные запросы к графу не обращаются к базе"""
+        Follow.objects.create(user=self.user, author=self.author)
+        follow_graph.following_of(self.user.id)
+        follow_graph.followers_of(self.user.id)
+        with self.assertNumQueries(0):
+            self.assertTrue(follow_graph.is_following(self.user.id,
+                                                      self.author.id))
+            self.assertFalse(follow_graph.is_following(self.user.id,
+                                                       self.other.id))
+            self.assertEqual(follow_graph.mutuals(self.user.id), [])
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'core.cache.LocMemCache'}})
+    def test_local_cache_reads_database(self):
+        """с кэшем процесса граф читается из базы и видит чужие подписки"""
+        follow_graph.following_of(self.user.id)
+        # подписка в другом процессе: сигнал до этого кэша не дойдет
+        Follow.objects.bulk_create([Follow(user=self.user,
+                                           author=self.author)])
+        with self.assertNumQueries(1):
+            self.assertTrue(follow_graph.is_following(self.user.id,
+                                                      self.author.id))
+        Follow.objects.bulk_create([
+            Follow(user=self.user, author=self.other),
+            Follow(user=self.author, author=self.popular),
+            Follow(user=self.other, author=self.popular),
+        ])
+        # свои подписки и подписки всех своих авторов - два запроса
+        with self.assertNumQueries(2):
+            self.assertEqual(follow_graph.suggested_authors(self.user.id),
+                             [self.popular.id])
+
+    def test_mutuals(self):
+        """взаимные подписки"""
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=self.author, author=self.user)
+        Follow.objects.create(user=self.user, author=self.other)
+        self.assertEqual(follow_graph.mutuals(self.user.id),
+                         [self.author.id])
+
+    def test_suggested_authors(self):
+        """рекомендуются авторы из подписок моих авторов"""
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=self.user, author=self.other)
+        Follow.objects.create(user=self.author, author=self.popular)
+        Follow.objects.create(user=self.other, author=self.popular)
+        Follow.objects.create(user=self.author, author=self.user)
+        Follow.objects.create(user=self.author, author=self.other)
+        self.assertEqual(follow_graph.suggested_authors(self.user.id),
+                         [self.popular.id])
+
+
+class AnnotateFollowingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(3)
+        ]
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        for author in cls.authors:
+            Post.objects.create(author=author, text='Тестовый пост',
+                                group=cls.group)
+        Follow.objects.create(user=cls.user, author=cls.authors[0])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_page_annotated_with_one_query(self):
+        """вся страница размечается одним запросом"""
+        posts = list(Post.objects.all())
+        with self.assertNumQueries(1):
+            follow_graph.annotate_following(self.user, posts)
+        self.assertEqual(
+            {post.author_id: post.is_following for post in posts},
+            {self.authors[0].id: True, self.authors[1].id: False,
+             self.authors[2].id: False})
+
+    def test_author_list_and_anonymous(self):
+        """список авторов и аноним"""
+        follow_graph.annotate_following(self.user, self.authors, 'pk')
+        self.assertEqual([author.is_following for author in self.authors],
+                         [True, False, False])
+        follow_graph.annotate_following(AnonymousUser(), self.authors, 'pk')
+        self.assertFalse(any(a.is_following for a in self.authors))
+
+    def test_group_page_follow_links(self):
+        """в ленте группы у авторов есть ссылки подписки"""
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}))
+        page = response.context['page_obj']
+        self.assertTrue(all(hasattr(post, 'is_following') for post in page))
+        self.assertContains(response, reverse(
+            'posts:profile_unfollow', kwargs={'username': self.authors[0]}))
+        self.assertContains(response, reverse(
+            'posts:profile_follow', kwargs={'username': self.authors[1]}))
+
+    def test_cached_index_follow_links_per_user(self):
+        """закэшированная главная не показывает чужие подписки"""
+        url = reverse('posts:index')
+        unfollow = reverse('posts:profile_unfollow',
+                           kwargs={'username': self.authors[0]})
+        client = Client()
+        client.force_login(self.user)
+        self.assertContains(client.get(url), unfollow)
+        other = Client()
+        other.force_login(User.objects.create_user(username='other'))
+        response = other.get(url)
+        self.assertNotContains(response, unfollow)
+        self.assertContains(response, reverse(
+            'posts:profile_follow', kwargs={'username': self.authors[0]}))
@@ -6,7 +6,9 @@ from http import HTTPStatus
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.shortcuts import get_object_or_404
 
@@ -121,3 +123,43 @@ class PostFormTests(TestCase):
         self.assertEqual(Post.objects.count(), posts_count)
         self.assertEqual(get_object_or_404(Post, pk=self.post.id).text,
                          form_data['text'])
+
+    def test_post_edit_conflict(self):
+        """правка устаревшей версии возвращает конфликт"""
+        post = Post.objects.create(text='Исходный текст', author=self.user)
+        url = reverse('posts:post_edit', kwargs={'post_id': post.pk})
+        self.authorized_client.post(
+            url, {'text': 'Первая правка', 'version': post.version})
+        response = self.authorized_client.post(
+            url, {'text': 'Вторая правка', 'version': post.version})
+        self.assertEqual(response.status_code, HTTPStatus.CONFLICT)
+        self.assertContains(response, 'Первая правка',
+                            status_code=HTTPStatus.CONFLICT)
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Первая правка')
+        self.assertEqual(post.version, 2)
+        # форма конфликта уже несет текущую версию
+        self.assertEqual(response.context['form'].version, 2)
+        self.assertContains(response, 'name="version" value="2"',
+                            status_code=HTTPStatus.CONFLICT)
+
+    def test_post_edit_writes_changed_fields(self):
+        """в UPDATE попадают только измененные поля, картинка не трогается"""
+        post = Post.objects.create(
+            text='Пост с картинкой', author=self.user,
+            image=SimpleUploadedFile('keep.gif', b'GIF89a',
+                                     content_type='image/gif'))
+        image_name = post.image.name
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.post(
+                reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+                {'text': 'Новый текст', 'version': post.version})
+        updates = [q['sql'] for q in queries
+                   if q['sql'].startswith('UPDATE "posts_post"')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"text"', updates[0])
+        self.assertNotIn('"image"', updates[0])
+        self.assertNotIn('"group_id"', updates[0])
+        post.refresh_from_db()
+        self.assertEqual(post.image.name, image_name)
+        self.assertEqual(post.text, 'Новый текст')
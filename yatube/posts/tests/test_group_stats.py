@@ -0,0 +1,170 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import jobs
+from posts import group_stats
+from posts.models import (Group, GroupAuthorStats, GroupStats,
+                          ModerationTask, Post)
+from posts.moderation import start_task
+
+User = get_user_model()
+
+
+class GroupStatsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.empty_group = Group.objects.create(
+            title='Пустая группа',
+            slug='empty',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def stats(self, group):
+        return GroupStats.objects.filter(group=group).first()
+
+    def test_counters_follow_posts(self):
+        """счетчики меняются при создании и удалении постов"""
+        first = Post.objects.create(author=self.user, text='Пост',
+                                    group=self.group)
+        Post.objects.create(author=self.other, text='Пост', group=self.group)
+        last = Post.objects.create(author=self.user, text='Пост',
+                                   group=self.group)
+        stats = self.stats(self.group)
+        self.assertEqual(stats.post_count, 3)
+        self.assertEqual(stats.last_activity, last.pub_date)
+        last.delete()
+        stats = self.stats(self.group)
+        self.assertEqual(stats.post_count, 2)
+        self.assertEqual(
+            stats.last_activity,
+            self.group.posts.order_by('-pub_date')[0].pub_date)
+        first.delete()
+        self.assertFalse(GroupAuthorStats.objects.filter(
+            group=self.group, author=self.user).exists())
+
+    def test_post_edit_moves_post(self):
+        """смена группы в post_edit переносит пост в статистике"""
+        post = Post.objects.create(author=self.user, text='Пост',
+                                   group=self.group)
+        self.client.post(
+            reverse('posts:post_edit', args=(post.pk,)),
+            {'text': 'Пост', 'group': self.empty_group.pk})
+        self.assertEqual(self.stats(self.group).post_count, 0)
+        self.assertEqual(self.stats(self.empty_group).post_count, 1)
+        self.assertTrue(GroupAuthorStats.objects.filter(
+            group=self.empty_group, author=self.user).exists())
+
+    def test_moderation_repairs_stats(self):
+        """массовая смена группы пересчитывает статистику"""
+        posts = [
+            Post.objects.create(author=self.user, text='Пост',
+                                group=self.group)
+            for _ in range(2)
+        ]
+        start_task(ModerationTask.REASSIGN_GROUP, [p.pk for p in posts],
+                   group=self.empty_group)
+        jobs.work('test', burst=True)
+        self.assertIsNone(self.stats(self.group))
+        self.assertEqual(self.stats(self.empty_group).post_count, 2)
+
+    @override_settings(MODERATION_CHUNK_SIZE=2)
+    def test_moderation_rebuilds_once(self):
+        """статистика пересчитывается один раз на задачу, а не на пачку"""
+        posts = [
+            Post.objects.create(author=author, text='Пост', group=group)
+            for author, group in ((self.user, self.group),
+                                  (self.other, self.group),
+                                  (self.user, None),
+                                  (self.other, self.empty_group),
+                                  (self.user, self.group))
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            start_task(ModerationTask.REASSIGN_GROUP, [p.pk for p in posts],
+                       group=self.empty_group)
+            jobs.work('test', burst=True)
+        rebuilds = [query for query in ctx.captured_queries if query[
+            'sql'].startswith('DELETE FROM "posts_groupstats"')]
+        self.assertEqual(len(rebuilds), 1)
+        self.assertIsNone(self.stats(self.group))
+        self.assertEqual(self.stats(self.empty_group).post_count, 5)
+        self.assertEqual(dict(GroupAuthorStats.objects.filter(
+            group=self.empty_group).values_list('author_id', 'post_count')),
+            {self.user.pk: 3, self.other.pk: 2})
+
+    def test_rebuild_matches_incremental(self):
+        """пересчет с нуля дает те же счетчики"""
+        for author in (self.user, self.user, self.other):
+            Post.objects.create(author=author, text='Пост', group=self.group)
+        before = list(GroupAuthorStats.objects.values_list(
+            'author_id', 'post_count').order_by('author_id'))
+        group_stats.rebuild()
+        after = list(GroupAuthorStats.objects.values_list(
+            'author_id', 'post_count').order_by('author_id'))
+        self.assertEqual(before, after)
+
+    def test_directory_page(self):
+        """каталог групп показывает счетчики и активных авторов"""
+        for author in (self.user, self.user, self.other):
+            Post.objects.create(author=author, text='Пост', group=self.group)
+        response = self.client.get(reverse('posts:group_index'))
+        groups = list(response.context['page_obj'])
+        self.assertEqual([g['slug'] for g in groups], ['test_slug', 'empty'])
+        self.assertEqual(groups[0]['post_count'], 3)
+        self.assertEqual(
+            [a['username'] for a in groups[0]['top_authors']],
+            ['auth', 'other'])
+
+    def test_directory_is_cached(self):
+        """каталог читается из кэша и сбрасывается новым постом"""
+        self.client.get(reverse('posts:group_index'))
+        with self.assertNumQueries(0):
+            group_stats.directory()
+        Post.objects.create(author=self.user, text='Пост', group=self.group)
+        self.assertEqual(group_stats.directory()[0]['post_count'], 1)
+
+    @override_settings(LOCAL_CACHE_TIMEOUT=0)
+    def test_directory_local_cache_expires(self):
+        """в кэше процесса каталог видит посты других воркеров"""
+        group_stats.directory()
+        # пост из другого процесса: сброс ключа сюда не дойдет
+        GroupStats.objects.create(group=self.group, post_count=7)
+        self.assertEqual(group_stats.directory()[0]['post_count'], 7)
+
+    def test_concurrent_first_post_of_author(self):
+        """строку автора создал параллельный запрос - счетчик растет"""
+        Post.objects.create(author=self.other, text='Пост', group=self.group)
+        update = QuerySet.update
+        raced = []
+
+        def racing_update(queryset, **kwargs):
+            if queryset.model is GroupAuthorStats and not raced:
+                raced.append(True)
+                GroupAuthorStats.objects.create(
+                    group=self.group, author=self.user, post_count=1)
+                return 0
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', racing_update):
+            Post.objects.create(author=self.user, text='Пост',
+                                group=self.group)
+        self.assertEqual(GroupAuthorStats.objects.get(
+            group=self.group, author=self.user).post_count, 2)
@@ -0,0 +1,72 @@
+import unittest
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post
+
+try:
+    import jinja2
+except ImportError:
+    jinja2 = None
+
+User = get_user_model()
+FEED_TEMPLATES = {
+    'posts/index.html',
+    'posts/group_list.html',
+    'posts/profile.html',
+    'posts/follow.html',
+}
+
+
+@unittest.skipIf(jinja2 is None, 'jinja2 is not installed')
+@override_settings(JINJA2_TEMPLATES=FEED_TEMPLATES)
+class Jinja2FeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.follower = User.objects.create_user(username='follower')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            group=cls.group,
+        )
+        Follow.objects.create(user=cls.follower, author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.follower)
+
+    def test_feeds_rendered_by_jinja2(self):
+        """ленты рендерятся через jinja2 и содержат пост"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:follow_index'),
+        )
+        detail_url = reverse('posts:post_detail',
+                             kwargs={'post_id': self.post.pk})
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                # jinja2 не передает контекст в тестовый клиент
+                self.assertIsNone(response.context)
+                self.assertContains(response, self.post.text)
+                self.assertContains(response, detail_url)
+
+    def test_other_templates_use_django(self):
+        """шаблоны вне JINJA2_TEMPLATES рендерит Django"""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        self.assertTemplateUsed(response, 'posts/post_detail.html')
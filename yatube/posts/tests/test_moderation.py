@@ -0,0 +1,110 @@
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import jobs
+from core.models import Job
+from posts import moderation
+from posts.models import Comment, Group, ModerationTask, Post
+
+User = get_user_model()
+
+
+@override_settings(MODERATION_CHUNK_SIZE=2)
+class ModerationActionsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        cls.spammer = User.objects.create_user(username='spammer')
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.spam = [
+            Post.objects.create(author=cls.spammer, text=f'спам {i}')
+            for i in range(5)
+        ]
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+        Comment.objects.create(post=cls.post, author=cls.spammer, text='спам')
+
+    def setUp(self):
+        self.admin_client = Client()
+        self.admin_client.force_login(self.admin)
+        self.url = reverse('admin:posts_post_changelist')
+
+    def run_action(self, action, posts, **extra):
+        data = {
+            'action': action,
+            ACTION_CHECKBOX_NAME: [post.pk for post in posts],
+            **extra,
+        }
+        response = self.admin_client.post(self.url, data)
+        jobs.work('test', burst=True)
+        return response
+
+    def test_reassign_group(self):
+        """смена группы пачками с прогрессом"""
+        self.run_action('reassign_group', self.spam, group=self.group.pk)
+        self.assertEqual(self.group.posts.count(), len(self.spam))
+        task = ModerationTask.objects.get()
+        self.assertEqual(task.status, ModerationTask.DONE)
+        self.assertEqual(task.processed, len(self.spam))
+
+    def test_reassign_group_requires_group(self):
+        """без группы задача не создается"""
+        self.run_action('reassign_group', self.spam)
+        self.assertFalse(ModerationTask.objects.exists())
+
+    def test_delete_by_author(self):
+        """удаляются все посты автора выбранного поста"""
+        self.run_action('delete_by_author', self.spam[:1])
+        self.assertFalse(Post.objects.filter(author=self.spammer).exists())
+        self.assertTrue(Post.objects.filter(pk=self.post.pk).exists())
+
+    def test_purge_comments(self):
+        """удаляются комментарии выбранных постов"""
+        self.run_action('purge_comments', [self.post])
+        self.assertFalse(self.post.comments.exists())
+        self.assertTrue(Post.objects.filter(pk=self.post.pk).exists())
+
+    def test_task_queued_as_job(self):
+        """задача ждет обработчика run_jobs в персистентной очереди"""
+        self.admin_client.post(self.url, {
+            'action': 'purge_comments',
+            ACTION_CHECKBOX_NAME: [self.post.pk],
+        })
+        task = ModerationTask.objects.get()
+        self.assertEqual(task.status, ModerationTask.QUEUED)
+        self.assertEqual(list(task.items.values_list('post_id', flat=True)),
+                         [self.post.pk])
+        self.assertEqual(Job.objects.get().dedupe_key,
+                         f'moderation:{task.pk}')
+        self.assertTrue(self.post.comments.exists())
+        jobs.work('test', burst=True)
+        task.refresh_from_db()
+        self.assertEqual(task.status, ModerationTask.DONE)
+        self.assertFalse(self.post.comments.exists())
+
+    def test_resume_after_crash(self):
+        """повтор задачи продолжает с первой незаписанной пачки"""
+        task = moderation.start_task(ModerationTask.REASSIGN_GROUP,
+                                     [post.pk for post in self.spam],
+                                     group=self.group)
+        # процесс умер после первой пачки, задача осталась RUNNING
+        Post.objects.filter(pk__in=[p.pk for p in self.spam[:2]]).update(
+            group=self.group)
+        ModerationTask.objects.filter(pk=task.pk).update(
+            status=ModerationTask.RUNNING, processed=2)
+        Post.objects.filter(pk=self.spam[0].pk).update(group=None)
+        jobs.work('test', burst=True)
+        task.refresh_from_db()
+        self.assertEqual(task.status, ModerationTask.DONE)
+        self.assertEqual(task.processed, len(self.spam))
+        # первая пачка не обрабатывается заново
+        self.assertEqual(self.group.posts.count(), len(self.spam) - 1)
+        self.assertEqual(self.group.stats.post_count, len(self.spam) - 1)
@@ -0,0 +1,113 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from posts import notifications
+from posts.models import Comment, Follow, Notification, Post
+
+User = get_user_model()
+
+
+@override_settings(BACKGROUND_EAGER=True, NOTIFICATIONS_FLUSH_DELAY=0)
+class NotificationsTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username='author', email='author@example.com')
+        self.follower = User.objects.create_user(
+            username='follower', email='follower@example.com')
+        self.post = Post.objects.create(author=self.author,
+                                        text='Тестовый пост')
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+
+    def test_comment_notifies_post_author(self):
+        """комментарий создает уведомление автору поста"""
+        self.follower_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Комментарий'})
+        notification = Notification.objects.get()
+        self.assertEqual(notification.user, self.author)
+        self.assertEqual(notification.kind, Notification.NEW_COMMENT)
+
+    def test_rollback_does_not_block_queue(self):
+        """откаченное уведомление не пишется и не останавливает очередь"""
+        with transaction.atomic():
+            comment = Comment.objects.create(
+                post=self.post, author=self.follower, text='Откат')
+            notifications.notify_new_comment(comment)
+            transaction.set_rollback(True)
+        self.follower_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Комментарий'})
+        notification = Notification.objects.get()
+        self.assertEqual(notification.comment.text, 'Комментарий')
+
+    def test_own_comment_not_notified(self):
+        """свой комментарий не создает уведомление"""
+        self.author_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Комментарий'})
+        self.assertFalse(Notification.objects.exists())
+
+    def test_new_post_notifies_followers(self):
+        """новый пост создает уведомления подписчикам"""
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.author_client.post(reverse('posts:post_create'),
+                                {'text': 'Новый пост'})
+        notification = Notification.objects.get()
+        self.assertEqual(notification.user, self.follower)
+        self.assertEqual(notification.kind, Notification.NEW_POST)
+
+    def test_unread_badge_and_mark_read(self):
+        """счетчик в шапке обновляется и сбрасывается на странице"""
+        response = self.author_client.get(reverse('about:author'))
+        self.assertEqual(response.context['unread_notifications'], 0)
+        self.follower_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Комментарий'})
+        response = self.author_client.get(reverse('about:author'))
+        self.assertEqual(response.context['unread_notifications'], 1)
+        response = self.author_client.get(reverse('posts:notifications'))
+        self.assertEqual(len(response.context['page_obj']), 1)
+        self.assertFalse(Notification.objects.filter(is_read=False).exists())
+        response = self.author_client.get(reverse('about:author'))
+        self.assertEqual(response.context['unread_notifications'], 0)
+
+    @override_settings(LOCAL_CACHE_TIMEOUT=0)
+    def test_unread_badge_from_other_process(self):
+        """с кэшем процесса счетчик видит уведомления других воркеров"""
+        response = self.author_client.get(reverse('about:author'))
+        self.assertEqual(response.context['unread_notifications'], 0)
+        # запись пачки в другом процессе не трогает этот кэш
+        Notification.objects.create(
+            user=self.author, actor=self.follower,
+            kind=Notification.NEW_POST, post=self.post)
+        response = self.author_client.get(reverse('about:author'))
+        self.assertEqual(response.context['unread_notifications'], 1)
+
+    def test_email_digest(self):
+        """дайджест - одно письмо на пользователя"""
+        Follow.objects.create(user=self.follower, author=self.author)
+        for text in ('Пост 1', 'Пост 2'):
+            self.author_client.post(reverse('posts:post_create'),
+                                    {'text': text})
+        self.follower_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Комментарий'})
+        call_command('send_notification_digests', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            ['author@example.com', 'follower@example.com'])
+        self.assertFalse(Notification.objects.filter(emailed=False).exists())
+        call_command('send_notification_digests', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 2)
@@ -0,0 +1,92 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import partitions
+from posts.models import Follow, Group, Post
+from posts.utils import NUM_POST_ON_THE_PAGE
+
+User = get_user_model()
+
+
+class PartitionsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test_slug',
+            description='Тестовое описание')
+        now = timezone.now()
+        # несколько месяцев с постами, между ними пустые, одинаковые даты
+        days = [0, 0, 1, 2, 40, 41, 41, 41, 200, 201, 202, 500, 500, 501,
+                700, 701, 702, 703, 704, 705, 900, 901, 902, 903, 904]
+        for i, days_ago in enumerate(days):
+            post = Post.objects.create(
+                author=cls.user, text=f'Пост {i}',
+                group=cls.group if i % 2 else None)
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=now - timedelta(days=days_ago))
+
+    def setUp(self):
+        cache.clear()
+
+    def walk(self, queryset, size):
+        texts, cursor, pages = [], None, 0
+        while True:
+            posts, cursor = partitions.feed_page(queryset, size, cursor)
+            texts += [post.text for post in posts]
+            pages += 1
+            if cursor is None:
+                return texts, pages
+
+    def test_walk_matches_ordering(self):
+        """курсор проходит все разделы в порядке ленты без повторов"""
+        for queryset in (Post.objects.all(), self.group.posts.all(),
+                         Post.objects.filter(
+                             author__following__user=self.reader)):
+            expected = [post.text for post in queryset.order_by(
+                '-pub_date', '-pk')]
+            for size in (1, 3, NUM_POST_ON_THE_PAGE):
+                with self.subTest(queryset=queryset.query, size=size):
+                    texts, pages = self.walk(queryset, size)
+                    self.assertEqual(texts, expected)
+                    self.assertEqual(pages, max(1, -(-len(expected) // size)))
+
+    def test_full_partition_is_one_query(self):
+        """страница из одного месяца читается одним запросом"""
+        # посты 5, 6 и 7 опубликованы в один момент
+        cursor = partitions.make_cursor(Post.objects.get(text='Пост 7'))
+        with self.assertNumQueries(1):
+            posts, _ = partitions.feed_page(Post.objects.all(), 1, cursor)
+        self.assertEqual([post.text for post in posts], ['Пост 6'])
+
+    def test_bad_cursor(self):
+        """испорченный курсор дает первую страницу"""
+        first, _ = partitions.feed_page(Post.objects.all(), 3)
+        for cursor in ('', 'abc', '1_2_3', '12'):
+            with self.subTest(cursor=cursor):
+                posts, _ = partitions.feed_page(Post.objects.all(), 3, cursor)
+                self.assertEqual(posts, first)
+
+    def test_cursor_views(self):
+        """ленты отдают страницы по ?cursor= со ссылкой на следующую"""
+        self.client.force_login(self.reader)
+        for url in (reverse('posts:index'),
+                    reverse('posts:group_list', args=('test_slug',)),
+                    reverse('posts:follow_index')):
+            with self.subTest(url=url):
+                response = self.client.get(url, {'cursor': ''})
+                page_obj = response.context['page_obj']
+                self.assertTrue(page_obj.is_first)
+                self.assertContains(
+                    response, f'?cursor={page_obj.next_cursor}')
+                response = self.client.get(
+                    url, {'cursor': page_obj.next_cursor})
+                self.assertFalse(response.context['page_obj'].is_first)
+                self.assertContains(response, '?cursor=')
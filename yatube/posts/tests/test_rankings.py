@@ -0,0 +1,103 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import rankings
+from posts.models import (Comment, Group, GroupScore, Post, PostScore,
+                          RankingState)
+
+User = get_user_model()
+
+
+@override_settings(
+    RANKING_WEIGHTS={'post': 1.0, 'comment': 3.0, 'view': 0.1})
+class RankingsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.quiet_group = Group.objects.create(
+            title='Тихая группа',
+            slug='quiet',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(author=cls.user, text=f'Пост {i}',
+                                group=cls.group)
+            for i in range(3)
+        ]
+        cls.quiet_post = Post.objects.create(
+            author=cls.user, text='Тихий пост', group=cls.quiet_group)
+
+    def comment(self, post, count=1):
+        for _ in range(count):
+            Comment.objects.create(post=post, author=self.user, text='текст')
+
+    def test_comments_raise_post_and_group(self):
+        """комментарии поднимают пост и его группу"""
+        self.comment(self.posts[0], 2)
+        rankings.refresh()
+        self.assertEqual(list(rankings.popular_posts())[0], self.posts[0])
+        self.assertEqual(rankings.trending_groups()[0], self.group)
+
+    def test_refresh_is_incremental(self):
+        """повторный пересчет учитывает только новые события"""
+        self.assertEqual(rankings.refresh(), len(self.posts) + 1)
+        self.assertEqual(rankings.refresh(), 0)
+        score = PostScore.objects.get(pk=self.quiet_post.pk).score
+        self.comment(self.quiet_post)
+        self.assertEqual(rankings.refresh(), 1)
+        self.assertGreater(
+            PostScore.objects.get(pk=self.quiet_post.pk).score, score)
+
+    def test_old_events_decay(self):
+        """старый комментарий весит меньше свежего"""
+        rankings.refresh()
+        self.comment(self.posts[0])
+        self.comment(self.posts[1])
+        Comment.objects.filter(post=self.posts[0]).update(
+            created=timezone.now() - timedelta(days=7))
+        rankings.refresh()
+        old, fresh = (PostScore.objects.get(pk=post.pk).score
+                      for post in self.posts[:2])
+        self.assertLess(old, fresh)
+
+    @override_settings(RANKING_REBASE_AFTER=1)
+    def test_rebase_keeps_order(self):
+        """сдвиг точки отсчета не меняет порядок"""
+        self.comment(self.posts[1])
+        rankings.refresh()
+        order = list(rankings.popular_posts())
+        RankingState.objects.update(
+            landmark=timezone.now() - timedelta(days=30))
+        rankings.refresh()
+        self.assertEqual(list(rankings.popular_posts()), order)
+        self.assertGreater(
+            RankingState.objects.get().landmark,
+            timezone.now() - timedelta(days=30))
+
+    def test_rebuild_command(self):
+        """команда с --full пересчитывает рейтинги с нуля"""
+        rankings.refresh()
+        PostScore.objects.update(score=0)
+        call_command('refresh_rankings', '--full', stdout=StringIO())
+        self.assertFalse(PostScore.objects.filter(score=0).exists())
+        self.assertEqual(GroupScore.objects.count(), 2)
+
+    def test_popular_page(self):
+        """страница популярного выводит посты по рейтингу"""
+        self.comment(self.quiet_post, 3)
+        rankings.refresh()
+        response = Client().get(reverse('posts:popular'))
+        self.assertEqual(response.context['page_obj'][0], self.quiet_post)
+        self.assertEqual(response.context['trending_groups'][0],
+                         self.quiet_group)
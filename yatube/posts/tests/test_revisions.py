@@ -0,0 +1,89 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts import revisions
+from posts.models import Post, PostRevision
+
+User = get_user_model()
+
+
+class RevisionsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.post = Post.objects.create(author=cls.user, text='раз два три')
+
+    def edit(self, text):
+        self.client.force_login(self.user)
+        post = Post.objects.get(pk=self.post.pk)
+        response = self.client.post(
+            reverse('posts:post_edit', args=(post.pk,)),
+            {'text': text, 'version': post.version})
+        self.assertEqual(response.status_code, 302)
+
+    def test_delta_roundtrip(self):
+        """разница восстанавливает новый текст"""
+        cases = (('', ''), ('', 'текст'), ('текст', ''),
+                 ('раз два три', 'раз три'), ('раз  два\nтри', 'раз\nдва'),
+                 ('а б в г д', 'а x в г y д z'))
+        for old, new in cases:
+            with self.subTest(old=old, new=new):
+                delta = revisions.make_delta(old, new)
+                self.assertEqual(revisions.apply_delta(old, delta), new)
+
+    def test_post_edit_records_revisions(self):
+        """правка поста сохраняет исходный снимок и разницу"""
+        self.edit('раз два три четыре')
+        self.assertEqual(
+            list(self.post.revisions.order_by('number').values_list(
+                'number', 'is_snapshot', 'author')),
+            [(1, True, None), (2, False, self.user.pk)])
+        self.assertEqual(revisions.text_at(self.post.pk, 1), 'раз два три')
+        self.assertEqual(revisions.text_at(self.post.pk, 2),
+                         'раз два три четыре')
+
+    @override_settings(POST_REVISION_SNAPSHOT_EVERY=3)
+    def test_text_at_every_version(self):
+        """любая версия собирается через границы снимков"""
+        texts = ['раз два три']
+        for i in range(8):
+            texts.append(f'{texts[-1]} слово{i}'.replace('два', f'два{i}'))
+            self.edit(texts[-1])
+        snapshots = self.post.revisions.filter(is_snapshot=True)
+        self.assertEqual(
+            list(snapshots.values_list('number', flat=True)), [7, 4, 1])
+        for number, text in enumerate(texts, 1):
+            with self.subTest(number=number):
+                self.assertEqual(revisions.text_at(self.post.pk, number),
+                                 text)
+        with self.assertRaises(PostRevision.DoesNotExist):
+            revisions.text_at(self.post.pk, 100)
+
+    def test_text_changed_outside_history(self):
+        """если текст меняли в обход истории, старый текст - снимок"""
+        self.edit('раз два')
+        Post.objects.filter(pk=self.post.pk).update(text='мимо', version=3)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text, post.version = 'мимо истории', 4
+        revisions.record(post, 'мимо', self.user)
+        self.assertEqual(revisions.text_at(self.post.pk, 3), 'мимо')
+        self.assertEqual(revisions.text_at(self.post.pk, 4), 'мимо истории')
+
+    def test_admin_pages(self):
+        """ревизии видны на странице поста и открываются в админке"""
+        self.edit('раз два три четыре')
+        revision = self.post.revisions.get(number=2)
+        self.client.force_login(self.admin)
+        response = self.client.get(
+            reverse('admin:posts_post_change', args=(self.post.pk,)))
+        self.assertContains(response, reverse(
+            'admin:posts_postrevision_change', args=(revision.pk,)))
+        response = self.client.get(
+            reverse('admin:posts_postrevision_change', args=(revision.pk,)))
+        self.assertContains(response, 'раз два три четыре')
+        response = self.client.get(
+            reverse('admin:posts_postrevision_changelist'))
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,131 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts import archive, threads
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+@override_settings(COMMENT_REPLIES_PREVIEW=3)
+class ThreadsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+        cls.other = Post.objects.create(author=cls.user, text='Другой пост')
+        # r0: a (b (d)), c, e; r1: f; r2
+        cls.comments = {}
+        for name, parent in (('r0', None), ('r1', None), ('r2', None),
+                             ('a', 'r0'), ('b', 'a'), ('c', 'r0'),
+                             ('d', 'b'), ('e', 'r0'), ('f', 'r1')):
+            cls.comments[name] = Comment.objects.create(
+                post=cls.post, author=cls.user, text=name,
+                parent=cls.comments.get(parent))
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, name):
+        return Comment.objects.get(pk=self.comments[name].pk)
+
+    def texts(self, comments):
+        return [comment.text for comment in comments]
+
+    def test_path_and_reply_count(self):
+        """ответ получает путь и глубину, предки - счетчик ответов"""
+        d = self.get('d')
+        self.assertEqual(d.depth, 3)
+        self.assertEqual(threads.ancestor_ids(d.path), [
+            self.comments[name].pk for name in ('r0', 'a', 'b')])
+        counts = {name: self.get(name).reply_count
+                  for name in ('r0', 'a', 'b', 'r1', 'r2')}
+        self.assertEqual(counts, {'r0': 5, 'a': 2, 'b': 1, 'r1': 1, 'r2': 0})
+
+    def test_thread_order(self):
+        """ветка и поддерево читаются одним запросом в порядке обхода"""
+        with self.assertNumQueries(1):
+            comments = threads.thread(self.post.comments.all())
+        self.assertEqual(self.texts(comments),
+                         ['r0', 'a', 'b', 'd', 'c', 'e', 'r1', 'f', 'r2'])
+        with self.assertNumQueries(1):
+            comments = threads.thread(self.post.comments.all(),
+                                      self.comments['a'])
+        self.assertEqual(self.texts(comments), ['a', 'b', 'd'])
+
+    def test_top_level_page(self):
+        """корни с первыми ответами за постоянное число запросов"""
+        with self.assertNumQueries(4):
+            page = threads.top_level_page(self.post, 1)
+        self.assertEqual(self.texts(page),
+                         ['r0', 'a', 'b', 'd', 'r1', 'f', 'r2'])
+        hidden = {comment.text: comment.hidden_replies
+                  for comment in page if comment.depth == 0}
+        self.assertEqual(hidden, {'r0': 2, 'r1': 0, 'r2': 0})
+        for i in range(threads.COMMENTS_PER_PAGE):
+            root = Comment.objects.create(
+                post=self.post, author=self.user, text=f'корень {i}')
+            Comment.objects.create(post=self.post, author=self.user,
+                                   text=f'ответ {i}', parent=root)
+        with self.assertNumQueries(4):
+            page = threads.top_level_page(self.post, 2)
+        self.assertEqual(len(page), 6)
+
+    def test_delete_reply(self):
+        """удаление ответа с поддеревом уменьшает счетчики предков"""
+        self.get('a').delete()
+        self.assertEqual(self.get('r0').reply_count, 2)
+        self.assertEqual(
+            self.texts(threads.thread(self.post.comments.all())),
+            ['r0', 'c', 'e', 'r1', 'f', 'r2'])
+
+    def test_max_depth(self):
+        """слишком глубокий ответ становится соседом родителя"""
+        parent = self.comments['r2']
+        for i in range(threads.MAX_DEPTH + 1):
+            parent = Comment.objects.create(
+                post=self.post, author=self.user, text=f'уровень {i}',
+                parent=parent)
+        self.assertEqual(parent.depth, threads.MAX_DEPTH - 1)
+        self.assertEqual(self.get('r2').reply_count, threads.MAX_DEPTH + 1)
+
+    def test_add_reply(self):
+        """ответ из формы цепляется только к комментарию того же поста"""
+        self.client.force_login(self.user)
+        parent = self.comments['b']
+        for post, text in ((self.post, 'ответ'), (self.other, 'чужой')):
+            self.client.post(
+                reverse('posts:add_comment', args=(post.pk,)),
+                {'text': text, 'parent': parent.pk})
+        self.assertEqual(Comment.objects.get(text='ответ').parent, parent)
+        alien = Comment.objects.get(text='чужой')
+        self.assertIsNone(alien.parent)
+        self.assertEqual(alien.post, self.other)
+        self.assertEqual(self.get('r0').reply_count, 6)
+
+    def test_post_detail(self):
+        """пост показывает ветку, ссылку на остальные ответы и форму ответа"""
+        self.client.force_login(self.user)
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        r0 = self.comments['r0']
+        response = self.client.get(url)
+        self.assertEqual(self.texts(response.context['comments']),
+                         ['r0', 'a', 'b', 'd', 'r1', 'f', 'r2'])
+        self.assertContains(response, f'?thread={r0.pk}')
+        response = self.client.get(
+            url, {'thread': r0.pk, 'reply_to': self.comments['e'].pk})
+        self.assertEqual(self.texts(response.context['comments']),
+                         ['r0', 'a', 'b', 'd', 'c', 'e'])
+        self.assertContains(
+            response,
+            f'name="parent" value="{self.comments["e"].pk}"')
+
+    def test_archive_keeps_threads(self):
+        """архивные комментарии идут в порядке веток"""
+        archive.archive_posts([self.post.pk])
+        comments = archive.get_comments(archive.get_post(self.post.pk))
+        self.assertEqual(self.texts(comments),
+                         ['r0', 'a', 'b', 'd', 'c', 'e', 'r1', 'f', 'r2'])
+        self.assertEqual(comments[0].reply_count, 5)
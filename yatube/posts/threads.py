@@ -0,0 +1,154 @@
+"""Ветки комментариев.
+
+Comment.path - номера предков фиксированной ширины через '/', у
+комментария верхнего уровня пустой. Путь известен до вставки, поэтому
+ответ пишется одним INSERT, а у всех предков одним UPDATE растет
+reply_count - число всех ответов в поддереве. Сортировка по ключу
+path + свой номер дает ветку в порядке обхода в глубину, поддерево
+комментария - строки с path, начинающимся с его ключа.
+
+Загрузка за постоянное число запросов, без рекурсии по узлам:
+- thread - все комментарии поста или поддерево одного комментария;
+- top_level_page - страница комментариев верхнего уровня и первые
+  COMMENT_REPLIES_PREVIEW ответов каждого одним запросом с оконной
+  функцией ROW_NUMBER.
+"""
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import (Case, CharField, F, IntegerField, Q, Value,
+                              When, Window, prefetch_related_objects)
+from django.db.models.functions import Cast, Concat, LPad, RowNumber, Substr
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Comment
+
+SEGMENT = 10
+# path не длиннее 255 символов: ответ на комментарий последнего уровня
+# становится его соседом
+MAX_DEPTH = 20
+COMMENTS_PER_PAGE = 20
+
+
+def segment(pk):
+    return f'{pk:0{SEGMENT}d}/'
+
+
+def ancestor_ids(path):
+    return [int(part) for part in path.split('/') if part]
+
+
+def key(comment):
+    """Ключ порядка в ветке, он же префикс path всех ответов."""
+    return comment.path + segment(comment.pk)
+
+
+def thread_key():
+    return Concat(
+        'path', LPad(Cast('pk', CharField()), SEGMENT, Value('0')),
+        Value('/'), output_field=CharField())
+
+
+def root_id():
+    return Case(
+        When(path='', then=F('pk')),
+        default=Cast(Substr('path', 1, SEGMENT), IntegerField()),
+        output_field=IntegerField())
+
+
+@receiver(pre_save, sender=Comment)
+def fill_path(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is not None or instance.parent_id is None:
+        return
+    parent = instance.parent
+    if parent.depth + 1 >= MAX_DEPTH:
+        instance.parent_id = parent.parent_id
+        instance.path = parent.path
+    else:
+        instance.path = key(parent)
+    instance.depth = len(ancestor_ids(instance.path))
+    instance.post_id = parent.post_id
+
+
+def _add_replies(comment, delta):
+    Comment.objects.filter(pk__in=ancestor_ids(comment.path)).update(
+        reply_count=F('reply_count') + delta)
+
+
+@receiver(post_save, sender=Comment)
+def reply_added(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.path:
+        _add_replies(instance, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def reply_deleted(sender, instance, **kwargs):
+    # при удалении поддерева каждый удаленный ответ вычитает себя у
+    # предков, уже удаленные строки UPDATE просто не находит
+    if instance.path:
+        _add_replies(instance, -1)
+
+
+def thread(comments, root=None):
+    """Комментарии queryset comments в порядке ветки одним запросом.
+
+    С root - только root и его ответы.
+    """
+    if root is not None:
+        comments = comments.filter(
+            Q(pk=root.pk) | Q(path__startswith=key(root)))
+    return list(comments.select_related('author').annotate(
+        thread_key=thread_key()).order_by('thread_key'))
+
+
+def post_thread(post, comment_id):
+    """Комментарий comment_id поста со всеми ответами или None."""
+    if not comment_id:
+        return None
+    try:
+        root = post.comments.get(pk=comment_id)
+    except (Comment.DoesNotExist, ValueError):
+        return None
+    return thread(post.comments.all(), root)
+
+
+def replies_preview(post, roots, limit):
+    """Первые limit ответов каждого из roots в порядке ветки."""
+    if not roots or not limit:
+        return []
+    replies = Comment.objects.filter(post=post, depth__gt=0).annotate(
+        root_id=root_id(),
+    ).filter(root_id__in=[root.pk for root in roots]).annotate(
+        thread_key=thread_key(),
+        position=Window(RowNumber(), partition_by=[F('root_id')],
+                        order_by=F('thread_key').asc()),
+    )
+    sql, params = replies.query.sql_with_params()
+    # по оконной функции нельзя фильтровать в том же SELECT
+    return list(Comment.objects.raw(
+        f'SELECT * FROM ({sql}) replies WHERE position <= %s '
+        f'ORDER BY thread_key', (*params, limit)))
+
+
+def top_level_page(post, number, limit=None):
+    """Страница корней и лента для шаблона: корень, его первые ответы.
+
+    Всего четыре запроса: число корней, корни, ответы и их авторы.
+    """
+    if limit is None:
+        limit = settings.COMMENT_REPLIES_PREVIEW
+    roots = post.comments.filter(parent=None).select_related(
+        'author').order_by('pk')
+    page = Paginator(roots, COMMENTS_PER_PAGE).get_page(number)
+    roots = list(page.object_list)
+    by_root = {root.pk: [] for root in roots}
+    replies = replies_preview(post, roots, limit)
+    prefetch_related_objects(replies, 'author')
+    for reply in replies:
+        by_root[reply.root_id].append(reply)
+    comments = []
+    for root in roots:
+        root.hidden_replies = root.reply_count - len(by_root[root.pk])
+        comments += [root, *by_root[root.pk]]
+    page.object_list = comments
+    return page
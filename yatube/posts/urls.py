@@ -6,6 +6,8 @@ app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('popular/', views.popular, name='popular'),
+    path('groups/', views.group_index, name='group_index'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
@@ -14,6 +16,7 @@ urlpatterns = [
     path('posts/<int:post_id>/comment/', views.add_comment,
          name='add_comment'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('notifications/', views.notification_index, name='notifications'),
     path('profile/<str:username>/follow/', views.profile_follow,
          name='profile_follow'),
     path('profile/<str:username>/unfollow/', views.profile_unfollow,
@@ -1,10 +1,183 @@
+from django.conf import settings
 from django.core.paginator import Paginator
+from django.db import connections, router
+from django.db.models import Count, Max
+from django.shortcuts import render
+from django.utils.functional import cached_property
+
+from core import metrics
+
+from . import partitions
+from .models import Post, RankingState
 
 NUM_POST_ON_THE_PAGE = 10
+# в CASE на строку уходит три параметра, SQLite допускает 999
+INCREMENT_CHUNK_SIZE = 300
+
+
+metrics.histogram('yatube_paginator_count_seconds',
+                  'Время COUNT(*) для пагинации лент')
+
+
+class TimedPaginator(Paginator):
+    @cached_property
+    def count(self):
+        with metrics.timer('yatube_paginator_count_seconds'):
+            return super().count
 
 
-def get_post_obj(request, post_list):
-    paginator = Paginator(post_list, NUM_POST_ON_THE_PAGE)
+class FeedPaginator(TimedPaginator):
+    """Страницы ленты постов отложенным соединением.
+
+    OFFSET и сортировка идут по номерам постов, автор и группа
+    присоединяются только к строкам страницы (см. partitions.page_rows).
+    """
+
+    def page(self, number):
+        page = super().page(number)
+        # срез еще не выполнен: берем из него только номера
+        ids = page.object_list.values('pk')
+        page.object_list = list(self.object_list.filter(pk__in=ids))
+        return page
+
+
+def get_post_obj(request, post_list, paginator_class=TimedPaginator):
+    paginator = paginator_class(post_list, NUM_POST_ON_THE_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
+
+
+class CursorPage:
+    """Страница ленты по курсору (posts.partitions) для шаблонов лент."""
+    is_cursor_page = True
+
+    def __init__(self, object_list, next_cursor, is_first):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.is_first = is_first
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+
+def get_feed_page(request, post_list):
+    """Страница ленты: по курсору, если он есть в запросе, иначе по номеру.
+
+    ?cursor= без значения - первая страница в курсорном режиме.
+    """
+    cursor = request.GET.get('cursor')
+    if cursor is None:
+        return get_post_obj(request, post_list, FeedPaginator)
+    posts, next_cursor = partitions.feed_page(
+        post_list, NUM_POST_ON_THE_PAGE, cursor)
+    return CursorPage(posts, next_cursor, is_first=not cursor)
+
+
+def render_feed(request, template, context):
+    """Рендер ленты через Jinja2, если шаблон включен в JINJA2_TEMPLATES."""
+    using = 'jinja2' if template in settings.JINJA2_TEMPLATES else None
+    return render(request, template, context, using=using)
+
+
+def bulk_insert(model, fields, rows, ignore_conflicts=False):
+    """Вставить кортежи значений полей fields одним executemany.
+
+    В обход ORM: без объектов моделей и сигналов, значения уже должны
+    быть в формате базы.
+    """
+    connection = connections[router.db_for_write(model)]
+    ops = connection.ops
+    columns = [model._meta.get_field(name).column for name in fields]
+    sql = '{} {} ({}) VALUES ({}) {}'.format(
+        ops.insert_statement(ignore_conflicts=ignore_conflicts),
+        ops.quote_name(model._meta.db_table),
+        ', '.join(map(ops.quote_name, columns)),
+        ', '.join(['%s'] * len(columns)),
+        ops.ignore_conflicts_suffix_sql(ignore_conflicts),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def bulk_increment(model, field, deltas, **extra):
+    """Прибавить deltas {pk: приращение} к полю field пачками UPDATE.
+
+    Прибавление выполняет база (field = field + CASE ...), поэтому
+    одновременные вызовы из разных процессов не теряют приращения.
+    SQL собирается вручную: Case/When из ORM компилируется примерно
+    0,1 мс на строку, и на больших пересчетах это было основное время.
+    """
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    meta = model._meta
+    table = quote(meta.db_table)
+    pk_column = quote(meta.pk.column)
+    column = quote(meta.get_field(field).column)
+    assignments = ''.join(
+        f', {quote(meta.get_field(name).column)} = %s' for name in extra)
+    extra_params = [
+        meta.get_field(name).get_db_prep_save(value, connection)
+        for name, value in extra.items()
+    ]
+    pks = list(deltas)
+    with connection.cursor() as cursor:
+        for start in range(0, len(pks), INCREMENT_CHUNK_SIZE):
+            chunk = pks[start:start + INCREMENT_CHUNK_SIZE]
+            cursor.execute(
+                f'UPDATE {table} SET {column} = {column} + CASE {pk_column} '
+                f'{" ".join(["WHEN %s THEN %s"] * len(chunk))} ELSE 0 END'
+                f'{assignments} '
+                f'WHERE {pk_column} IN ({", ".join(["%s"] * len(chunk))})',
+                [value for pk in chunk for value in (pk, deltas[pk])]
+                + extra_params + chunk,
+            )
+
+
+# Функции для core.middleware.CacheHeadersMiddleware: время последнего
+# изменения страницы (публикация или правка поста, комментарий) и ключ
+# для ETag, который меняется, и когда пост уходит со страницы.
+def _latest(*dates):
+    return max(filter(None, dates), default=None)
+
+
+def _feed_validators(post_list):
+    state = post_list.aggregate(published=Max('pub_date'),
+                                edited=Max('edited'), count=Count('pk'))
+    return _latest(state['published'], state['edited']), state['count']
+
+
+def index_validators(request):
+    return _feed_validators(Post.objects.all())
+
+
+def group_validators(request, slug):
+    return _feed_validators(Post.objects.filter(group__slug=slug))
+
+
+def profile_validators(request, username):
+    return _feed_validators(Post.objects.filter(author__username=username))
+
+
+def post_detail_validators(request, post_id):
+    post = Post.objects.filter(pk=post_id).annotate(
+        last_comment=Max('comments__created'),
+        comment_count=Count('comments'),
+    ).values('pub_date', 'edited', 'last_comment', 'comment_count').first()
+    if post is None:
+        return None, None
+    return (_latest(post['pub_date'], post['edited'], post['last_comment']),
+            post['comment_count'])
+
+
+def popular_validators(request):
+    state = RankingState.objects.filter(pk=1).values('refreshed').first()
+    edited = Post.objects.filter(score__isnull=False).aggregate(
+        edited=Max('edited'))['edited']
+    return _latest(state and state['refreshed'], edited), None
@@ -1,65 +1,116 @@
+from django.http import Http404
 from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
 
-from .models import Group, Post, User, Follow
+from core.cache import cache_page_per_user
+from core.jobs import enqueue
+
+from . import (archive, counters, follow_graph, group_stats, notifications,
+               rankings, revisions, threads)
+from .models import ArchivedPost, Group, Post, User, Follow, Notification
 from .forms import PostForm, CommentForm
-from .utils import get_post_obj
+from .tasks import generate_thumbnail
+from .utils import get_feed_page, get_post_obj, render_feed
+
+CONFLICT_MESSAGE = ('Пост изменили, пока вы его редактировали. Сверьтесь '
+                    'с текущим текстом и сохраните еще раз.')
 
 
-@cache_page(20, key_prefix='index_page')
+# в ленте кнопки подписки текущего пользователя: копия кэша у каждого своя
+@cache_page_per_user(20, key_prefix='index_page')
 def index(request):
     template = 'posts/index.html'
     post_list = Post.objects.select_related('group', 'author')
-    page_obj = get_post_obj(request, post_list)
+    page_obj = get_feed_page(request, post_list)
+    follow_graph.annotate_following(request.user, page_obj)
     context = {
         'page_obj': page_obj,
     }
-    return render(request, template, context)
+    return render_feed(request, template, context)
 
 
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    page_obj = get_post_obj(request, post_list)
+    post_list = group.posts.select_related('author')
+    page_obj = get_feed_page(request, post_list)
+    follow_graph.annotate_following(request.user, page_obj)
     context = {
         'group': group,
         'page_obj': page_obj,
     }
-    return render(request, template, context)
+    return render_feed(request, template, context)
+
+
+def group_index(request):
+    template = 'posts/group_index.html'
+    page_obj = get_post_obj(request, group_stats.directory())
+    return render(request, template, {'page_obj': page_obj})
+
+
+def popular(request):
+    template = 'posts/popular.html'
+    page_obj = get_post_obj(request, rankings.popular_posts())
+    follow_graph.annotate_following(request.user, page_obj)
+    context = {
+        'page_obj': page_obj,
+        'trending_groups': rankings.trending_groups(),
+    }
+    return render_feed(request, template, context)
 
 
 def profile(request, username):
     template = 'posts/profile.html'
     author = get_object_or_404(User, username=username)
-    post_list = author.posts.select_related('author')
+    post_list = archive.TieredPosts(
+        author.posts.select_related('author'),
+        ArchivedPost.objects.filter(author=author))
     page_obj = get_post_obj(request, post_list)
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user,
-            author=author
-        ).exists()
-    else:
-        following = False
+    following = follow_graph.is_following(request.user.id, author.id)
     context = {
         'author': author,
         'page_obj': page_obj,
         'following': following,
     }
-    return render(request, template, context)
+    return render_feed(request, template, context)
+
+
+def _post_comment(post, comment_id):
+    if not comment_id:
+        return None
+    try:
+        return post.comments.filter(pk=comment_id).first()
+    except ValueError:
+        return None
 
 
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
+    post = Post.objects.filter(pk=post_id).first()
+    comments_page = reply_to = None
+    if post is not None:
+        counters.record_view(post.pk)
+        reply_to = _post_comment(post, request.GET.get('reply_to'))
+        # ?thread= - ветка одного комментария целиком
+        comments = threads.post_thread(post, request.GET.get('thread'))
+        if comments is None:
+            comments_page = threads.top_level_page(
+                post, request.GET.get('comments_page'))
+            comments = comments_page.object_list
+    else:
+        post = archive.get_post(post_id)
+        if post is None:
+            raise Http404
+        comments = archive.get_comments(post)
     form = CommentForm()
-    comments = post.comments.all()
     context = {
         'post': post,
         'form': form,
         'comments': comments,
-        'author': post.author
+        'comments_page': comments_page,
+        'reply_to': reply_to,
+        'author': post.author,
+        'is_archived': isinstance(post, ArchivedPost),
     }
     return render(request, template, context)
 
@@ -73,27 +124,58 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        if post.image:
+            enqueue(generate_thumbnail, post.pk,
+                    dedupe_key=f'thumbnail:{post.pk}')
+        notifications.notify_new_post(post)
+        rankings.schedule()
         return redirect("posts:profile", post.author.username)
     return render(request, template, {'form': form})
 
 
+def _posted_version(request):
+    try:
+        return int(request.POST['version'])
+    except (KeyError, ValueError):
+        return None
+
+
 @login_required
 def post_edit(request, post_id):
     template = 'posts/create_post.html'
     post = get_object_or_404(Post, pk=post_id)
+    old_group_id = post.group_id
+    old_text = post.text
     is_edit = True
+    status = 200
+    current_text = None
     form = PostForm(request.POST or None,
                     files=request.FILES or None,
-                    instance=post)
+                    instance=post,
+                    version=_posted_version(request))
     if form.is_valid():
-        form.save()
-        return redirect('posts:post_detail', post_id)
+        if form.save_changed():
+            group_stats.post_moved(post, old_group_id)
+            revisions.record(post, old_text, request.user)
+            if 'image' in form.changed_data and post.image:
+                enqueue(generate_thumbnail, post.pk,
+                        dedupe_key=f'thumbnail:{post.pk}')
+            return redirect('posts:post_detail', post_id)
+        # пост изменили параллельно: покажем текущую версию, повторная
+        # отправка формы перезапишет уже ее
+        post = get_object_or_404(Post, pk=post_id)
+        current_text = post.text
+        form = PostForm(request.POST, instance=post, version=post.version)
+        form.is_valid()
+        form.add_error(None, CONFLICT_MESSAGE)
+        status = 409
     context = {
         'form': form,
         'post': post,
         'is_edit': is_edit,
+        'current_text': current_text,
     }
-    return render(request, template, context)
+    return render(request, template, context, status=status)
 
 
 @login_required
@@ -104,18 +186,23 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
+        # ответ на комментарий другого поста станет комментарием верхнего
+        # уровня
+        comment.parent = _post_comment(post, request.POST.get('parent'))
         comment.save()
+        notifications.notify_new_comment(comment)
+        rankings.schedule()
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
     post_list = Post.objects.filter(author__following__user=request.user)
-    page_obj = get_post_obj(request, post_list)
+    page_obj = get_feed_page(request, post_list)
     context = {
         'page_obj': page_obj,
     }
-    return render(request, 'posts/follow.html', context)
+    return render_feed(request, 'posts/follow.html', context)
 
 
 @login_required
@@ -139,3 +226,19 @@ def profile_unfollow(request, username):
         author=author
     ).delete()
     return redirect('posts:profile', username=author.username)
+
+
+@login_required
+def notification_index(request):
+    template = 'posts/notifications.html'
+    notification_list = Notification.objects.filter(
+        user=request.user
+    ).select_related('actor', 'post')
+    page_obj = get_post_obj(request, notification_list)
+    # читаем страницу до пометки, чтобы новые уведомления были выделены
+    page_obj.object_list = list(page_obj.object_list)
+    notifications.mark_all_read(request.user)
+    context = {
+        'page_obj': page_obj,
+    }
+    return render(request, template, context)
@@ -0,0 +1,12 @@
+from django.contrib.auth.backends import ModelBackend
+
+from .hashers import hashing_slot
+
+
+class BoundedModelBackend(ModelBackend):
+    """ModelBackend, проверяющий пароль в ограниченном пуле слотов."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        with hashing_slot():
+            return super().authenticate(request, username=username,
+                                        password=password, **kwargs)
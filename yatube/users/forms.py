@@ -1,6 +1,7 @@
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import get_user_model
 
+from .hashers import hashing_slot
 
 User = get_user_model()
 
@@ -9,3 +10,7 @@ class CreationForm(UserCreationForm):
     class Meta(UserCreationForm.Meta):
         model = User
         fields = ('first_name', 'last_name', 'username', 'email')
+
+    def save(self, commit=True):
+        with hashing_slot():
+            return super().save(commit=commit)
@@ -0,0 +1,165 @@
+"""Хэшеры паролей с настраиваемой стоимостью и ограничение их числа.
+
+hashing_slot ограничивает число одновременных вычислений хэша. Семафор
+потоков действует только внутри процесса, то есть при многопоточных
+воркерах (gunicorn --threads, runserver). Синхронные воркеры gunicorn
+однопоточны, и для них ограничение задается на всю машину через
+PASSWORD_HASHING_LOCK_DIR: слот - блокировка flock одного из
+PASSWORD_HASHING_CONCURRENCY файлов в этом каталоге.
+"""
+import base64
+import fcntl
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth.hashers import (Argon2PasswordHasher,
+                                         BasePasswordHasher, mask_hash)
+from django.utils.crypto import constant_time_compare
+from django.utils.translation import gettext_noop as _
+
+_hashing_slots = None
+_slots_lock = threading.Lock()
+
+
+@contextmanager
+def hashing_slot():
+    """Ограничить число одновременных вычислений хэша паролей.
+
+    Лишние запросы ждут свободного слота, поэтому всплеск логинов
+    не занимает все ядра и не мешает рендерингу страниц.
+    """
+    global _hashing_slots
+    with _slots_lock:
+        if _hashing_slots is None:
+            _hashing_slots = threading.BoundedSemaphore(
+                settings.PASSWORD_HASHING_CONCURRENCY)
+    with _hashing_slots:
+        if settings.PASSWORD_HASHING_LOCK_DIR:
+            with _process_slot():
+                yield
+        else:
+            yield
+
+
+@contextmanager
+def _process_slot():
+    """Слот, общий для всех процессов машины."""
+    lock_dir = settings.PASSWORD_HASHING_LOCK_DIR
+    os.makedirs(lock_dir, exist_ok=True)
+    paths = [os.path.join(lock_dir, f'slot-{i}.lock')
+             for i in range(settings.PASSWORD_HASHING_CONCURRENCY)]
+    while True:
+        for path in paths:
+            fd = os.open(path, os.O_CREAT | os.O_RDWR)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            try:
+                yield
+            finally:
+                # закрытие файла снимает блокировку
+                os.close(fd)
+            return
+        # хэш считается десятки миллисекунд, слот скоро освободится
+        time.sleep(0.005)
+
+
+class ScryptPasswordHasher(BasePasswordHasher):
+    """scrypt из hashlib, формат хэша совместим с Django 4.0+."""
+    algorithm = 'scrypt'
+
+    @property
+    def work_factor(self):
+        return settings.SCRYPT_WORK_FACTOR
+
+    @property
+    def block_size(self):
+        return settings.SCRYPT_BLOCK_SIZE
+
+    @property
+    def parallelism(self):
+        return settings.SCRYPT_PARALLELISM
+
+    def _derive(self, password, salt, work_factor, block_size, parallelism):
+        return hashlib.scrypt(
+            password.encode(),
+            salt=salt.encode(),
+            n=work_factor,
+            r=block_size,
+            p=parallelism,
+            maxmem=2 * 128 * work_factor * block_size * parallelism,
+            dklen=64,
+        )
+
+    def encode(self, password, salt):
+        assert password is not None
+        assert salt and '$' not in salt
+        hash_ = self._derive(password, salt, self.work_factor,
+                             self.block_size, self.parallelism)
+        hash_ = base64.b64encode(hash_).decode('ascii').strip()
+        return (f'{self.algorithm}${self.work_factor}${salt}$'
+                f'{self.block_size}${self.parallelism}${hash_}')
+
+    def decode(self, encoded):
+        algorithm, work_factor, salt, block_size, parallelism, hash_ = (
+            encoded.split('$', 5))
+        assert algorithm == self.algorithm
+        return {
+            'work_factor': int(work_factor),
+            'salt': salt,
+            'block_size': int(block_size),
+            'parallelism': int(parallelism),
+            'hash': hash_,
+        }
+
+    def verify(self, password, encoded):
+        decoded = self.decode(encoded)
+        hash_ = self._derive(password, decoded['salt'],
+                             decoded['work_factor'], decoded['block_size'],
+                             decoded['parallelism'])
+        hash_ = base64.b64encode(hash_).decode('ascii').strip()
+        return constant_time_compare(hash_, decoded['hash'])
+
+    def safe_summary(self, encoded):
+        decoded = self.decode(encoded)
+        return {
+            _('algorithm'): self.algorithm,
+            _('work factor'): decoded['work_factor'],
+            _('block size'): decoded['block_size'],
+            _('parallelism'): decoded['parallelism'],
+            _('salt'): mask_hash(decoded['salt']),
+            _('hash'): mask_hash(decoded['hash']),
+        }
+
+    def must_update(self, encoded):
+        decoded = self.decode(encoded)
+        return (decoded['work_factor'], decoded['block_size'],
+                decoded['parallelism']) != (self.work_factor,
+                                            self.block_size,
+                                            self.parallelism)
+
+    def harden_runtime(self, password, encoded):
+        # для scrypt время определяется параметрами хэша, дорабатывать нечего
+        pass
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2 с параметрами из настроек (нужен argon2-cffi)."""
+
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2_PARALLELISM
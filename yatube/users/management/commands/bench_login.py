@@ -0,0 +1,48 @@
+import timeit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core.benchmark import test_database, throughput
+
+User = get_user_model()
+PASSWORD = 'bench-password-123'
+
+
+class Command(BaseCommand):
+    help = 'Стоимость хэширования паролей и пропускная способность логина'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=30)
+
+    def handle(self, *args, **options):
+        with test_database():
+            self.stdout.write(f'{"hasher":<10}{"hash, ms":>10}'
+                              f'{"logins/s":>10}')
+            for name, hasher in settings.PASSWORD_HASHER_CHOICES.items():
+                with override_settings(PASSWORD_HASHERS=[hasher]):
+                    try:
+                        if get_hasher().library:
+                            get_hasher()._load_library()
+                    except ValueError:
+                        self.stdout.write(f'{name:<10} пропущен: '
+                                          f'не установлена библиотека')
+                        continue
+                    self.bench(name, options['logins'])
+
+    def bench(self, name, logins):
+        hash_ms = min(timeit.repeat(
+            lambda: make_password(PASSWORD), number=1, repeat=5)) * 1000
+        username = f'bench-{name}'
+        User.objects.create_user(username=username, password=PASSWORD)
+        url = reverse('users:login')
+        data = {'username': username, 'password': PASSWORD}
+
+        def login():
+            Client().post(url, data)
+        rate = throughput(login, logins)
+        self.stdout.write(f'{name:<10}{hash_ms:>10.1f}{rate:>10.1f}')
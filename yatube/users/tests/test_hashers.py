@@ -0,0 +1,82 @@
+import shutil
+import tempfile
+import threading
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, make_password
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from users import hashers
+
+User = get_user_model()
+PBKDF2 = 'django.contrib.auth.hashers.PBKDF2PasswordHasher'
+SCRYPT = 'users.hashers.ScryptPasswordHasher'
+ARGON2 = 'users.hashers.TunedArgon2PasswordHasher'
+
+
+@override_settings(SCRYPT_WORK_FACTOR=2 ** 10)
+class PasswordHashersTest(TestCase):
+    def test_scrypt_roundtrip(self):
+        """scrypt проверяет правильный пароль и отклоняет неправильный"""
+        encoded = make_password('password', hasher='scrypt')
+        self.assertTrue(encoded.startswith('scrypt$1024$'))
+        self.assertTrue(check_password('password', encoded))
+        self.assertFalse(check_password('wrong', encoded))
+
+    def test_hash_upgraded_on_login(self):
+        """старый хэш PBKDF2 пересчитывается при входе"""
+        with override_settings(PASSWORD_HASHERS=[PBKDF2]):
+            User.objects.create_user(username='auth', password='password')
+        with override_settings(PASSWORD_HASHERS=[SCRYPT, PBKDF2]):
+            response = self.client.post(
+                reverse('users:login'),
+                {'username': 'auth', 'password': 'password'},
+            )
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(
+            User.objects.get(username='auth').password.startswith('scrypt$'))
+
+    def test_hash_upgraded_when_cost_changes(self):
+        """хэш пересчитывается при изменении параметров scrypt"""
+        with override_settings(PASSWORD_HASHERS=[SCRYPT]):
+            user = User.objects.create_user(username='auth',
+                                            password='password')
+            with self.settings(SCRYPT_WORK_FACTOR=2 ** 11):
+                self.assertTrue(user.check_password('password'))
+                user.refresh_from_db()
+                self.assertTrue(user.password.startswith('scrypt$2048$'))
+
+    @override_settings(PASSWORD_HASHERS=[ARGON2], ARGON2_TIME_COST=1,
+                       ARGON2_MEMORY_COST=256, ARGON2_PARALLELISM=1)
+    def test_argon2_uses_settings(self):
+        """argon2 берет параметры из настроек"""
+        encoded = make_password('password')
+        self.assertIn('$m=256,t=1,p=1$', encoded)
+        self.assertTrue(check_password('password', encoded))
+        self.assertFalse(check_password('wrong', encoded))
+
+
+class HashingSlotsTest(TestCase):
+    def setUp(self):
+        self.lock_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.lock_dir, ignore_errors=True)
+
+    def test_process_slots(self):
+        """слоты в файлах блокировок ждут освобождения, как между процессами"""
+        entered = threading.Event()
+
+        def hash_password():
+            with hashers._process_slot():
+                entered.set()
+
+        with self.settings(PASSWORD_HASHING_LOCK_DIR=self.lock_dir,
+                           PASSWORD_HASHING_CONCURRENCY=1):
+            with hashers.hashing_slot():
+                # flock отдельного открытия файла конфликтует и внутри
+                # процесса, поэтому хватает второго потока
+                thread = threading.Thread(target=hash_password)
+                thread.start()
+                self.assertFalse(entered.wait(0.2))
+            self.assertTrue(entered.wait(5))
+            thread.join()
@@ -11,6 +11,8 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import sys
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -23,7 +25,10 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SECRET_KEY = 'by_#dc6a(p!-atcozaprm4jc51b9kj1^eq--uisxx9@($8w*no'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.getenv('DEBUG', 'True').lower() in ('1', 'true', 'yes')
+
+# Процесс запущен manage.py test или pytest
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
 
 ALLOWED_HOSTS = [
     'localhost',
@@ -50,11 +55,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.static.StaticFilesMiddleware',
+    'core.querylog.SlowQueryMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.profiling.ProfilingMiddleware',
+    'core.middleware.CacheHeadersMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -62,23 +72,57 @@ MIDDLEWARE = [
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if not DEBUG:
+    # в продакшене шаблоны компилируются один раз на процесс
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    ]
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'posts.context_processors.notifications',
             ],
         },
     },
 ]
 
+# Шаблоны лент, которые рендерятся через Jinja2 (posts.utils.render_feed).
+# Бэкенд подключается, только если установлен jinja2.
+JINJA2_TEMPLATES = {
+    name for name in os.getenv('JINJA2_TEMPLATES', '').split(',') if name
+}
+try:
+    import jinja2  # noqa: F401
+except ImportError:
+    JINJA2_TEMPLATES = set()
+else:
+    TEMPLATES.append({
+        'NAME': 'jinja2',
+        'BACKEND': 'django.template.backends.jinja2.Jinja2',
+        'DIRS': [os.path.join(BASE_DIR, 'jinja2')],
+        'OPTIONS': {
+            'environment': 'core.jinja2env.environment',
+            'context_processors': [
+                'django.contrib.auth.context_processors.auth',
+                'core.context_processors.year.year',
+                'posts.context_processors.notifications',
+            ],
+        },
+    })
+
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
@@ -87,13 +131,27 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# DATABASE_NAME - другой файл базы, например временная база loadtest
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'NAME': os.getenv('DATABASE_NAME',
+                          os.path.join(BASE_DIR, 'db.sqlite3')),
     }
 }
 
+# Архив старых постов (posts.archive) по умолчанию лежит в основной базе.
+# С ARCHIVE_DATABASE (путь к файлу SQLite) - в отдельной, таблицы в ней
+# создает python manage.py migrate --database=archive
+ARCHIVE_DATABASE = os.getenv('ARCHIVE_DATABASE')
+if ARCHIVE_DATABASE:
+    DATABASES['archive'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ARCHIVE_DATABASE,
+    }
+
+DATABASE_ROUTERS = ['posts.routers.ArchiveRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -117,6 +175,39 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Первый хэшер из списка используется для новых паролей, остальные -
+# для проверки старых хэшей: при входе хэш прозрачно пересчитывается.
+PASSWORD_HASHER_CHOICES = {
+    'scrypt': 'users.hashers.ScryptPasswordHasher',
+    'argon2': 'users.hashers.TunedArgon2PasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+}
+PREFERRED_PASSWORD_HASHER = PASSWORD_HASHER_CHOICES[
+    os.getenv('PASSWORD_HASHER', 'scrypt')]
+PASSWORD_HASHERS = [PREFERRED_PASSWORD_HASHER] + [
+    hasher for hasher in (
+        'users.hashers.ScryptPasswordHasher',
+        'users.hashers.TunedArgon2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    ) if hasher != PREFERRED_PASSWORD_HASHER
+]
+# N = 2 ** 13 (8 МиБ памяти на хэш) - около 25 мс против 55 мс у PBKDF2
+# Django 2.2 (150000 итераций, manage.py bench_login): логин вдвое
+# дешевле по CPU, а перебор на GPU упирается в память, чего у PBKDF2 нет
+# совсем. При повышении множителя хэши пересчитаются при входе.
+SCRYPT_WORK_FACTOR = 2 ** 13
+SCRYPT_BLOCK_SIZE = 8
+SCRYPT_PARALLELISM = 1
+ARGON2_TIME_COST = 2
+ARGON2_MEMORY_COST = 512
+ARGON2_PARALLELISM = 2
+
+AUTHENTICATION_BACKENDS = ['users.backends.BoundedModelBackend']
+# сколько хэшей паролей может считаться одновременно: в одном процессе,
+# а с PASSWORD_HASHING_LOCK_DIR - на всей машине (синхронные воркеры)
+PASSWORD_HASHING_CONCURRENCY = 2
+PASSWORD_HASHING_LOCK_DIR = os.getenv('PASSWORD_HASHING_LOCK_DIR')
 
 # Internationalization
 # https://docs.djangoproject.com/en/2.2/topics/i18n/
@@ -136,19 +227,156 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
 
 STATIC_URL = '/static/'
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
+# без DEBUG collectstatic пишет файлы с хэшем в имени и сжатые копии,
+# а core.static.StaticFilesMiddleware отдает их с долгим кэшированием
+SERVE_STATIC = not DEBUG
+if not DEBUG:
+    STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# Письма сохраняются в очередь core.QueuedEmail и уходят задачей core.jobs
+# (manage.py run_jobs), запрос их не ждет. EMAIL_QUEUE_BACKEND - бэкенд,
+# которым задача на самом деле отправляет.
+EMAIL_BACKEND = 'core.mail.QueuedEmailBackend'
+EMAIL_QUEUE_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+EMAIL_QUEUE_BATCH_SIZE = 50
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+MEDIA_ROOT = os.getenv('MEDIA_ROOT', os.path.join(BASE_DIR, 'media'))
 
+# core.cache.* - обычные бэкенды плюс счетчики попаданий для /metrics.
+# С адресом memcached (host:port) кэш общий для всех процессов, без него
+# у каждого процесса свой LocMem (core.cache.is_shared).
+CACHE_LOCATION = os.getenv('CACHE_LOCATION')
+SESSION_CACHE_LOCATION = os.getenv('SESSION_CACHE_LOCATION')
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': ('core.cache.MemcachedCache' if CACHE_LOCATION
+                    else 'core.cache.LocMemCache'),
+        'LOCATION': CACHE_LOCATION or '',
+    },
+    # отдельный кэш, чтобы очистка страниц не разлогинивала пользователей
+    'sessions': {
+        'BACKEND': ('core.cache.MemcachedCache' if SESSION_CACHE_LOCATION
+                    else 'core.cache.LocMemCache'),
+        'LOCATION': SESSION_CACHE_LOCATION or 'sessions',
+        'METRICS_ALIAS': 'sessions',
+    },
+}
+# данные, которые меняют запросы, кэш процесса хранит не дольше этого
+# (core.cache.shared_timeout)
+LOCAL_CACHE_TIMEOUT = 5
+
+# Движок сессий выбирается переменной окружения SESSION_BACKEND.
+# 'cache' и 'cached_db' требуют SESSION_CACHE_LOCATION: с LocMem выход
+# из аккаунта не дошел бы до других процессов, поэтому такой запуск
+# падает с ImproperlyConfigured (core.cache.check_session_cache).
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
 }
+SESSION_ENGINE = SESSION_ENGINES[os.getenv('SESSION_BACKEND', 'db')]
+SESSION_CACHE_ALIAS = 'sessions'
+
+# Фоновые задачи в локальном пуле потоков (core.background)
+BACKGROUND_WORKERS = 2
+BACKGROUND_EAGER = False
+# Задачи модерации из админки (posts.moderation) выполняет run_jobs
+MODERATION_CHUNK_SIZE = 500
+
+# Страницы, которые анонимам можно отдавать через общий кэш (reverse proxy),
+# и функции их валидаторов: (время изменения, ключ для ETag)
+PUBLIC_CACHE_VIEWS = {
+    'posts:index': 'posts.utils.index_validators',
+    'posts:group_list': 'posts.utils.group_validators',
+    'posts:profile': 'posts.utils.profile_validators',
+    'posts:post_detail': 'posts.utils.post_detail_validators',
+    'posts:popular': 'posts.utils.popular_validators',
+}
+# представления, которые выполняются и при ответе 304: post_detail
+# считает просмотры
+PUBLIC_CACHE_RUN_VIEWS = {'posts:post_detail'}
+PUBLIC_CACHE_S_MAXAGE = 60
+
+# Время жизни массивов подписок в кэше (posts.follow_graph). Без общего
+# кэша (CACHE_LOCATION) граф не кэшируется и читается из базы
+FOLLOW_GRAPH_TIMEOUT = 60 * 60 * 24
+
+# Уведомления пишутся пачками в фоне (posts.notifications)
+NOTIFICATIONS_FLUSH_DELAY = 0.5
+NOTIFICATIONS_BATCH_SIZE = 500
+# с общим кэшем; в кэше процесса - LOCAL_CACHE_TIMEOUT
+NOTIFICATIONS_UNREAD_TIMEOUT = 60 * 60
+
+# Рейтинги популярного (posts.rankings): вес события затухает вдвое
+# за RANKING_HALF_LIFE секунд
+RANKING_HALF_LIFE = 60 * 60 * 24 * 2
+RANKING_WEIGHTS = {'post': 1.0, 'comment': 3.0, 'view': 0.1}
+RANKING_BATCH_SIZE = 5000
+RANKING_REBASE_AFTER = 256
+RANKING_REFRESH_DELAY = 60
+RANKING_TRENDING_GROUPS = 5
+
+# Каталог групп /groups/ (posts.group_stats)
+GROUP_DIRECTORY_TOP_AUTHORS = 3
+# с общим кэшем; в кэше процесса - LOCAL_CACHE_TIMEOUT
+GROUP_DIRECTORY_TIMEOUT = 60 * 60
+
+# История правок постов (posts.revisions): каждая N-я ревизия - полный
+# снимок, остальные - сжатые разницы с предыдущей
+POST_REVISION_SNAPSHOT_EVERY = 16
+
+# archive_posts переносит в архив посты старше стольких дней
+POST_ARCHIVE_AFTER_DAYS = 365 * 2
+
+# сколько первых ответов показывать под каждым комментарием поста
+COMMENT_REPLIES_PREVIEW = 3
+
+# Просмотры копятся в памяти процесса (posts.counters) и пишутся в базу
+# не реже и не чаще раза в VIEW_COUNTS_FLUSH_INTERVAL секунд, остаток - при
+# выходе из процесса, если база не сменилась. После тестов их база уже
+# удалена.
+VIEW_COUNTS_FLUSH_INTERVAL = 10
+VIEW_COUNTS_FLUSH_AT_EXIT = not TESTING
+
+# Профили запросов (core.profiling): сотрудники включают через
+# ?_profile=cprofile|sample, остальные - подписанным заголовком X-Profile
+PROFILING_ROOT = os.path.join(BASE_DIR, 'profiles')
+PROFILING_SAMPLE_INTERVAL = 0.005
+PROFILING_TOKEN_MAX_AGE = 60 * 60
+PROFILING_MAX_RECORDS = 200
+
+# Журнал медленных SQL-запросов (core.querylog), порог в секундах;
+# None отключает замеры
+SLOW_QUERY_THRESHOLD = 0.1
+
+# Метрики для Prometheus (core.metrics): каждый процесс пишет свой файл
+# в METRICS_DIR, /metrics складывает их. /metrics отвечает только
+# запросам с заголовком Authorization: Bearer <METRICS_TOKEN> или
+# напрямую, без X-Forwarded-For, из METRICS_ALLOWED_NETWORKS (через
+# запятую). По умолчанию не открыт никому.
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(BASE_DIR, 'metrics'))
+if TESTING:
+    # файлы тестовых процессов не попадают в метрики сервера
+    METRICS_DIR = os.path.join(tempfile.gettempdir(), 'yatube-test-metrics')
+METRICS_FLUSH_INTERVAL = 5
+METRICS_ALLOWED_NETWORKS = [
+    network for network in os.getenv('METRICS_ALLOWED_NETWORKS', '').split(',')
+    if network
+]
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+THUMBNAIL_BACKEND = 'core.thumbnails.TimedThumbnailBackend'
+
+# Персистентная очередь задач core.Job (manage.py run_jobs)
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_BACKOFF = 10
+JOBS_RETRY_BACKOFF_MAX = 60 * 60
+JOBS_POLL_INTERVAL = 1
+JOBS_TIMEOUT = 60 * 30